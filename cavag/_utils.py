@@ -2,8 +2,11 @@ from copy import copy
 import textwrap
 from collections import UserDict
 from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 import abc
 
+import numpy as np
+
 class PropertyLost(Exception):
     """Exception raised when necessary property are lost."""
 
@@ -180,3 +183,27 @@ def str_half2full(ins):
     
     return outs
 
+
+def map_chunks(func, x, chunksize=1 << 16, workers=None, dtype=float):
+    """
+    将数组x展平后分块，在线程池中逐块计算func并写入预先分配的结果数组。
+    numpy的逐元素运算会释放GIL，因此多线程可以并行计算很长的数组，同时临时数组只有块的大小。
+    :param func: 逐元素函数，输入输出形状相同
+    :param x: 输入数组
+    :param chunksize: 每块的元素个数
+    :param workers: 线程数，默认由ThreadPoolExecutor决定
+    :param dtype: 结果的数据类型
+    :return: 与x形状相同的结果数组
+    """
+    x = np.asarray(x)
+    xf = x.reshape(-1)
+    out = np.empty(xf.shape, dtype=dtype)
+
+    def work(start):
+        out[start:start+chunksize] = func(xf[start:start+chunksize])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # 通过list取出结果，以便抛出子线程中的异常
+        list(executor.map(work, range(0, xf.size, chunksize)))
+
+    return out.reshape(x.shape)
@@ -0,0 +1,54 @@
+"""
+用于计算光纤腔对准容差的模块。腔镜的横向偏移与倾斜使腔的光轴移动和倾斜，腔面上的光斑偏离
+腔面中心，从而增大clipping损耗并降低与光纤模式的耦合效率。光轴由calculate_misaligned_axis
+几何求解，所有量对失调参数向量化，一次调用即可得到整个容差图。此模块描述了
+
+    - function
+
+    1.
+    calculate_alignment_map - 失调腔的clipping损耗与光纤耦合效率(向量化)
+"""
+
+import numpy as np
+
+from ..fpcavity import calculate_misaligned_axis, calculate_mode_quantities, calculate_loss_clipping
+from .fcqs import calculate_eta_fccoupling
+
+__all__ = [
+    'calculate_alignment_map'
+]
+
+
+def calculate_alignment_map(length, rocl, rocr, wavelength, dl, dr, omegaf, nf=1.45,
+                            xl=0, xr=0, thetal=0, thetar=0, offsetf=0):
+    """
+    计算腔镜失调时的光轴、clipping损耗与左腔面处的光纤耦合效率，参数可以是相互广播的数组，
+    例如xl[:, None]与thetal[None, :]给出二维容差图。腔模的束腰与腔面模场半径使用光轴上两个
+    腔面交点之间的距离计算，不满足稳定条件的腔结果为nan。
+    :param length: 腔长
+    :param rocl: 左腔镜曲率半径
+    :param rocr: 右腔镜曲率半径
+    :param wavelength: 波长
+    :param dl: 左腔面有效直径
+    :param dr: 右腔面有效直径
+    :param omegaf: 光纤的模场半径
+    :param nf: 光纤的折射率
+    :param xl: 左腔镜的横向偏移
+    :param xr: 右腔镜的横向偏移
+    :param thetal: 左腔镜对称轴的倾角
+    :param thetar: 右腔镜对称轴的倾角
+    :param offsetf: 左腔面中心相对于纤芯的偏移
+    :return: {'theta', 'sl', 'sr', 'clippingl', 'clippingr', 'coupling'} 光轴倾角、左右腔面上光斑
+             的偏移、左右腔面单次反射的clipping损耗与光纤耦合效率
+    """
+    axis = calculate_misaligned_axis(length, rocl, rocr, xl, xr, thetal, thetar)
+    mode = calculate_mode_quantities(axis['length'], rocl, rocr, wavelength, omegaf, nf=nf)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        clipl = calculate_loss_clipping(dl, mode['omegaml'], axis['sl'])
+        clipr = calculate_loss_clipping(dr, mode['omegamr'], axis['sr'])
+        coupling = calculate_eta_fccoupling(wavelength, nf, omegaf, rocl, mode['omegaml'],
+                                            axis['sl'], offsetf)
+
+    return {'theta': axis['theta'], 'sl': axis['sl'], 'sr': axis['sr'],
+            'clippingl': clipl, 'clippingr': clipr, 'coupling': coupling}
@@ -102,30 +102,27 @@ def calculate_eta_ctrans(rtl, rtr, lc, direction='both'):
 
     假设腔内含有某个模式的单光子，求等效透射几率。
 
-    :param rtl: (r, t) 左边介质膜的(反射率，透射率)
-    :param rtr: (r, t) 右边介质膜的(反射率，透射率)
+    :param rtl: (r, t) 左边介质膜的(反射率，透射率)，可以是数组
+    :param rtr: (r, t) 右边介质膜的(反射率，透射率)，可以是数组
     :param lc: 腔内损耗
     :param direction: 透射方向，可为left、right、both，默认为both
     :return: 当direction为both时，函数会返回左右两个方向的透射几率。
             其他情况下，函数返回对应方向上的透射几率。
     """
-    rl0, tl0 = rtl
-    rr0, tr0 = rtr
+    rl0, tl0 = (np.asarray(v, dtype=float) for v in rtl)
+    rr0, tr0 = (np.asarray(v, dtype=float) for v in rtr)
 
-    if tl0 == 0:  # 边缘情况
-        pl = 0
-    elif tr0 == 0:  # 边缘情况
-        pr = 0
-    else:
-        # 由于腔内损耗在一个来回中要经历两次，可以将腔内损耗等效地添加到左右介质膜中
-        rl, rr = rl0*(1-lc), rr0*(1-lc)
-        tl, tr = tl0*(1-lc), tr0*(1-lc)
+    # 由于腔内损耗在一个来回中要经历两次，可以将腔内损耗等效地添加到左右介质膜中
+    rl, rr = rl0*(1-lc), rr0*(1-lc)
+    tl, tr = tl0*(1-lc), tr0*(1-lc)
 
-        # 适当的缓存以减少计算量
+    # 适当的缓存以减少计算量
+    with np.errstate(divide='ignore', invalid='ignore'):
         s = 1/(1-rl*rr)/2
 
-        pl = tl*(1+rr)*s
-        pr = tr*(1+rl)*s
+        # 边缘情况，没有透射时透射几率为0
+        pl = np.where(tl0 == 0, 0, tl*(1+rr)*s)[()]
+        pr = np.where(tr0 == 0, 0, tr*(1+rl)*s)[()]
 
     if direction == 'left':
         return pl
@@ -135,17 +132,31 @@ def calculate_eta_ctrans(rtl, rtr, lc, direction='both'):
         return pl, pr
 
 
-def calculate_eta_fccoupling(wavelength, nf, omegaf, roc, omegam):
+def calculate_eta_fccoupling(wavelength, nf, omegaf, roc, omegam, offset=0, offsetf=0):
     """
     计算光纤模式与照射在光纤上的腔模式耦合效率
 
-    此函数假设腔模式和光纤是在同一个轴线上的。
+    默认腔模式和光纤是在同一个轴线上的。腔镜失调时，腔模的光轴经过腔面的曲率中心，
+    波前仍与腔面重合，只有光斑中心相对于腔面中心偏移offset；腔面中心相对于纤芯还可以有
+    偏移offsetf。两个偏移在同一方向上，此时一维高斯积分给出耦合效率的解析式。
+    所有参数可以是相互广播的数组。
 
     :param wavelength: 腔光子的波长
     :param nf: 对应波长下，光纤的折射率
     :param omegaf: 对应波长下，光纤的模场半径
     :param roc: 腔膜式在光纤端面上的曲率半径
     :param omegam: 腔膜式在光纤端面上的模场半径
+    :param offset: 腔模光斑中心相对于腔面中心的偏移，如CavityStructure.sl
+    :param offsetf: 腔面中心相对于纤芯的偏移
     :return: 耦合效率
     """
-    return 4/((omegaf/omegam+omegam/omegaf)**2+(C.pi*nf*omegaf*omegam/(wavelength*roc))**2)
+    eta = 4/((omegaf/omegam+omegam/omegaf)**2+(C.pi*nf*omegaf*omegam/(wavelength*roc))**2)
+    if np.all(np.asarray(offset) == 0) and np.all(np.asarray(offsetf) == 0):
+        return eta
+
+    # 光纤端面内的场: 振幅中心a=offset+offsetf，二次相位中心为腔面中心offsetf
+    beta = C.pi*nf/(wavelength*roc)
+    a = offset+offsetf
+    A = 1/omegaf**2+1/omegam**2+1j*beta
+    B = 2*a/omegam**2+2j*beta*offsetf
+    return eta*np.exp(np.real(B**2/(2*A))-2*a**2/omegam**2)
@@ -0,0 +1,178 @@
+"""
+用于分析腔加工误差的Monte Carlo模块。参数按批次以数组方式抽样和计算，统计量以流式的方式
+累积，内存占用只与批次大小和直方图的箱数有关，与总样本数无关。此模块描述了
+
+    - class
+
+    1.
+    StreamingStatistics - 流式统计量(均值、方差、极值、直方图与分位数)
+
+    - function
+
+    1.
+    calculate_cavity_quantities - 精细度、束腰、模式体积、光纤耦合效率与C1(向量化)
+
+    2.
+    run_montecarlo - Monte Carlo误差分析
+"""
+
+import numpy as np
+from scipy import constants as C
+
+from ..fpcavity import calculate_mode_quantities, calculate_cavity_loss
+from .fcqs import calculate_mu, calculate_emax, calculate_g, calculate_c1
+
+__all__ = [
+    'StreamingStatistics',
+    'calculate_cavity_quantities', 'run_montecarlo'
+]
+
+
+class StreamingStatistics:
+    """
+    此类流式地累积一维样本的统计量。均值与方差使用Chan等人的合并公式逐批更新，
+    分位数由固定箱的直方图插值得到，精度为一个箱宽。直方图范围range为None时由第一批
+    样本的范围向两侧各扩展一倍跨度确定，范围外的样本计入underflow与overflow。
+    nan样本(例如不稳定的腔)只计数，不参与统计。
+    """
+
+    def __init__(self, bins=256, range=None):
+        self.count = 0
+        self.nnan = 0
+        self.mean = 0.
+        self.m2 = 0.
+        self.min = np.inf
+        self.max = -np.inf
+        self.bins = bins
+        self.range = range
+        self.hist = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    @property
+    def var(self):
+        """样本方差"""
+        return self.m2/(self.count-1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        """样本标准差"""
+        return np.sqrt(self.var)
+
+    @property
+    def edges(self):
+        """直方图的箱边界"""
+        return np.linspace(self.range[0], self.range[1], self.bins+1)
+
+    def update(self, x):
+        """
+        加入一批样本
+        :param x: 样本数组
+        """
+        x = np.asarray(x, dtype=float).reshape(-1)
+        isnan = np.isnan(x)
+        self.nnan += int(isnan.sum())
+        x = x[~isnan]
+        n = len(x)
+        if n == 0:
+            return
+
+        if self.range is None:
+            lo, hi = x.min(), x.max()
+            # 样本几乎相同时跨度至少取为数值的1e-6，保证箱宽大于浮点数精度
+            span = max(hi-lo, 1e-6*max(abs(lo), abs(hi))) or 1.
+            self.range = (lo-span, hi+span)
+
+        mean = x.mean()
+        m2 = np.sum((x-mean)**2)
+        total = self.count+n
+        delta = mean-self.mean
+        self.mean += delta*n/total
+        self.m2 += m2+delta**2*self.count*n/total
+        self.count = total
+        self.min = min(self.min, x.min())
+        self.max = max(self.max, x.max())
+
+        lo, hi = self.range
+        self.underflow += int(np.sum(x < lo))
+        self.overflow += int(np.sum(x > hi))
+        self.hist += np.histogram(x, bins=self.bins, range=self.range)[0]
+
+    def quantile(self, q):
+        """
+        由直方图估计分位数，箱内按均匀分布线性插值，落在直方图范围外的分位数取范围的边界
+        :param q: 分位数，可以是数组
+        :return: 对应的样本值，没有样本时为nan
+        """
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan)[()]
+        cdf = np.concatenate(([self.underflow], self.underflow+np.cumsum(self.hist)))/self.count
+        return np.interp(q, cdf, self.edges)
+
+
+def calculate_cavity_quantities(length, rocl, rocr, rl, rr, wavelength, gammat, omegaf, nf=1.45):
+    """
+    以数组方式计算腔的主要指标，不满足稳定条件的腔结果为nan。腔模参数由
+    fpcavity.calculate_mode_quantities给出，精细度与衰减速率由calculate_cavity_loss精确计算，
+    光纤耦合效率为左腔面处的腔模与光纤模式的耦合效率，C1为腔模峰值处的单原子耦合系数。
+    :param length: 腔长
+    :param rocl: 左腔镜曲率半径
+    :param rocr: 右腔镜曲率半径
+    :param rl: 左腔镜反射率
+    :param rr: 右腔镜反射率
+    :param wavelength: 波长
+    :param gammat: 总自发辐射速率
+    :param omegaf: 光纤的模场半径
+    :param nf: 光纤的折射率
+    :return: {'finesse', 'omega0', 'v_mode', 'coupling', 'c1'}
+    """
+    mode = calculate_mode_quantities(length, rocl, rocr, wavelength, omegaf, nf=nf)
+    unstable = np.isnan(mode['omega0'])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        loss = calculate_cavity_loss(length, rl, rr)
+        finesse = np.where(unstable, np.nan, loss['finesse'])[()]
+
+        nu = C.c/wavelength
+        g = calculate_g(calculate_mu(nu, gammat), calculate_emax(mode['v_mode'], nu))
+        c1 = calculate_c1(g, loss['kappa'], gammat)
+
+    return {'finesse': finesse, 'omega0': mode['omega0'], 'v_mode': mode['v_mode'],
+            'coupling': mode['coupling'], 'c1': c1}
+
+
+def run_montecarlo(nominal, sigma, nsamples, func=calculate_cavity_quantities,
+                   batchsize=1 << 16, seed=None, bins=256, ranges=None):
+    """
+    对参数加入正态分布的随机误差，按批次计算func并流式地累积每个输出量的统计量。
+    相同的seed与batchsize给出完全相同的结果。反射率的抽样结果限制在[0, 1]内。
+    :param nominal: 参数的标称值{name: value}，传递给func
+    :param sigma: 参数误差的标准差{name: sigma}，不包含的参数没有误差
+    :param nsamples: 总样本数
+    :param func: 向量化函数func(**params) -> {name: array}，默认为calculate_cavity_quantities
+    :param batchsize: 每批的样本数
+    :param seed: 随机数种子
+    :param bins: 直方图的箱数
+    :param ranges: 输出量的直方图范围{name: (lower, upper)}，默认由第一批样本确定
+    :return: {name: StreamingStatistics}
+    """
+    rng = np.random.default_rng(seed)
+    ranges = ranges or {}
+    stats = {}
+
+    done = 0
+    while done < nsamples:
+        n = min(batchsize, nsamples-done)
+        params = dict(nominal)
+        for k, s in sigma.items():
+            params[k] = nominal[k]+s*rng.standard_normal(n)
+            if k in ('rl', 'rr'):
+                params[k] = np.clip(params[k], 0, 1)
+
+        for k, v in func(**params).items():
+            if k not in stats:
+                stats[k] = StreamingStatistics(bins=bins, range=ranges.get(k, None))
+            stats[k].update(np.broadcast_to(v, (n,)))
+        done += n
+
+    return stats
@@ -0,0 +1,161 @@
+"""
+用于优化F-P腔结构的模块。目标函数由fpcavity与fcqs中的公式组成，并以数组的方式计算，
+全局搜索使用多起点的L-BFGS-B局部优化，局部优化分布在进程池中。此模块描述了
+
+    - function
+
+    1.
+    calculate_eta_extraction - 单光子提取效率(向量化的目标函数)
+
+    2.
+    optimize_cavity - 多起点全局优化
+"""
+
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import constants as C
+from scipy import optimize
+
+from ..fpcavity import (calculate_mode_quantities, calculate_cavity_loss,
+                        calculate_loss_clipping, calculate_loss_scattering, calculate_mirror_reflectivity)
+from .fcqs import (calculate_mu, calculate_emax, calculate_g, calculate_c1,
+                   calculate_eta_cpemit, calculate_eta_cpext, calculate_eta_ctrans)
+
+__all__ = [
+    'PARAMETERS', 'CavityDesign', 'OptimizationReport',
+    'calculate_eta_extraction', 'optimize_cavity'
+]
+
+# 优化变量：腔长、左右腔镜曲率半径、左右腔镜透射率
+PARAMETERS = ('length', 'rocl', 'rocr', 'tl', 'tr')
+
+CavityDesign = namedtuple('CavityDesign', PARAMETERS+('eta',))
+OptimizationReport = namedtuple('OptimizationReport', ('designs', 'nevals', 'time', 'throughput'))
+
+
+def calculate_eta_extraction(length, rocl, rocr, tl, tr, wavelength, gammat, dl, dr,
+                             ll=0, lr=0, sigmasc=0, clipmax=None, direction='left'):
+    """
+    计算单光子从腔中提取的效率，即发射几率、腔耦合提取几率与腔透射几率之积。腔结构参数可以
+    是相互广播的数组，不满足稳定条件(包括临界腔)的腔效率为0。
+    腔面损耗为镜面损耗、clipping损耗与散射损耗之和，反射率由calculate_mirror_reflectivity给出，
+    腔的衰减速率由calculate_cavity_loss精确计算，腔透射几率由fcqs.calculate_eta_ctrans给出。
+    :param length: 腔长
+    :param rocl: 左腔镜曲率半径
+    :param rocr: 右腔镜曲率半径
+    :param tl: 左腔镜透射率
+    :param tr: 右腔镜透射率
+    :param wavelength: 波长
+    :param gammat: 总自发辐射速率
+    :param dl: 左腔面有效直径
+    :param dr: 右腔面有效直径
+    :param ll: 左腔镜损耗
+    :param lr: 右腔镜损耗
+    :param sigmasc: 腔面的粗糙度
+    :param clipmax: 单次反射clipping损耗的上限，超过上限的腔效率为0，默认不限制
+    :param direction: 提取方向，可为left、right、both；both时为两个方向的透射几率之和，
+                      以便作为标量目标函数优化
+    :return: 提取效率
+    """
+    mode = calculate_mode_quantities(length, rocl, rocr, wavelength)
+    valid = ~np.isnan(mode['omega0'])
+
+    v_mode = mode['v_mode']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        clipl = calculate_loss_clipping(dl, mode['omegaml'])
+        clipr = calculate_loss_clipping(dr, mode['omegamr'])
+    if clipmax is not None:
+        valid = valid & (clipl <= clipmax) & (clipr <= clipmax)
+
+    lsc = calculate_loss_scattering(sigmasc, wavelength)
+    rl = calculate_mirror_reflectivity(tl, ll, clipl, lsc)
+    rr = calculate_mirror_reflectivity(tr, lr, clipr, lsc)
+    valid = valid & (rl > 0) & (rr > 0)
+
+    nu = C.c/wavelength
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kappa = calculate_cavity_loss(length, rl, rr)['kappa']
+        g = calculate_g(calculate_mu(nu, gammat), calculate_emax(v_mode, nu))
+        c1 = calculate_c1(g, kappa, gammat)
+
+        # 腔内无损耗，both时取两个方向之和作为标量目标
+        pl, pr = calculate_eta_ctrans((rl, tl), (rr, tr), 0)
+        ctrans = {'left': pl, 'right': pr}.get(direction, pl+pr)
+
+        eta = calculate_eta_cpemit(c1)*calculate_eta_cpext(kappa, gammat)*ctrans
+
+    return np.where(valid, eta, 0)[()]
+
+
+def _objective(u, lower, span, kwargs):
+    return -calculate_eta_extraction(*(lower+u*span), **kwargs)
+
+
+def _local_search(u0, lower, span, kwargs):
+    """在单位超立方体中进行一次L-BFGS-B局部优化，返回(u, eta, nevals)"""
+    res = optimize.minimize(_objective, u0, args=(lower, span, kwargs),
+                            method='L-BFGS-B', bounds=[(0, 1)]*len(u0))
+    return res.x, -res.fun, res.nfev
+
+
+def _local_searches(u0s, lower, span, kwargs):
+    return [_local_search(u0, lower, span, kwargs) for u0 in u0s]
+
+
+def optimize_cavity(bounds, nstarts=16, nsamples=4096, top=5, workers=None, seed=None, **kwargs):
+    """
+    在参数边界内最大化calculate_eta_extraction。先以数组方式计算nsamples个随机样本，
+    从其中最好的nstarts个出发，在进程池中并行进行L-BFGS-B局部优化。优化变量按边界
+    归一化到[0, 1]，以避免腔长与透射率数量级不同带来的病态问题。
+    :param bounds: 与PARAMETERS对应的边界((lower, upper), ...)，上下限相等时该变量固定
+    :param nstarts: 局部优化的起点数
+    :param nsamples: 选取起点的随机样本数
+    :param top: 返回的最优设计个数
+    :param workers: 进程数，默认由ProcessPoolExecutor决定；为1时在当前进程中计算
+    :param seed: 随机数种子
+    :param kwargs: 传递给calculate_eta_extraction的其他参数，如wavelength、gammat、dl、dr
+    :return: OptimizationReport(designs, nevals, time, throughput)
+             按效率从高到低排列的CavityDesign列表、目标函数计算次数(数组中的每个点计一次)、
+             耗时与每秒计算次数
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    lower, span = bounds[:, 0], bounds[:, 1]-bounds[:, 0]
+    rng = np.random.default_rng(seed)
+
+    t0 = time.perf_counter()
+
+    # 向量化的随机采样选取起点
+    samples = rng.random((nsamples, len(PARAMETERS)))
+    eta = calculate_eta_extraction(*(lower[:, None]+samples.T*span[:, None]), **kwargs)
+    u0s = samples[np.argsort(-eta, kind='stable')[:nstarts]]
+    nevals = nsamples
+
+    if workers == 1:
+        results = _local_searches(u0s, lower, span, kwargs)
+    else:
+        # 每个进程处理一组起点，减少进程间传递参数的次数
+        nchunks = min(workers or os.cpu_count() or 1, len(u0s))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_local_searches, chunk, lower, span, kwargs)
+                       for chunk in np.array_split(u0s, nchunks)]
+            results = [r for future in futures for r in future.result()]
+
+    elapsed = time.perf_counter()-t0
+    nevals += sum(r[2] for r in results)
+
+    # 去除收敛到同一点的结果
+    designs, seen = [], set()
+    for u, eta, _ in sorted(results, key=lambda r: -r[1]):
+        key = tuple(np.round(u, 6))
+        if key in seen:
+            continue
+        seen.add(key)
+        designs.append(CavityDesign(*map(float, lower+u*span), float(eta)))
+        if len(designs) >= top:
+            break
+
+    return OptimizationReport(designs, nevals, elapsed, nevals/elapsed)
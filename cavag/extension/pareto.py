@@ -0,0 +1,132 @@
+"""
+用于在光纤F-P腔的设计空间中权衡精细度、模式体积、光纤耦合效率与clipping损耗的多目标模块。
+设计参数按批次随机抽样并以数组方式计算，每批只保留非支配解并与已有的Pareto前沿合并，
+内存占用只与批次大小和前沿的大小有关。此模块描述了
+
+    - function
+
+    1.
+    calculate_design_objectives - 精细度、模式体积、光纤耦合效率与clipping损耗(向量化)
+
+    2.
+    find_pareto_front - 非支配解的索引
+
+    3.
+    explore_designs - 随机抽样设计空间并提取Pareto前沿
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from ..fpcavity import (calculate_mode_quantities, calculate_loss_clipping, calculate_loss_scattering,
+                        calculate_mirror_reflectivity, calculate_cavity_loss)
+
+__all__ = [
+    'OBJECTIVES', 'ParetoFront',
+    'calculate_design_objectives', 'find_pareto_front', 'explore_designs'
+]
+
+# 默认的目标及其方向，True为越大越好
+OBJECTIVES = {'finesse': True, 'v_mode': False, 'coupling': True, 'clipping': False}
+
+ParetoFront = namedtuple('ParetoFront', ('params', 'objectives', 'nevals'))
+
+
+def calculate_design_objectives(length, rocl, rocr, tl, tr, wavelength, omegaf, dl, dr,
+                                nf=1.45, ll=0, lr=0, sigmasc=0):
+    """
+    以数组方式计算光纤腔的设计指标，参数可以是相互广播的数组，不满足稳定条件的腔结果为nan。
+    腔模参数与CavityMode相同；两个腔面的损耗为镜面损耗、clipping损耗与散射损耗之和，
+    反射率由calculate_mirror_reflectivity给出，精细度为calculate_cavity_loss给出的Airy精细度。
+    :param length: 腔长
+    :param rocl: 左腔镜曲率半径
+    :param rocr: 右腔镜曲率半径
+    :param tl: 左腔镜透射率
+    :param tr: 右腔镜透射率
+    :param wavelength: 波长
+    :param omegaf: 光纤的模场半径
+    :param dl: 左腔面有效直径
+    :param dr: 右腔面有效直径
+    :param nf: 光纤的折射率
+    :param ll: 左腔镜损耗
+    :param lr: 右腔镜损耗
+    :param sigmasc: 腔面的粗糙度
+    :return: {'finesse', 'v_mode', 'coupling', 'clipping'}，coupling为左腔面处腔模与光纤模式的
+             耦合效率，clipping为两个腔面单次反射clipping损耗之和
+    """
+    mode = calculate_mode_quantities(length, rocl, rocr, wavelength, omegaf, nf=nf)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        clipl = calculate_loss_clipping(dl, mode['omegaml'])
+        clipr = calculate_loss_clipping(dr, mode['omegamr'])
+    lsc = calculate_loss_scattering(sigmasc, wavelength)
+    rl = calculate_mirror_reflectivity(tl, ll, clipl, lsc)
+    rr = calculate_mirror_reflectivity(tr, lr, clipr, lsc)
+    finesse = calculate_cavity_loss(length, rl, rr)['finesse']
+
+    return {'finesse': finesse, 'v_mode': mode['v_mode'],
+            'coupling': mode['coupling'], 'clipping': clipl+clipr}
+
+
+def find_pareto_front(points):
+    """
+    求出非支配解(所有目标都越小越好)。点先按目标之和排序，然后依次用当前点剔除被它支配的点，
+    每一步都是数组运算，复杂度约为O(n*m)，m为前沿的大小。完全相同的点只保留一个
+    :param points: 形状为(n, k)的目标数组，含nan的点不参与比较
+    :return: 非支配解的索引，按第一个目标从小到大排列
+    """
+    points = np.asarray(points, dtype=float)
+    index = np.nonzero(~np.any(np.isnan(points), axis=1))[0]
+    index = index[np.argsort(points[index].sum(axis=1), kind='stable')]
+    candidates = points[index]
+
+    i = 0
+    while i < len(candidates):
+        # 保留至少有一个目标优于当前点的点，以及当前点本身
+        keep = np.any(candidates < candidates[i], axis=1)
+        keep[i] = True
+        index, candidates = index[keep], candidates[keep]
+        i = np.count_nonzero(keep[:i])+1
+
+    return index[np.argsort(points[index, 0], kind='stable')]
+
+
+def explore_designs(bounds, nsamples, func=calculate_design_objectives, objectives=None,
+                    batchsize=1 << 16, seed=None, **kwargs):
+    """
+    在参数边界内随机抽样nsamples个设计，按批次计算func，并提取所有目标的Pareto前沿。
+    每批的前沿与之前的前沿合并后重新求前沿，结果与一次性计算全部样本相同，也与batchsize无关。
+    :param bounds: 设计参数的边界{name: (lower, upper)}，例如{'length': ..., 'rocl': ...}
+    :param nsamples: 总样本数
+    :param func: 向量化函数func(**params) -> {name: array}，默认为calculate_design_objectives
+    :param objectives: 参与比较的目标及其方向{name: maximize}，默认为OBJECTIVES
+    :param batchsize: 每批的样本数
+    :param seed: 随机数种子
+    :param kwargs: 传递给func的其他固定参数，例如wavelength、omegaf、dl、dr
+    :return: ParetoFront(params, objectives, nevals)，params与objectives为{name: 一维数组}，
+             按第一个目标排列，可以直接用于作图
+    """
+    objectives = OBJECTIVES if objectives is None else objectives
+    sign = np.array([-1. if maximize else 1. for maximize in objectives.values()])
+    rng = np.random.default_rng(seed)
+
+    front_params = {k: np.empty(0) for k in bounds}
+    front_values = {k: np.empty(0) for k in objectives}
+    done = 0
+    while done < nsamples:
+        n = min(batchsize, nsamples-done)
+        # 按行抽样，相同的seed与不同的batchsize得到相同的样本
+        u = rng.random((n, len(bounds)))
+        params = {k: lo+u[:, i]*(hi-lo) for i, (k, (lo, hi)) in enumerate(bounds.items())}
+        values = func(**params, **kwargs)
+
+        params = {k: np.concatenate((front_params[k], params[k])) for k in bounds}
+        values = {k: np.concatenate((front_values[k], np.broadcast_to(values[k], (n,))))
+                  for k in objectives}
+        index = find_pareto_front(np.stack(list(values.values()), axis=-1)*sign)
+        front_params = {k: v[index] for k, v in params.items()}
+        front_values = {k: v[index] for k, v in values.items()}
+        done += n
+
+    return ParetoFront(front_params, front_values, done)
@@ -0,0 +1,94 @@
+"""
+用于模拟扫描腔长(压电陶瓷)时透射光强随时间变化的模块，可以直接与示波器的曲线比较。
+入射光按calculate_coupling_spectrum给出的功率比例分配到各个横模，透射光强为各横模的Airy或
+Lorentz线型之和。横模的权重按阶数mx+my预先合并，每个采样点只需要一次向量化的求和；
+结果按固定大小的块输出到回调函数或memmap，长曲线不需要一次性放入内存。此模块描述了
+
+    - function
+
+    1.
+    triangle_scan - 三角波扫描的腔长
+
+    2.
+    simulate_length_scan - 腔长扫描的透射曲线
+"""
+
+import numpy as np
+from scipy import constants as C
+
+from ..fpcavity import calculate_gouy_phase
+
+__all__ = [
+    'triangle_scan', 'simulate_length_scan'
+]
+
+
+def triangle_scan(t, length0, amplitude, period):
+    """
+    计算三角波扫描时的腔长，t=0时为length0-amplitude/2
+    :param t: 时间
+    :param length0: 扫描中心的腔长
+    :param amplitude: 扫描的峰峰值
+    :param period: 扫描周期
+    :return: 腔长
+    """
+    phase = np.mod(np.asarray(t, dtype=float)/period, 1)
+    return length0+amplitude*(1/2-2*np.abs(phase-1/2))
+
+
+def simulate_length_scan(cavity, weights, wavelength, length_f, nsamples, dt=1, lineshape='airy',
+                         chunksize=1 << 20, callback=None, out=None):
+    """
+    模拟扫描腔长时的透射光强(以入射功率为单位)。(mx, my)模式的往返相位为
+    2*k*nc*L-2*(mx+my+1)*zeta(L)，其中zeta为单程Gouy相位，腔长的变化同时改变Gouy相位。
+    线型与Cavity.transmission_f相同：Airy线型为t/(1+g^2-2g*cos(delta))；Lorentz线型把
+    4g*sin^2(delta/2)换成g*delta^2，delta取最近的共振处，即高精细度近似。
+    :param cavity: Cavity，使用其rl、tl、rr、tr、lc、nc、rocl、rocr
+    :param weights: 各横模的功率比例weights[mx, my]，例如calculate_coupling_spectrum的结果。必须是二维数组，
+                    calculate_coupling_spectrum的结果含失调等参数维度时需要先选取其中一组，如weights[..., i]
+    :param wavelength: 入射光波长
+    :param length_f: 腔长随时间变化的函数length_f(t)，例如triangle_scan
+    :param nsamples: 采样点数
+    :param dt: 采样间隔
+    :param lineshape: 'airy'或'lorentz'
+    :param chunksize: 每块的采样点数
+    :param callback: 每块计算完成后调用callback(start, power)，start为该块第一个点的序号
+    :param out: 写入结果的数组，例如np.memmap
+    :return: out；callback与out都为None时返回完整的透射曲线
+    """
+    if lineshape not in ('airy', 'lorentz'):
+        raise ValueError("lineshape must be 'airy' or 'lorentz'.")
+    if out is None and callback is None:
+        out = np.empty(nsamples)
+
+    weights = np.asarray(weights, dtype=float)
+    if weights.ndim != 2:
+        raise ValueError("weights must be a 2D array weights[mx, my], got shape %s." % (weights.shape,))
+
+    # 按阶数mx+my合并权重
+    mx, my = np.indices(weights.shape)
+    wn = np.bincount((mx+my).reshape(-1), weights.reshape(-1))
+    order = np.nonzero(wn)[0]
+    wn = wn[order]
+
+    g = np.sqrt(cavity.rl*cavity.rr)*(1-cavity.lc)
+    t0 = cavity.tl*cavity.tr*(1-cavity.lc)
+    k = 2*C.pi*cavity.nc/wavelength
+
+    for start in range(0, nsamples, chunksize):
+        n = min(chunksize, nsamples-start)
+        length = length_f((start+np.arange(n))*dt)
+        zeta = calculate_gouy_phase(length, cavity.rocl, cavity.rocr)
+        delta = 2*k*np.asarray(length)[:, None]-2*(order+1)*np.asarray(zeta)[:, None]
+        if lineshape == 'airy':
+            power = (t0/(1+g**2-2*g*np.cos(delta))) @ wn
+        else:
+            delta = np.mod(delta+C.pi, 2*C.pi)-C.pi
+            power = (t0/((1-g)**2+g*delta**2)) @ wn
+
+        if out is not None:
+            out[start:start+n] = power
+        if callback is not None:
+            callback(start, power)
+
+    return out
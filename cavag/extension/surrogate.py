@@ -0,0 +1,136 @@
+"""
+用于快速查询腔模参数的插值代理模型模块。在用户给定的参数网格上预先计算精确公式的结果，
+查询时使用插值，并给出由网格单元中点处的误差得到的插值误差估计；网格范围外的查询使用精确公式计算。
+代理模型可以保存为npz文件，启动时直接加载。此模块描述了
+
+    - class
+
+    1.
+    CavitySurrogate - 网格插值代理模型
+"""
+
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+
+from ..fpcavity import calculate_mode_quantities
+
+__all__ = [
+    'CavitySurrogate'
+]
+
+
+class CavitySurrogate:
+    """
+    此类在规则网格上对向量化函数func的输出进行插值。网格的每个轴对应func的一个参数，
+    其余参数固定为fixed。error_estimate为每个输出量在所有网格单元中点处插值与精确值之差的
+    最大值(绝对误差, 相对误差)。它只是插值误差的估计，不是严格的上限：网格单元内其他位置的
+    误差可能更大，网格过粗以致漏掉函数的局部结构时尤其如此。
+
+    使用CavitySurrogate.build构建，save/load保存和加载。
+    """
+
+    def __init__(self, axes, values, names, fixed, error_estimate, func=calculate_mode_quantities,
+                 method='linear'):
+        """
+        :param axes: {参数名: 单调递增的一维网格}
+        :param values: 形状为网格形状+(len(names),)的数组
+        :param names: 输出量的名称
+        :param fixed: 固定参数{参数名: 值}
+        :param error_estimate: {输出量: (绝对误差, 相对误差)}的插值误差估计
+        :param func: 精确的向量化函数func(**params) -> {name: array}
+        :param method: 插值方法，传递给RegularGridInterpolator
+        """
+        self.axes = {k: np.asarray(v, dtype=float) for k, v in axes.items()}
+        self.values = np.asarray(values, dtype=float)
+        self.names = tuple(names)
+        self.fixed = dict(fixed)
+        self.error_estimate = dict(error_estimate)
+        self.func = func
+        self.method = method
+        self.__interpolator = RegularGridInterpolator(
+            tuple(self.axes.values()), self.values, method=method)
+
+    @classmethod
+    def build(cls, axes, func=calculate_mode_quantities, method='linear', **fixed):
+        """
+        在网格上计算func，并由网格单元中点处的误差估计插值误差
+        :param axes: {参数名: 单调递增的一维网格}，例如{'length': ..., 'rocl': ...}
+        :param func: 精确的向量化函数func(**params) -> {name: array}
+        :param method: 插值方法，传递给RegularGridInterpolator
+        :param fixed: 其他固定参数，例如rocr、wavelength、omegaf
+        :return: CavitySurrogate
+        """
+        axes = {k: np.asarray(v, dtype=float) for k, v in axes.items()}
+        grids = np.meshgrid(*axes.values(), indexing='ij')
+        result = func(**dict(zip(axes, grids)), **fixed)
+        names = tuple(result)
+        values = np.stack([np.broadcast_to(result[k], grids[0].shape) for k in names], axis=-1)
+
+        surrogate = cls(axes, values, names, fixed, {}, func=func, method=method)
+
+        # 在网格单元中点处比较插值与精确值
+        mids = np.meshgrid(*((v[1:]+v[:-1])/2 for v in axes.values()), indexing='ij')
+        exact = func(**dict(zip(axes, mids)), **fixed)
+        approx = surrogate.__interpolator(np.stack([m.reshape(-1) for m in mids], axis=-1))
+        for i, k in enumerate(names):
+            e = np.broadcast_to(exact[k], mids[0].shape).reshape(-1)
+            diff = np.abs(approx[:, i]-e)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                surrogate.error_estimate[k] = (float(np.nanmax(diff, initial=0)),
+                                      float(np.nanmax(diff/np.abs(e), initial=0)))
+        return surrogate
+
+    def __call__(self, **params):
+        """
+        查询输出量，参数可以是相互广播的数组。网格范围内使用插值，范围外使用精确公式
+        :param params: 与axes对应的参数
+        :return: {name: array}
+        """
+        arrays = np.broadcast_arrays(*(np.asarray(params[k], dtype=float) for k in self.axes))
+        shape = arrays[0].shape
+        points = np.stack([a.reshape(-1) for a in arrays], axis=-1)
+
+        inside = np.ones(len(points), dtype=bool)
+        for i, v in enumerate(self.axes.values()):
+            inside &= (points[:, i] >= v[0]) & (points[:, i] <= v[-1])
+
+        out = np.empty((len(points), len(self.names)))
+        out[inside] = self.__interpolator(points[inside])
+        if not np.all(inside):
+            exact = self.func(**dict(zip(self.axes, points[~inside].T)), **self.fixed)
+            for i, k in enumerate(self.names):
+                out[~inside, i] = exact[k]
+
+        return {k: out[:, i].reshape(shape)[()] for i, k in enumerate(self.names)}
+
+    def save(self, file):
+        """
+        保存为npz文件，func不保存。固定参数按原来的类型保存，不能是None等需要pickle的对象
+        :param file: 文件名或文件对象
+        """
+        np.savez(file, values=self.values, names=np.array(self.names),
+                 axes_names=np.array(list(self.axes)),
+                 fixed_names=np.array(list(self.fixed), dtype=str),
+                 error_names=np.array(list(self.error_estimate), dtype=str),
+                 error_values=np.array(list(self.error_estimate.values()), dtype=float).reshape(-1, 2),
+                 method=np.array(self.method),
+                 **{'axis_%d' % i: v for i, v in enumerate(self.axes.values())},
+                 **{'fixed_%d' % i: np.asarray(v) for i, v in enumerate(self.fixed.values())})
+
+    @classmethod
+    def load(cls, file, func=calculate_mode_quantities):
+        """
+        从npz文件加载
+        :param file: 文件名或文件对象
+        :param func: 精确的向量化函数，需要与构建时相同
+        :return: CavitySurrogate
+        """
+        with np.load(file) as data:
+            axes = {str(k): data['axis_%d' % i] for i, k in enumerate(data['axes_names'])}
+            fixed = {}
+            for i, k in enumerate(data['fixed_names']):
+                v = data['fixed_%d' % i]
+                fixed[str(k)] = v.item() if v.ndim == 0 else v
+            error = {str(k): tuple(map(float, v)) for k, v in zip(data['error_names'], data['error_values'])}
+            return cls(axes, data['values'], [str(k) for k in data['names']], fixed, error,
+                       func=func, method=str(data['method']))
@@ -0,0 +1,123 @@
+"""
+用于计算温度与应变引起的腔共振频率漂移的模块。腔长按线膨胀系数与应变变化，腔介质的折射率按
+热光系数变化，共振频率由与get_available_wavelengthf相同的相位条件给出。腔体均匀膨胀时腔镜
+曲率半径与腔长按相同比例变化，g因子与Gouy相位不变，因此与温度无关的模式结构(横模阶数与Gouy
+相位)只计算一次，温度序列上只需要数组运算。此模块描述了
+
+    - class
+
+    1.
+    ThermalCavityModel - 腔长与折射率随温度变化的腔
+"""
+
+import numpy as np
+from scipy import constants as C
+
+from ..fpcavity import calculate_gouy_phase
+
+__all__ = [
+    'ThermalCavityModel'
+]
+
+
+class ThermalCavityModel:
+    """
+    此类描述了腔长与折射率随温度变化的腔。温度为temperature、轴向应变为strain时
+
+        length = length0*(1+alpha*(temperature-temperature0)+strain)
+        nc = nc0+dndt*(temperature-temperature0)
+        roc = roc0*(1+alpharoc*(temperature-temperature0))
+
+    alpharoc默认等于alpha，即腔体均匀膨胀；此时若没有应变，Gouy相位与温度无关，使用缓存的值。
+    (p, mx, my)模式的真空波长为nc*2*pi*length/(p*pi+(mx+my+1)*zeta)，与
+    get_available_wavelengthf(length, rocl, rocr, mx, my, nc=nc)(p)相同，共振频率为其倒数乘以c。
+    """
+
+    def __init__(self, length, rocl, rocr, modes=((0, 0),), nc=1, temperature0=20,
+                 alpha=0, dndt=0, alpharoc=None):
+        """
+        :param length: 参考温度下的腔长
+        :param rocl: 参考温度下的左腔镜曲率半径
+        :param rocr: 参考温度下的右腔镜曲率半径
+        :param modes: 横模列表((mx, my), ...)
+        :param nc: 参考温度下腔介质的折射率
+        :param temperature0: 参考温度
+        :param alpha: 腔长的线膨胀系数
+        :param dndt: 腔介质的热光系数
+        :param alpharoc: 腔镜曲率半径的线膨胀系数，默认等于alpha
+        """
+        self.length = length
+        self.rocl = rocl
+        self.rocr = rocr
+        self.modes = np.asarray(modes, dtype=int).reshape(-1, 2)
+        self.nc = nc
+        self.temperature0 = temperature0
+        self.alpha = alpha
+        self.dndt = dndt
+        self.alpharoc = alpha if alpharoc is None else alpharoc
+
+        # 与温度无关的模式结构
+        self.order = self.modes.sum(axis=1)+1
+        self.zeta0 = calculate_gouy_phase(length, rocl, rocr)
+
+    def length_f(self, temperature, strain=0):
+        """
+        计算腔长
+        :param temperature: 温度，可以是数组
+        :param strain: 轴向应变，可以是与温度相互广播的数组
+        :return: 腔长
+        """
+        dt = np.asarray(temperature, dtype=float)-self.temperature0
+        return self.length*(1+self.alpha*dt+strain)
+
+    def nc_f(self, temperature):
+        """
+        计算腔介质的折射率
+        :param temperature: 温度，可以是数组
+        :return: 折射率
+        """
+        return self.nc+self.dndt*(np.asarray(temperature, dtype=float)-self.temperature0)
+
+    def zeta_f(self, temperature, strain=0):
+        """
+        计算单程Gouy相位，均匀膨胀且没有应变时直接返回缓存的值
+        :param temperature: 温度，可以是数组
+        :param strain: 轴向应变，可以是与温度相互广播的数组
+        :return: 单程Gouy相位
+        """
+        if self.alpharoc == self.alpha and np.all(np.asarray(strain) == 0):
+            return self.zeta0
+        scale = 1+self.alpharoc*(np.asarray(temperature, dtype=float)-self.temperature0)
+        return calculate_gouy_phase(self.length_f(temperature, strain), self.rocl*scale, self.rocr*scale)
+
+    def get_longitudinal(self, wavelength0):
+        """
+        计算参考温度下每个横模最接近wavelength0的纵模级数，与get_available_wavelength相同
+        :param wavelength0: 所要接近的真空波长
+        :return: 纵模级数，形状为(len(modes),)
+        """
+        return np.round(2*self.nc*self.length/wavelength0-self.order*self.zeta0/C.pi).astype(int)
+
+    def frequency_f(self, temperature, p, strain=0):
+        """
+        计算温度序列上每个模式的共振频率
+        :param temperature: 温度，形状任意的数组
+        :param p: 纵模级数，整数或与modes对应的数组，例如get_longitudinal的结果
+        :param strain: 轴向应变，可以是与温度相互广播的数组
+        :return: 共振频率，形状为np.broadcast(temperature, strain).shape+(len(modes),)
+        """
+        temperature = np.asarray(temperature, dtype=float)
+        length = np.asarray(self.length_f(temperature, strain))[..., None]
+        nc = np.asarray(self.nc_f(temperature))[..., None]
+        zeta = np.asarray(self.zeta_f(temperature, strain))[..., None]
+        return C.c*(np.asarray(p)+self.order*zeta/C.pi)/(2*nc*length)
+
+    def shift_f(self, temperature, p, strain=0):
+        """
+        计算共振频率相对于参考温度(无应变)的漂移
+        :param temperature: 温度，形状任意的数组
+        :param p: 纵模级数，整数或与modes对应的数组
+        :param strain: 轴向应变，可以是与温度相互广播的数组
+        :return: 频率漂移，形状与frequency_f相同
+        """
+        return self.frequency_f(temperature, p, strain)-self.frequency_f(self.temperature0, p)
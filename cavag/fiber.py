@@ -10,8 +10,7 @@
         阶跃光纤
 """
 
-import logging
-from .misc import Wavelength
+from .misc import Wavelength, diagnostics
 
 __all__ = [
     'Fiber', 'StepIndexFiber'
@@ -92,9 +91,9 @@ class StepIndexFiber(Fiber):
             naf = self.naf
             V = k * a * naf  # 归一化频率
             if V < 1.2:
-                logging.warning('Normalized frequency for {}:{} is less than 1.2, '
-                                'the approximate radius of mode field may be not '
-                                'correct'.format(self.name, repr(self)))
+                diagnostics.warn('omegaf', 'Normalized frequency for %s:%r is less than 1.2, '
+                                 'the approximate radius of mode field may be not '
+                                 'correct', self.name, self, V=V)
             # empirically that the size w of the Gaussian approximation
             # to the fiber mode for V >~ 1.2 given by Marcuse
             return a * (0.65 + 1.619 * V ** (-1.5) + 2.879 * V ** (-6))
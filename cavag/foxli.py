@@ -0,0 +1,223 @@
+"""
+用于数值求解任意腔面形貌的F-P腔本征模式的模块。fpcavity模块中的腔面只能用曲率半径描述，
+对于例如CO2激光加工的高斯形凹坑等非球面腔面，需要使用Fox-Li方法：在腔面采样网格上构造
+往返传播算符，再用Arnoldi方法求出损耗最小的若干本征模式。此模块描述了
+
+    - class
+
+    1.
+    FoxLiCavity - 由采样腔面高度描述的F-P腔
+
+    - function
+
+    1.
+    calculate_spherical_height - 球面腔面的高度
+
+    2.
+    calculate_gaussian_dimple_height - 高斯形凹坑腔面的高度
+"""
+
+import numpy as np
+from scipy import constants as C
+from scipy import fft
+from scipy.sparse.linalg import LinearOperator, eigs
+
+from .misc import Wavelength
+
+__all__ = [
+    'FoxLiCavity',
+    'calculate_spherical_height', 'calculate_gaussian_dimple_height'
+]
+
+
+class FoxLiCavity(Wavelength):
+    """
+    此类描述了由采样腔面高度描述的F-P腔。两个腔面使用同一个n*n的横向网格，网格边长为size，
+    中心位于光轴上。腔面高度h(x, y)从腔面顶点开始计算，指向腔内为正，因此凹面镜的高度为正。
+
+    往返算符从左腔面反射后的场开始，依次为：传播至右腔面、右腔面反射、传播至左腔面、左腔面反射。
+    自由传播使用带宽受限的角谱法，传递函数只计算一次并缓存。本征值gamma的模给出往返衍射损耗
+    1-|gamma|^2，辐角给出相对于纵模的频率偏移fsr*arg(gamma)/(2pi)，对于球面腔即
+    fsr*(mx+my+1)*zeta/pi(以fsr为模)，其中zeta为单程Gouy相位。
+
+    此类可以通过以下属性构建：
+        wavelength - 波长
+        length - 腔长
+        nc - 腔介质的折射率，默认为1
+        size - 采样网格的边长
+        n - 每个方向的采样点数
+        hl - 左腔面高度，n*n的数组或函数h(x, y)
+        hr - 右腔面高度，n*n的数组或函数h(x, y)
+        dl - 左腔面有效直径，默认为无穷大
+        dr - 右腔面有效直径，默认为无穷大
+    """
+    name = 'FoxLiCavity'
+
+    modifiable_properties = ('wavelength', 'length', 'nc', 'size', 'n',
+                             'hl', 'hr', 'dl', 'dr')
+
+    def __init__(self, name='FoxLiCavity', **kwargs):
+        kwargs.update(nc=kwargs.get('nc', 1))
+        kwargs.update(dl=kwargs.get('dl', np.inf))
+        kwargs.update(dr=kwargs.get('dr', np.inf))
+
+        super().__init__(**kwargs)
+        self.name = name
+
+        self.property_set.add_required(FoxLiCavity.modifiable_properties)
+
+        for prop in FoxLiCavity.modifiable_properties:
+            self.property_set[prop] = kwargs.get(prop, None)
+
+    @property
+    def length(self):
+        """腔长[L]"""
+        return self.get_property('length')
+
+    @property
+    def nc(self):
+        """腔介质的折射率[1]"""
+        return self.get_property('nc')
+
+    @property
+    def size(self):
+        """采样网格的边长[L]"""
+        return self.get_property('size')
+
+    @property
+    def n(self):
+        """每个方向的采样点数[1]"""
+        return self.get_property('n')
+
+    @property
+    def hl(self):
+        """左腔面高度[L]"""
+        return self.get_property('hl')
+
+    @property
+    def hr(self):
+        """右腔面高度[L]"""
+        return self.get_property('hr')
+
+    @property
+    def dl(self):
+        """左腔面有效直径[L]"""
+        return self.get_property('dl')
+
+    @property
+    def dr(self):
+        """右腔面有效直径[L]"""
+        return self.get_property('dr')
+
+    @property
+    def fsr(self):
+        """FSR[1/T]"""
+        return self.get_property('fsr', lambda: C.c/(2*self.nc*self.length))
+
+    @property
+    def x(self):
+        """采样点坐标[L]"""
+        return self.get_property('x', lambda: (np.arange(self.n)-self.n//2)*self.size/self.n)
+
+    @property
+    def kernel(self):
+        """单程传播的传递函数(按FFT频率顺序排列)"""
+        def v_f():
+            wavelength = self.wavelength/self.nc
+            f = fft.fftfreq(self.n, self.size/self.n)
+            # 带宽限制：传递函数的相位在频率采样间隔内变化过快的部分会混叠到网格另一侧
+            fl = self.size/(2*wavelength*self.length)
+            hx = np.exp(1j*C.pi*wavelength*self.length*f**2)*(np.abs(f) <= fl)
+            return hx[:, None]*hx[None, :]
+        return self.get_property('kernel', v_f)
+
+    @property
+    def ml(self):
+        """左腔面的反射因子(相位与孔径)"""
+        return self.get_property('ml', lambda: self.__mirror(self.hl, self.dl))
+
+    @property
+    def mr(self):
+        """右腔面的反射因子(相位与孔径)"""
+        return self.get_property('mr', lambda: self.__mirror(self.hr, self.dr))
+
+    def __mirror(self, h, d):
+        x, y = np.meshgrid(self.x, self.x, indexing='ij')
+        if callable(h):
+            h = h(x, y)
+        h = np.broadcast_to(np.asarray(h, dtype=float), x.shape)
+        aperture = x**2+y**2 <= (d/2)**2
+        return np.exp(2j*self.k*self.nc*h)*aperture
+
+    def __propagate(self, u):
+        return fft.ifft2(fft.fft2(u, workers=-1)*self.kernel, workers=-1)
+
+    def roundtrip_f(self, u):
+        """
+        计算场u在腔内往返一次后的场
+        :param u: 左腔面反射后的场，n*n的数组
+        :return: 往返一次后左腔面反射后的场
+        """
+        u = self.__propagate(u)*self.mr
+        return self.__propagate(u)*self.ml
+
+    def solve_modes(self, nmodes=4, v0=None, ncv=None, tol=0, maxiter=None):
+        """
+        使用Arnoldi方法(scipy.sparse.linalg.eigs)求解往返算符本征值模最大，即损耗最小的若干模式
+        :param nmodes: 模式个数
+        :param v0: 迭代的初始场，默认为位于光轴上的高斯场
+        :param ncv: Krylov子空间维数，默认为max(2*nmodes+1, 20)
+        :param tol: 本征值的相对精度，0表示机器精度
+        :param maxiter: 最大迭代次数
+        :return: (gamma, loss, nu, modes) 按损耗从小到大排列的本征值、往返衍射损耗、
+                 相对于纵模的频率偏移、左腔面反射后的归一化模场(nmodes*n*n)
+        """
+        n = self.n
+        if v0 is None:
+            x, y = np.meshgrid(self.x, self.x, indexing='ij')
+            v0 = np.exp(-(x**2+y**2)/(self.size/8)**2)
+        if ncv is None:
+            ncv = min(max(2*nmodes+1, 20), n*n-1)
+
+        def matvec(v):
+            return self.roundtrip_f(v.reshape(n, n)).reshape(-1)
+
+        op = LinearOperator((n*n, n*n), matvec=matvec, dtype=complex)
+        gamma, modes = eigs(op, k=nmodes, v0=np.asarray(v0, dtype=complex).reshape(-1),
+                            ncv=ncv, tol=tol, maxiter=maxiter)
+
+        isort = np.argsort(-np.abs(gamma), kind='stable')
+        gamma = gamma[isort]
+        modes = modes[:, isort].T.reshape(nmodes, n, n)
+        modes = modes/np.sqrt(np.sum(np.abs(modes)**2, axis=(1, 2),
+                                     keepdims=True)*(self.size/n)**2)
+
+        loss = 1-np.abs(gamma)**2
+        nu = self.fsr*np.angle(gamma)/(2*C.pi)
+        return gamma, loss, nu, modes
+
+
+def calculate_spherical_height(x, y, roc):
+    """
+    计算球面腔面的高度，roc>0为凹面
+    :param x: x坐标
+    :param y: y坐标
+    :param roc: 曲率半径
+    :return: 腔面高度，指向腔内为正
+    """
+    r2 = np.asarray(x)**2+np.asarray(y)**2
+    return r2/(roc+np.sign(roc)*np.sqrt(np.maximum(roc**2-r2, 0)))
+
+
+def calculate_gaussian_dimple_height(x, y, depth, omega):
+    """
+    计算高斯形凹坑腔面的高度h = depth*(1-exp(-r^2/omega^2))，例如CO2激光加工的光纤端面。
+    中心附近等价于曲率半径omega^2/(2*depth)的球面
+    :param x: x坐标
+    :param y: y坐标
+    :param depth: 凹坑深度
+    :param omega: 凹坑的1/e半径
+    :return: 腔面高度，指向腔内为正
+    """
+    r2 = np.asarray(x)**2+np.asarray(y)**2
+    return depth*(1-np.exp(-r2/omega**2))
@@ -1,30 +1,51 @@
 """
 用于描述F-P cavity行为的模块。此模块定义的所有腔面都是圆形或平面的，即可以使用曲率半径
-描述整个腔面。其他情况的腔面通常没有理论解，需要进行数值模拟。
+描述整个腔面。其他情况的腔面通常没有理论解，需要进行数值模拟，见foxli模块。
 """
 
 
-import logging
 import numpy as np
 from scipy import constants as C
-from ._utils import PrintableObject
-from .hgbeam import EqualHGBeam
-from .misc import RTL, Position
+from scipy import special
+from scipy import stats
+from ._utils import PrintableObject, map_chunks
+from .hgbeam import EqualHGBeam, HGBeam, calculate_hg_overlaps, hermite_peak, hermite_functions
+from .misc import RTL, Position, diagnostics
+from .extension.fcqs import calculate_eta_fccoupling
 
 __all__ = [
     'CavityStructure', 'SymmetricCavityStructure',
     'Cavity', 'SymmetricCavity',
-    'CavityMode', 'SymmetricCavityMode',
+    'CavityMode', 'SymmetricCavityMode', 'AstigmaticCavityMode',
     'get_available_wavelengthf', 'get_available_wavelength',
-    'judge_cavity_type',
-    'calculate_loss_clipping', 'calculate_loss_scattering'
+    'get_mode_spectrum', 'get_resonant_length', 'calculate_gouy_phase',
+    'get_mirror_phasef', 'calculate_coating_phase',
+    'calculate_mode_volume', 'calculate_mode_quantities', 'calculate_coupling_spectrum', 'calculate_astigmatic_splitting',
+    'judge_cavity_type', 'calculate_stability_map', 'calculate_stability_map_g',
+    'extract_linewidth', 'calculate_cavity_loss', 'calculate_misaligned_axis',
+    'calculate_loss_clipping', 'calculate_loss_clipping_hg', 'calculate_loss_scattering',
+    'calculate_mirror_reflectivity', 'calculate_loss_budget'
 ]
 
 
 class CavityStructure(PrintableObject):
+    """
+    此类描述了两个腔镜组成的腔的几何结构。左右腔镜顶点的标称位置为z=-length/2与z=length/2，
+    腔镜可以在xz平面内横向偏移与倾斜，此时腔的光轴为过两个腔镜曲率中心的直线，
+    见calculate_misaligned_axis。
+
+    此类可以通过以下属性构建：
+        length - 腔长
+        rocl - 左腔镜曲率半径
+        rocr - 右腔镜曲率半径
+        xl - 左腔镜的横向偏移，默认为0
+        xr - 右腔镜的横向偏移，默认为0
+        thetal - 左腔镜对称轴的倾角，默认为0
+        thetar - 右腔镜对称轴的倾角，默认为0
+    """
     name = "CavityStructure"
 
-    modifiable_properties = ('length', 'rocl', 'rocr')
+    modifiable_properties = ('length', 'rocl', 'rocr', 'xl', 'xr', 'thetal', 'thetar')
 
     def __init__(self, name="CavityStructure", **kwargs):
         super().__init__(**kwargs)
@@ -50,6 +71,42 @@ class CavityStructure(PrintableObject):
         """右腔镜曲率半径[L]"""
         return self.get_property('rocr')
 
+    @property
+    def xl(self):
+        """左腔镜的横向偏移[L]"""
+        return self.get_property('xl', lambda: 0)
+
+    @property
+    def xr(self):
+        """右腔镜的横向偏移[L]"""
+        return self.get_property('xr', lambda: 0)
+
+    @property
+    def thetal(self):
+        """左腔镜对称轴的倾角[1]"""
+        return self.get_property('thetal', lambda: 0)
+
+    @property
+    def thetar(self):
+        """右腔镜对称轴的倾角[1]"""
+        return self.get_property('thetar', lambda: 0)
+
+    @property
+    def axis(self):
+        """腔的光轴{'theta', 'x0', 'sl', 'sr', 'length'}，见calculate_misaligned_axis"""
+        return self.get_property('axis', lambda: calculate_misaligned_axis(
+            self.length, self.rocl, self.rocr, self.xl, self.xr, self.thetal, self.thetar))
+
+    @property
+    def sl(self):
+        """光轴在左腔面上的交点相对于腔镜中心的偏移[L]"""
+        return self.get_property('sl', lambda: self.axis['sl'])
+
+    @property
+    def sr(self):
+        """光轴在右腔面上的交点相对于腔镜中心的偏移[L]"""
+        return self.get_property('sr', lambda: self.axis['sr'])
+
     @property
     def gl(self):
         """左腔镜g因子[1]"""
@@ -77,7 +134,7 @@ class CavityStructure(PrintableObject):
 class SymmetricCavityStructure(CavityStructure):
     name = "SymmetricCavityStructure"
 
-    modifiable_properties = ('length', 'roc')
+    modifiable_properties = ('length', 'roc', 'xl', 'xr', 'thetal', 'thetar')
 
     def __init__(self, name="SymmetricCavityStructure", **kwargs):
         roc = kwargs.get('roc', None)
@@ -111,7 +168,8 @@ class Cavity(CavityStructure):
     name = "Cavity"
 
     modifiable_properties = ('length', 'nc', 'lc', 'rocl',
-                             'rocr', 'rl', 'tl', 'll', 'rr', 'tr', 'lr')
+                             'rocr', 'rl', 'tl', 'll', 'rr', 'tr', 'lr',
+                             'xl', 'xr', 'thetal', 'thetar')
 
     def __init__(self, name="Cavity", **kwargs):
         kwargs.update(nc=kwargs.get('nc', 1))  # default air medium
@@ -211,16 +269,18 @@ class Cavity(CavityStructure):
     def kappa(self):
         """透射曲线半高半宽(圆频率)[1/T]"""
         def v_f():
-            if np.sqrt(self.rl*self.rr) < 0.9 or (self.lc > 0.01):
-                logging.warning("The reflectivity of the cavity mirror is too low, or the loss of cavity is too high, "
-                                "so the deviation of the `kappa` calculated by this approximate formula is large.")
-            return C.c*(2-(1-self.lc)*(self.rl+self.rr))/(4*self.length)
+            if np.any((np.sqrt(self.rl*self.rr) < 0.9) | (self.lc > 0.01)):
+                diagnostics.warn('kappa', "The reflectivity of the cavity mirror is too low, or the loss of cavity is too high, "
+                                 "so the deviation of the `kappa` calculated by this approximate formula is large. "
+                                 "Use `calculate_cavity_loss` for the exact values.",
+                                 rl=self.rl, rr=self.rr, lc=self.lc)
+            return C.c*(2-(1-self.lc)*(self.rl+self.rr))/(4*self.nc*self.length)
         return self.get_property('kappa', v_f)
 
     @property
     def fsr(self):
         """FSR(圆频率)[1/T]"""
-        return self.get_property('fsr', lambda: 2*C.pi*C.c/(2*self.length))
+        return self.get_property('fsr', lambda: 2*C.pi*C.c/(2*self.nc*self.length))
 
     @property
     def finesse(self):
@@ -232,12 +292,70 @@ class Cavity(CavityStructure):
         """品质因子[1]"""
         return self.get_property('q', lambda: C.pi*self.nu/(self.kappa))
 
+    def __roundtrip_phase(self, delta):
+        """失谐delta(圆频率)对应的往返相位"""
+        return 2*self.nc*self.length*delta/C.c
+
+    def __spectrum(self, f, delta, chunksize, workers):
+        # 短数组直接计算，长数组分块并行计算
+        if np.size(delta) <= chunksize:
+            return f(np.asarray(delta, dtype=float))
+        return map_chunks(f, delta, chunksize=chunksize, workers=workers)
+
+    def transmission_f(self, delta, chunksize=1 << 16, workers=None):
+        """
+        精确的Airy透射谱，不使用高精细度近似
+        :param delta: 相对于共振频率的失谐(圆频率)
+        :param chunksize: 分块计算时每块的点数
+        :param workers: 分块计算的线程数
+        :return: 透射率
+        """
+        g = np.sqrt(self.rl*self.rr)*(1-self.lc)
+        t = self.tl*self.tr*(1-self.lc)
+
+        def f(d):
+            return t/(1+g**2-2*g*np.cos(self.__roundtrip_phase(d)))
+        return self.__spectrum(f, delta, chunksize, workers)
+
+    def reflection_f(self, delta, chunksize=1 << 16, workers=None):
+        """
+        精确的Airy反射谱(从左腔镜入射)
+        :param delta: 相对于共振频率的失谐(圆频率)
+        :param chunksize: 分块计算时每块的点数
+        :param workers: 分块计算的线程数
+        :return: 反射率
+        """
+        g = np.sqrt(self.rl*self.rr)*(1-self.lc)
+        a = np.sqrt(self.rl)
+        b = np.sqrt(self.rr)*(1-self.lc)*(self.rl+self.tl)
+
+        def f(d):
+            c = np.cos(self.__roundtrip_phase(d))
+            return (a**2+b**2-2*a*b*c)/(1+g**2-2*g*c)
+        return self.__spectrum(f, delta, chunksize, workers)
+
+    def intracavity_f(self, delta, chunksize=1 << 16, workers=None):
+        """
+        精确的腔内循环功率谱(从左腔镜入射，以入射功率为单位)
+        :param delta: 相对于共振频率的失谐(圆频率)
+        :param chunksize: 分块计算时每块的点数
+        :param workers: 分块计算的线程数
+        :return: 腔内循环功率
+        """
+        g = np.sqrt(self.rl*self.rr)*(1-self.lc)
+        t = self.tl
+
+        def f(d):
+            return t/(1+g**2-2*g*np.cos(self.__roundtrip_phase(d)))
+        return self.__spectrum(f, delta, chunksize, workers)
+
 
 class SymmetricCavity(SymmetricCavityStructure, Cavity):
     name = "SymmetricCavity"
 
     modifiable_properties = ('length', 'nc', 'lc', 'roc',
-                             'rl', 'tl', 'll', 'rr', 'tr', 'lr')
+                             'rl', 'tl', 'll', 'rr', 'tr', 'lr',
+                             'xl', 'xr', 'thetal', 'thetar')
 
     def __init__(self, name="SymmetricCavity", **kwargs):
         roc = kwargs.get('roc', None)
@@ -251,7 +369,8 @@ class CavityMode(CavityStructure, EqualHGBeam, Position):
     name = 'CavityMode'
 
     modifiable_properties = ('length', 'wavelength',
-                             'rocl', 'rocr', 'a0', 'position', 'mx', 'my', 'xi')
+                             'rocl', 'rocr', 'a0', 'position', 'mx', 'my', 'xi',
+                             'xl', 'xr', 'thetal', 'thetar')
 
     def __init__(self, name="CavityMode", **kwargs):
         kwargs.update(a0=kwargs.get('a0', 1))
@@ -318,6 +437,16 @@ class CavityMode(CavityStructure, EqualHGBeam, Position):
         """等价基模束腰半径[L]"""
         return self.get_property('omega0', lambda: np.sqrt(self.wavelength*self.z0/C.pi))
 
+    @property
+    def omega0x(self):
+        """x方向等价基模束腰半径[L]"""
+        return self.get_property('omega0x', lambda: self.omega0)
+
+    @property
+    def omega0y(self):
+        """y方向等价基模束腰半径[L]"""
+        return self.get_property('omega0y', lambda: self.omega0)
+
     @property
     def omegaml(self):
         """左腔面模场半径[L]"""
@@ -328,34 +457,32 @@ class CavityMode(CavityStructure, EqualHGBeam, Position):
         """右腔面模场半径[L]"""
         return self.get_property('omegamr', lambda: self.omega0*np.sqrt(1+(self.pr/self.z0)**2))
 
-    # 模式体积(小NA近似)
     @property
     def v_mode(self):
-        """模式体积[L^3]"""
-        def v_f():
-            if self.mx > 0:
-                cx = (6.927*self.mx-2.104)**(1/6)
-                logging.warning(
-                    "mx > 0, mode volumn is computed by an approximation")
-            else:
-                cx = 1
-            if self.my > 0:
-                cy = (6.927*self.my-2.104)**(1/6)
-                logging.warning(
-                    "my > 0, mode volumn is computed by an approximation")
-            else:
-                cy = 1
-            if (self.pl < 0) or (self.pr < 0):
-                logging.warning("The waist is not in the cavity,"
-                                "so the calculated mode volume is slightly different.")
-            return cx*cy*self.length*(self.omega0)**2*C.pi/4
-        return self.get_property('v_mode', v_f)
+        """模式体积，高阶模以及束腰在腔外时同样精确，见calculate_mode_volume[L^3]"""
+        return self.get_property('v_mode', lambda: calculate_mode_volume(
+            self.length, self.rocl, self.rocr, self.wavelength, self.mx, self.my))
+
+    @property
+    def xi(self):
+        """驻波的附加相位[1]"""
+        return self.get_property('xi', lambda: 0)
 
     @property
     def e(self):
         """单光子电场强度[ML/T^3I]"""
         return self.get_property('e', lambda: np.sqrt(C.h*self.nu/(2*C.epsilon_0*self.v_mode)))
 
+    @property
+    def dx(self):
+        """束腰处光轴的x方向偏移，由腔镜的偏移与倾斜决定[L]"""
+        return self.get_property('dx', lambda: self.axis['x0']+np.tan(self.axis['theta'])*(self.p0-self.position))
+
+    @property
+    def thetax(self):
+        """光轴在xz平面内的倾角，由腔镜的偏移与倾斜决定[1]"""
+        return self.get_property('thetax', lambda: self.axis['theta'])
+
     def u_f(self, z, x, y):
         ampl, phase = super().u_f(z, x, y)
         return ampl, np.cos(phase-self.xi-self.k*z)
@@ -365,7 +492,8 @@ class SymmetricCavityMode(SymmetricCavityStructure, CavityMode):
     name = "SymmetricCavityMode"
 
     modifiable_properties = ('length', 'wavelength',
-                             'roc', 'a0', 'position', 'mx', 'my', 'xi')
+                             'roc', 'a0', 'position', 'mx', 'my', 'xi',
+                             'xl', 'xr', 'thetal', 'thetar')
 
     def __init__(self, name="SymmetricCavityMode", **kwargs):
         roc = kwargs.get('roc', None)
@@ -410,33 +538,177 @@ class SymmetricCavityMode(SymmetricCavityStructure, CavityMode):
         return self.get_property('omegam', self.omega0*np.sqrt(1+(self.length/2 / self.z0)**2))
 
 
-def get_available_wavelengthf(length, rocl, rocr, mx, my):
+class AstigmaticCavityMode(HGBeam, Position):
+    """
+    此类描述了腔镜在x、y方向曲率半径不同(例如激光加工的椭圆光纤腔面)时的腔模。两个方向的
+    束腰位置与大小不同，x、y方向的腔参数作为长度为2的数组一次计算。不同方向的Gouy相位不同，
+    使同一阶数mx+my的横模发生与偏振无关的劈裂。腔的中心位于position。
+
+    此类可以通过以下属性构建：
+        length - 腔长
+        wavelength - 波长
+        roclx - 左腔镜x方向曲率半径
+        rocly - 左腔镜y方向曲率半径
+        rocrx - 右腔镜x方向曲率半径
+        rocry - 右腔镜y方向曲率半径
+        a0 - 幅度，默认为1
+        position - 腔的中心位置
+        mx - x方向模式数，默认为0
+        my - y方向模式数，默认为0
+        xi - 驻波的附加相位，默认为0
     """
-    获取满足腔相位条件的波长函数
+    name = 'AstigmaticCavityMode'
+
+    modifiable_properties = ('length', 'wavelength', 'roclx', 'rocly', 'rocrx', 'rocry',
+                             'a0', 'position', 'mx', 'my', 'xi')
+
+    def __init__(self, name="AstigmaticCavityMode", **kwargs):
+        kwargs.update(a0=kwargs.get('a0', 1))
+        kwargs.update(mx=kwargs.get('mx', 0))
+        kwargs.update(my=kwargs.get('my', 0))
+
+        super().__init__(**kwargs)
+        self.name = name
+
+        self.property_set.reset_required(
+            AstigmaticCavityMode.modifiable_properties)
+
+        for prop in ('length', 'roclx', 'rocly', 'rocrx', 'rocry', 'xi'):
+            self.property_set[prop] = kwargs.get(prop, None)
+
+    @property
+    def length(self):
+        """腔长[L]"""
+        return self.get_property('length')
+
+    @property
+    def roclx(self):
+        """左腔镜x方向曲率半径[L]"""
+        return self.get_property('roclx')
+
+    @property
+    def rocly(self):
+        """左腔镜y方向曲率半径[L]"""
+        return self.get_property('rocly')
+
+    @property
+    def rocrx(self):
+        """右腔镜x方向曲率半径[L]"""
+        return self.get_property('rocrx')
+
+    @property
+    def rocry(self):
+        """右腔镜y方向曲率半径[L]"""
+        return self.get_property('rocry')
+
+    @property
+    def axes(self):
+        """x、y方向的腔参数{'z0', 'pl', 'pr', 'zeta'}，每项为(x, y)数组"""
+        def v_f():
+            length = self.length
+            rocl = np.array([self.roclx, self.rocly], dtype=float)
+            rocr = np.array([self.rocrx, self.rocry], dtype=float)
+            geometry = _calculate_mode_geometry(length, rocl, rocr, self.wavelength)
+            return {'z0': geometry['z0'], 'pl': geometry['pl'], 'pr': geometry['pr'],
+                    'zeta': calculate_gouy_phase(length, rocl, rocr)}
+        return self.get_property('axes', v_f)
+
+    @property
+    def p0x(self):
+        """x方向束腰位置[L]"""
+        return self.get_property('p0x', lambda: (self.axes['pl'][0]-self.axes['pr'][0])/2+self.position)
+
+    @property
+    def p0y(self):
+        """y方向束腰位置[L]"""
+        return self.get_property('p0y', lambda: (self.axes['pl'][1]-self.axes['pr'][1])/2+self.position)
+
+    @property
+    def p0(self):
+        """两个方向束腰位置的平均值，作为光轴失调的参考位置[L]"""
+        return self.get_property('p0', lambda: (self.p0x+self.p0y)/2)
+
+    @property
+    def omega0x(self):
+        """x方向等价基模束腰半径[L]"""
+        return self.get_property('omega0x', lambda: np.sqrt(self.wavelength*self.axes['z0'][0]/C.pi))
+
+    @property
+    def omega0y(self):
+        """y方向等价基模束腰半径[L]"""
+        return self.get_property('omega0y', lambda: np.sqrt(self.wavelength*self.axes['z0'][1]/C.pi))
+
+    @property
+    def omegamlx(self):
+        """左腔面x方向模场半径[L]"""
+        return self.get_property('omegamlx', lambda: self.omegax_f(self.position-self.length/2))
+
+    @property
+    def omegamly(self):
+        """左腔面y方向模场半径[L]"""
+        return self.get_property('omegamly', lambda: self.omegay_f(self.position-self.length/2))
+
+    @property
+    def omegamrx(self):
+        """右腔面x方向模场半径[L]"""
+        return self.get_property('omegamrx', lambda: self.omegax_f(self.position+self.length/2))
+
+    @property
+    def omegamry(self):
+        """右腔面y方向模场半径[L]"""
+        return self.get_property('omegamry', lambda: self.omegay_f(self.position+self.length/2))
+
+    @property
+    def zetax(self):
+        """x方向单程Gouy相位[1]"""
+        return self.get_property('zetax', lambda: self.axes['zeta'][0])
+
+    @property
+    def zetay(self):
+        """y方向单程Gouy相位[1]"""
+        return self.get_property('zetay', lambda: self.axes['zeta'][1])
+
+    @property
+    def xi(self):
+        """驻波的附加相位[1]"""
+        return self.get_property('xi', lambda: 0)
+
+    @property
+    def splitting(self):
+        """(mx+1, my)与(mx, my+1)模式的频率差[1/T]"""
+        return self.get_property('splitting', lambda: C.c/(2*self.length)*(self.zetax-self.zetay)/C.pi)
+
+    def u_f(self, z, x, y):
+        ampl, phase = super().u_f(z, x, y)
+        return ampl, np.cos(phase-self.xi-self.k*z)
+
+
+def get_available_wavelengthf(length, rocl, rocr, mx, my, phase=None, nc=1):
+    """
+    获取满足腔相位条件的(真空)波长函数，腔介质的折射率为nc时自由光谱范围为c/(2*nc*L)，
+    与get_mode_spectrum相同。phase为两个腔镜的反射相位之和phase(nu)(nu=c/wavelength)，
+    以理想反射镜(反射系数为-1)为参考，例如介质膜的穿透深度使相位随频率增大。此时相位条件
+    2*nc*L/wavelength = p+(mx+my+1)*zeta/pi-phase(nu)/(2*pi)使用不动点迭代求解
     :param length: 腔长
     :param rocl: 左边腔镜ROC
     :param rocR: 右边腔镜ROC
     :param mx: x方向模式数
     :param my: y方向模式数
-    :return: func(p) -> wavelength 用于计算每个横模级数对应的波长的函数
+    :param phase: 腔镜反射相位之和的函数，可以由get_mirror_phasef得到，默认为None，即腔面决定相位长度
+    :param nc: 腔介质的折射率
+    :return: func(p) -> wavelength 用于计算每个横模级数对应的波长的函数，p可以是数组
     """
-    gl, gr = 1-length/rocl, 1-length/rocr
-    glgr = gl*gr
-    gs = gl+gr-2*glgr
-
-    if gs == 0:
-        z0 = pl = pr = length/2
-    else:
-        pl = gr*(1-gl)/gs*length
-        pr = gl*(1-gr)/gs*length
-        z0 = np.sqrt(glgr*(1-glgr)/gs**2)*length
+    zeta = calculate_gouy_phase(length, rocl, rocr)
 
     def func(p):
-        return 2*np.pi*length/(p*np.pi+(mx+my+1)*(np.arctan(pl/z0)+np.arctan(pr/z0)))
+        if phase is None:
+            return 2*np.pi*nc*length/(p*np.pi+(mx+my+1)*zeta)
+        fsr = C.c/(2*nc*length)
+        return C.c/_solve_resonance(fsr*(np.asarray(p)+(mx+my+1)*zeta/C.pi), fsr, phase)
     return func
 
 
-def get_available_wavelength(wavelength0, length, rocl, rocr, mx, my):
+def get_available_wavelength(wavelength0, length, rocl, rocr, mx, my, phase=None, nc=1):
     """
     获取满足腔相位条件的波长
     :param wavelength0: 所要接近的波长
@@ -445,26 +717,19 @@ def get_available_wavelength(wavelength0, length, rocl, rocr, mx, my):
     :param rocR: 右边腔镜ROC
     :param mx: x方向模式数
     :param my: y方向模式数
-    :return: (p, wavelength) (纵模模式，满足条件的波长)
+    :param phase: 腔镜反射相位之和的函数phase(nu)，见get_available_wavelengthf
+    :param nc: 腔介质的折射率
+    :return: (p, wavelength) (纵模模式，满足条件的真空波长)
     """
-    gl, gr = 1-length/rocl, 1-length/rocr
-    glgr = gl*gr
-    gs = gl+gr-2*glgr
+    zeta = calculate_gouy_phase(length, rocl, rocr)
 
-    if gs == 0:
-        z0 = pl = pr = length/2
-    else:
-        pl = gr*(1-gl)/gs*length
-        pr = gl*(1-gr)/gs*length
-        z0 = np.sqrt(glgr*(1-glgr)/gs**2)*length
+    p = 2*nc*length/wavelength0-(mx+my+1)*zeta/np.pi
+    if phase is not None:
+        p += phase(C.c/wavelength0)/(2*np.pi)
+    p = int(p)
 
-    p = int(2*length/wavelength0-(mx+my+1) *
-            (np.arctan(pl/z0)+np.arctan(pr/z0))/np.pi)
-
-    wavelength1 = 2*np.pi*length / \
-        (p*np.pi+(mx+my+1)*(np.arctan(pl/z0)+np.arctan(pr/z0)))
-    wavelength2 = 2*np.pi*length / \
-        ((p+1)*np.pi+(mx+my+1)*(np.arctan(pl/z0)+np.arctan(pr/z0)))
+    func = get_available_wavelengthf(length, rocl, rocr, mx, my, phase=phase, nc=nc)
+    wavelength1, wavelength2 = func(p), func(p+1)
 
     if abs(wavelength1-wavelength0) < abs(wavelength2-wavelength0):
         return p, wavelength1
@@ -472,6 +737,337 @@ def get_available_wavelength(wavelength0, length, rocl, rocr, mx, my):
         return p+1, wavelength2
 
 
+def get_mode_spectrum(length, rocl, rocr, nmax, nu_min, nu_max, kappa=0, nc=1, phase=None):
+    """
+    获取腔在频带[nu_min, nu_max]内的共振谱，包括所有纵模以及mx+my<=nmax的横模，并标记近简并的模式。
+    共振频率只与纵模级数p和横模阶数mx+my有关，Gouy相位只计算一次，整个谱以数组方式得到。
+    给出腔镜反射相位phase时，所有共振频率一起进行不动点迭代，phase只需要支持数组输入。
+    length、rocl、rocr、kappa、nc可以是相互广播的数组(例如腔长扫描)，此时结果在前面增加扫描维度，
+    最后一维的长度为各扫描点中模式数的最大值；模式数较少的扫描点在末尾补齐，补齐处nu为nan，
+    p、mx、my为-1，degenerate为False。参数都为标量时结果是一维数组，不含补齐。
+    :param length: 腔长
+    :param rocl: 左边腔镜ROC
+    :param rocr: 右边腔镜ROC
+    :param nmax: 最高横模阶数mx+my
+    :param nu_min: 频带下限
+    :param nu_max: 频带上限
+    :param kappa: 透射曲线半高半宽(圆频率)，如Cavity.kappa。(p, mx+my)不同的两组模式频率差小于
+                  一个线宽(半高全宽kappa/pi)时认为它们近简并。默认为0，即只标记严格简并
+    :param nc: 腔介质的折射率
+    :param phase: 腔镜反射相位之和的函数phase(nu)，见get_available_wavelengthf
+    :return: (nu, p, mx, my, degenerate) 按频率排序的共振频率、纵模级数、横模模式数以及近简并标记
+    """
+    length, rocl, rocr, kappa, nc = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (length, rocl, rocr, kappa, nc)))
+    shape = length.shape
+    zeta = calculate_gouy_phase(length, rocl, rocr)
+    fsr = C.c/(2*nc*length)
+
+    order = np.arange(nmax+1)
+    offset = (order+1)*np.asarray(zeta)[..., None]/C.pi
+    # 反射相位使共振频率移动，纵模级数的范围相应扩大；扫描时取覆盖所有扫描点的范围
+    margin = 0
+    if phase is not None:
+        margin = int(np.ceil(np.max(np.abs(phase(np.array([nu_min, nu_max]))))/(2*C.pi)))+1
+    p = np.arange(np.floor(np.min(nu_min/fsr-offset[..., -1]))-margin,
+                  np.ceil(np.max(nu_max/fsr))+margin+1, dtype=int)
+    levels = fsr[..., None, None]*(p[:, None]+offset[..., None, :])
+    if phase is not None:
+        levels = _solve_resonance(levels, fsr[..., None, None], phase)
+    levels = np.where((levels >= nu_min) & (levels <= nu_max), levels, np.nan)
+
+    # 按频率排序，频带外的(nan)排在末尾并去掉所有扫描点都在频带外的部分
+    levels = levels.reshape(shape+(-1,))
+    isort = np.argsort(levels, axis=-1, kind='stable')
+    levels = np.take_along_axis(levels, isort, axis=-1)
+    ip, iorder = isort//(nmax+1), isort % (nmax+1)
+    k = np.max(np.sum(~np.isnan(levels), axis=-1), initial=0)
+    levels, ip, iorder = levels[..., :k], ip[..., :k], iorder[..., :k]
+
+    # 按(p, mx+my)分组判断近简并
+    with np.errstate(invalid='ignore'):
+        close = np.diff(levels, axis=-1) <= kappa[..., None]/C.pi+1e-12*levels[..., 1:]
+    degenerate = np.zeros(levels.shape, dtype=bool)
+    degenerate[..., 1:] |= close
+    degenerate[..., :-1] |= close
+
+    # 每组展开为(mx, my)，mx从0到mx+my，再把有效的模式移到前面
+    mx = np.broadcast_to(order, levels.shape+(nmax+1,))
+    my = iorder[..., None]-mx
+    valid = (my >= 0) & ~np.isnan(levels)[..., None]
+    mx, my, valid = (v.reshape(shape+(-1,)) for v in (mx, my, valid))
+    igroup = np.broadcast_to(np.arange(k).repeat(nmax+1), valid.shape)
+
+    imode = np.argsort(~valid, axis=-1, kind='stable')
+    n = np.max(np.sum(valid, axis=-1), initial=0)
+    valid, igroup, mx, my = (np.take_along_axis(v, imode[..., :n], axis=-1) for v in (valid, igroup, mx, my))
+
+    def take(v, fill):
+        return np.where(valid, np.take_along_axis(v, igroup, axis=-1), fill)
+    return (take(levels, np.nan), take(p[ip], -1), np.where(valid, mx, -1), np.where(valid, my, -1),
+            take(degenerate, False))
+
+
+def get_resonant_length(length0, wavelength, rocl, rocr, mx, my, dp=0, rtol=1e-15, maxiter=50, phase=None,
+                        nc=1):
+    """
+    获取在腔长length0附近使(mx, my)模式对波长wavelength共振的腔长，所有参数可以是相互广播的数组。
+    相位条件2*nc*L/wavelength = p+(mx+my+1)*zeta(L)/pi中，左边随腔长的变化远快于Gouy相位项，
+    因此固定p后L = wavelength/(2*nc)*(p+(mx+my+1)*zeta(L)/pi)是压缩映射，迭代几次即可收敛，
+    不需要对每个点调用通用的求根函数。
+    :param length0: 所要接近的腔长
+    :param wavelength: 目标波长
+    :param rocl: 左边腔镜ROC
+    :param rocr: 右边腔镜ROC
+    :param mx: x方向模式数
+    :param my: y方向模式数
+    :param dp: 相对于最接近的纵模级数的偏移，例如np.arange(-2, 3)可得到附近的5个共振腔长
+    :param rtol: 迭代收敛的相对误差
+    :param maxiter: 最大迭代次数
+    :param phase: 腔镜反射相位之和的函数phase(nu)，见get_available_wavelengthf。波长固定，
+                  因此反射相位只需要计算一次
+    :param nc: 腔介质的折射率
+    :return: (p, length) (纵模级数，共振腔长)
+    """
+    length0 = np.asarray(length0, dtype=float)
+    order = np.asarray(mx)+np.asarray(my)+1
+    shift = 0 if phase is None else phase(C.c/np.asarray(wavelength))/(2*C.pi)
+    zeta = calculate_gouy_phase(length0, rocl, rocr)
+    half = np.asarray(wavelength)/(2*nc)
+    p = np.rint(length0/half-order*zeta/C.pi+shift).astype(int)+dp
+
+    length = half*(p+order*zeta/C.pi-shift)
+    for _ in range(maxiter):
+        zeta = calculate_gouy_phase(length, rocl, rocr)
+        length, length_prev = half*(p+order*zeta/C.pi-shift), length
+        if np.all(np.abs(length-length_prev) <= rtol*np.abs(length)):
+            break
+
+    return p, length
+
+
+def _solve_resonance(nu, fsr, phase, rtol=1e-15, maxiter=50):
+    """
+    求解含腔镜反射相位的共振频率nu = nu0-fsr*phase(nu)/(2*pi)，nu0为不含反射相位的共振频率。
+    穿透深度小于腔长时迭代为压缩映射
+    """
+    nu0 = np.asarray(nu, dtype=float)
+    nu = nu0
+    for _ in range(maxiter):
+        nu, nu_prev = nu0-fsr*phase(nu)/(2*C.pi), nu
+        if np.all(np.abs(nu-nu_prev) <= rtol*np.abs(nu)):
+            break
+    return nu
+
+
+def get_mirror_phasef(nu, phase):
+    """
+    获取由表格插值的腔镜反射相位函数。表格只需预先计算一次(例如calculate_coating_phase的结果)，
+    之后每次调用都是数组插值。相位先沿频率展开(unwrap)，相位的2pi整数倍只改变纵模级数
+    :param nu: 单调递增的频率表
+    :param phase: 对应的反射相位表
+    :return: func(nu) -> phase 可传递给get_available_wavelengthf等函数的phase参数
+    """
+    nu = np.asarray(nu, dtype=float)
+    phase = np.unwrap(np.asarray(phase, dtype=float))
+
+    def func(x):
+        return np.interp(x, nu, phase)
+    return func
+
+
+def calculate_coating_phase(nu, nu0, nh, nl, npairs, ns=1.45, nc=1):
+    """
+    使用特征矩阵方法计算四分之一波堆介质膜(从腔内一侧起为高折射率层)的反射相位，以理想反射镜
+    (反射系数为-1)为参考，因此中心频率处相位为0，相位对频率的斜率给出穿透深度
+    L_pen = c/(4*pi)*dphase/dnu，中心频率处约为c/nu0/(4*(nh-nl))。计算对频率向量化
+    :param nu: 频率，可以是数组
+    :param nu0: 膜系的中心频率
+    :param nh: 高折射率层的折射率
+    :param nl: 低折射率层的折射率
+    :param npairs: 高低折射率层的对数
+    :param ns: 基底的折射率
+    :param nc: 腔介质的折射率
+    :return: 反射相位
+    """
+    nu = np.asarray(nu, dtype=float)
+    delta = C.pi/2*nu/nu0
+    cos, sin = np.cos(delta), np.sin(delta)
+
+    m = np.zeros(nu.shape+(2, 2), dtype=complex)
+    m[..., 0, 0] = m[..., 1, 1] = 1
+    for n in (nh, nl)*npairs:
+        layer = np.empty(nu.shape+(2, 2), dtype=complex)
+        layer[..., 0, 0] = layer[..., 1, 1] = cos
+        layer[..., 0, 1] = -1j*sin/n
+        layer[..., 1, 0] = -1j*n*sin
+        m = m@layer
+
+    b = m[..., 0, 0]+m[..., 0, 1]*ns
+    c = m[..., 1, 0]+m[..., 1, 1]*ns
+    return np.angle(-(nc*b-c)/(nc*b+c))[()]
+
+
+def calculate_gouy_phase(length, rocl, rocr):
+    """
+    计算腔内基模单程的Gouy相位arctan(pl/z0)+arctan(pr/z0)，参数可以是数组
+    :param length: 腔长
+    :param rocl: 左边腔镜ROC
+    :param rocr: 右边腔镜ROC
+    :return: 单程Gouy相位
+    """
+    # gl+gr-2*gl*gr为0时z0=pl=pr=length/2，Gouy相位为pi/2
+    geometry = _calculate_mode_geometry(length, rocl, rocr, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (np.arctan(geometry['pl']/geometry['z0'])+np.arctan(geometry['pr']/geometry['z0']))[()]
+
+
+def calculate_mode_volume(length, rocl, rocr, wavelength, mx=0, my=0):
+    """
+    计算驻波腔模(mx, my)的模式体积V = int|E|^2 dV/|E|^2_max，参数可以是相互广播的数组。
+    驻波沿z方向的cos^2因子平均为1/2，每个横截面上的功率相同，因此对z的积分是解析的；
+    |E|^2_max位于腔内光斑最小处z*，横向最大值由归一化Hermite函数的峰值给出，于是
+    V = L*omega(z*)^2/(4*max(psi_mx^2)*max(psi_my^2))。基模且束腰在腔内时即为pi*omega0^2*L/4。
+    V/(wavelength*L^2/pi)只与(mx, my, gl, gr)有关，其中只与模式有关的Hermite峰值按模式数缓存，
+    与几何有关的部分直接做数组运算，因此对腔长或ROC扫描时缓存不会增长。
+    :param length: 腔长
+    :param rocl: 左边腔镜ROC
+    :param rocr: 右边腔镜ROC
+    :param wavelength: 波长
+    :param mx: x方向模式数
+    :param my: y方向模式数
+    :return: 模式体积
+    """
+    length = np.asarray(length, dtype=float)
+    gl, gr = 1-length/rocl, 1-length/rocr
+    scale = wavelength*length**2/C.pi
+    return (scale*_calculate_mode_volume_factor(gl, gr, mx, my))[()]
+
+
+def calculate_mode_quantities(length, rocl, rocr, wavelength, omegaf=None, nf=1.45):
+    """
+    以数组方式计算CavityMode的主要参数，参数可以是相互广播的数组，不满足稳定条件(包括临界腔)的腔结果为nan
+    :param length: 腔长
+    :param rocl: 左腔镜曲率半径
+    :param rocr: 右腔镜曲率半径
+    :param wavelength: 波长
+    :param omegaf: 光纤的模场半径，为None时不计算耦合效率
+    :param nf: 光纤的折射率
+    :return: {'omega0', 'omegaml', 'omegamr', 'v_mode', 'coupling'}，
+             coupling为左腔面处腔模与光纤模式的耦合效率
+    """
+    s, c, _, _, _ = calculate_stability_map(length, rocl, rocr)
+    geometry = _calculate_mode_geometry(length, rocl, rocr, wavelength)
+    omega0, omegaml, omegamr = (np.where(s & ~c, geometry[k], np.nan)[()]
+                                for k in ('omega0', 'omegaml', 'omegamr'))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v_mode = np.where(np.isnan(omega0), np.nan,
+                          calculate_mode_volume(length, rocl, rocr, wavelength))[()]
+    result = {'omega0': omega0, 'omegaml': omegaml, 'omegamr': omegamr, 'v_mode': v_mode}
+
+    if omegaf is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['coupling'] = calculate_eta_fccoupling(wavelength, nf, omegaf, rocl, omegaml)
+    return result
+
+
+def calculate_coupling_spectrum(beam, mode, n):
+    """
+    计算入射光耦合到腔模各个横模(mx, my)的功率比例，包括束腰大小与位置的失配以及入射光的偏移与倾斜。
+    投影在腔模的束腰平面上，由calculate_hg_overlaps的闭式递推得到，不需要网格积分。
+    光纤的出射光可以用束腰位于光纤端面、束腰半径为omegaf的GBeam描述。
+    :param beam: 入射光，例如HGBeam或GBeam，需要有wavelength、p0、omega0x、omega0y、mx、my属性，
+                 失调参数dx、dy、thetax、thetay可以是数组
+    :param mode: 腔模，例如CavityMode，使用其p0、omega0x、omega0y
+    :param n: 每个方向的最高横模阶数
+    :return: 形状为(n+1, n+1, *shape)的功率比例p[mx, my]
+    """
+    def overlaps(axis):
+        mi = getattr(beam, 'm'+axis)
+        d = getattr(beam, 'd'+axis, 0)
+        theta = getattr(beam, 'theta'+axis, 0)
+        dz = mode.p0-beam.p0
+        # 光轴在腔模束腰平面上的偏移
+        d = d+theta*dz
+        c = calculate_hg_overlaps(n, mi, beam.wavelength, getattr(mode, 'omega0'+axis),
+                                  getattr(beam, 'omega0'+axis), dz, d, theta)
+        return np.abs(c[:, mi])**2
+
+    # 模式维度放在最后，使两个方向的失调参数按通常的规则广播
+    px, py = np.moveaxis(overlaps('x'), 0, -1), np.moveaxis(overlaps('y'), 0, -1)
+    p = px[..., :, None]*py[..., None, :]
+    return np.moveaxis(p, (-2, -1), (0, 1))
+
+
+def calculate_astigmatic_splitting(length, roclx, rocly, rocrx, rocry, nc=1):
+    """
+    计算像散腔中(mx+1, my)与(mx, my+1)模式的频率差fsr*(zetax-zetay)/pi，它与偏振无关，
+    只来自两个方向Gouy相位的差。所有参数可以是相互广播的数组，例如扫描腔面的椭圆度。
+    :param length: 腔长
+    :param roclx: 左腔镜x方向曲率半径
+    :param rocly: 左腔镜y方向曲率半径
+    :param rocrx: 右腔镜x方向曲率半径
+    :param rocry: 右腔镜y方向曲率半径
+    :param nc: 腔介质的折射率
+    :return: 频率差
+    """
+    length, roclx, rocly, rocrx, rocry = np.broadcast_arrays(length, roclx, rocly, rocrx, rocry)
+    zeta = calculate_gouy_phase(length, np.stack((roclx, rocly)), np.stack((rocrx, rocry)))
+    return (C.c/(2*nc*length)*(zeta[0]-zeta[1])/C.pi)[()]
+
+
+def calculate_misaligned_axis(length, rocl, rocr, xl=0, xr=0, thetal=0, thetar=0):
+    """
+    计算腔镜在xz平面内横向偏移与倾斜时腔的光轴。左右腔镜顶点位于(xl, -length/2)与(xr, length/2)，
+    对称轴的方向为(sin(theta), cos(theta))，凹面朝向腔内时曲率半径为正。光轴为过两个曲率中心的
+    直线；平面镜的曲率中心在无穷远处，光轴垂直于平面镜并经过另一个腔镜的曲率中心。
+    所有参数可以是相互广播的数组，两个腔镜都是平面镜或曲率中心重合(共心腔)时结果为nan。
+    :param length: 腔长
+    :param rocl: 左腔镜曲率半径
+    :param rocr: 右腔镜曲率半径
+    :param xl: 左腔镜的横向偏移
+    :param xr: 右腔镜的横向偏移
+    :param thetal: 左腔镜对称轴的倾角
+    :param thetar: 右腔镜对称轴的倾角
+    :return: {'theta', 'x0', 'sl', 'sr', 'length'} 光轴的倾角、光轴在z=0处的横向位置、
+             光轴与左右腔面交点相对于腔镜中心的偏移(沿腔面切向)以及两个交点之间的距离
+    """
+    length, rocl, rocr, xl, xr, thetal, thetar = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (length, rocl, rocr, xl, xr, thetal, thetar)))
+    nlx, nlz, nrx, nrz = np.sin(thetal), np.cos(thetal), np.sin(thetar), np.cos(thetar)
+    plx, plz, prx, prz = xl, -length/2, xr, length/2
+    flatl, flatr = np.isinf(rocl), np.isinf(rocr)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # 曲率中心
+        clx, clz = plx+rocl*nlx, plz+rocl*nlz
+        crx, crz = prx-rocr*nrx, prz-rocr*nrz
+
+        # 光轴方向，取z分量为正
+        ux, uz = crx-clx, crz-clz
+        norm = np.hypot(ux, uz)*np.sign(uz)
+        ux, uz = ux/norm, uz/norm
+        ux, uz = np.where(flatl, nlx, ux), np.where(flatl, nlz, uz)
+        ux, uz = np.where(flatr, nrx, ux), np.where(flatr, nrz, uz)
+        ux, uz = np.where(flatl & flatr, np.nan, ux), np.where(flatl & flatr, np.nan, uz)
+
+        # 光轴与腔面的交点
+        hlx, hlz = clx-rocl*ux, clz-rocl*uz
+        hrx, hrz = crx+rocr*ux, crz+rocr*uz
+        t = (plx-crx)*nlx+(plz-crz)*nlz
+        hlx, hlz = np.where(flatl, crx+t*nlx, hlx), np.where(flatl, crz+t*nlz, hlz)
+        t = (prx-clx)*nrx+(prz-clz)*nrz
+        hrx, hrz = np.where(flatr, clx+t*nrx, hrx), np.where(flatr, clz+t*nrz, hrz)
+
+        sl = (hlx-plx)*nlz-(hlz-plz)*nlx
+        sr = (hrx-prx)*nrz-(hrz-prz)*nrx
+        x0 = hlx-hlz*ux/uz
+
+    return {'theta': np.arctan2(ux, uz)[()], 'x0': x0[()], 'sl': sl[()], 'sr': sr[()],
+            'length': np.hypot(hrx-hlx, hrz-hlz)[()]}
+
+
 def judge_cavity_type(length, rocl, rocr):
     """
     判断腔是否满足稳定条件，且判断是否为临界腔。注意临界腔虽然满足稳定条件，但是否稳定需要
@@ -494,14 +1090,126 @@ def judge_cavity_type(length, rocl, rocr):
     return s, c
 
 
-def calculate_loss_clipping(d, omegam):
+def calculate_stability_map_g(gl, gr, tol=1e-9):
+    """
+    以数组的方式判断由g因子描述的腔是否满足稳定条件以及是否为临界腔，适用于绘制(g1, g2)稳定图。
+    临界判断使用容差tol，而不是浮点数的严格相等。
+    :param gl: 左腔镜g因子
+    :param gr: 右腔镜g因子
+    :param tol: 判断gl*gr等于0或1时的容差
+    :return: (s, c, zr) s: 满足稳定条件的掩码(包括临界腔);
+                        c: 临界腔的掩码;
+                        zr: 以腔长为单位的瑞利长度，不满足稳定条件时为nan。
+             s & ~c 对应isStable()为True，c 对应isStable()为None。
+    """
+    gl, gr = np.broadcast_arrays(np.asarray(gl, dtype=float), np.asarray(gr, dtype=float))
+    glgr = gl*gr
+    gs = gl+gr-2*glgr
+
+    c = (np.abs(glgr) <= tol) | (np.abs(glgr-1) <= tol)
+    s = ((glgr >= 0) & (glgr <= 1)) | c
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zr = np.sqrt(np.abs(glgr*(1-glgr)))/np.abs(gs)
+    zr = np.where(np.abs(gs) <= tol, 1/2, zr)
+    zr = np.where(s, zr, np.nan)
+
+    return s, c, zr
+
+
+def calculate_stability_map(length, rocl, rocr, tol=1e-9):
+    """
+    以数组的方式判断腔是否满足稳定条件以及是否为临界腔，并同时给出g因子与瑞利长度。
+    适用于在(腔长, ROC)网格上绘制稳定图，所有参数可以相互广播。
+    :param length: 腔长
+    :param rocl: 左边腔镜ROC
+    :param rocr: 右边腔镜ROC
+    :param tol: 判断gl*gr等于0或1时的容差
+    :return: (s, c, gl, gr, z0) s: 满足稳定条件的掩码(包括临界腔);
+                                c: 临界腔的掩码;
+                                gl, gr: 左右腔镜g因子;
+                                z0: 瑞利长度，不满足稳定条件时为nan。
+    """
+    length = np.asarray(length, dtype=float)
+    gl, gr = 1-length/rocl, 1-length/rocr
+    s, c, zr = calculate_stability_map_g(gl, gr, tol=tol)
+    return s, c, gl, gr, zr*length
+
+
+def extract_linewidth(delta, spectrum):
+    """
+    从计算得到的谱线中提取共振峰的位置与半高半宽，半高处的位置由线性插值得到。
+    配合Cavity.transmission_f等精确谱使用时，低精细度的腔也不依赖近似公式。谱线在峰的某一侧
+    没有降到半高以下(扫描范围过窄或精细度过低)时抛出ValueError。
+    :param delta: 单调递增的失谐(圆频率)，需要包含一个完整的共振峰
+    :param spectrum: 谱线，例如透射率
+    :return: (delta0, kappa) 峰值位置与半高半宽(圆频率)，可以与Cavity.kappa直接比较，
+             精细度为Cavity.fsr/(2*kappa)
+    """
+    delta, spectrum = np.asarray(delta, dtype=float), np.asarray(spectrum, dtype=float)
+    i0 = np.argmax(spectrum)
+    half = spectrum[i0]/2
+
+    belowl = np.nonzero(spectrum[:i0] < half)[0]
+    belowr = np.nonzero(spectrum[i0:] < half)[0]
+    if len(belowl) == 0 or len(belowr) == 0:
+        raise ValueError("spectrum does not fall below half maximum on both sides of the peak, "
+                         "the scan window does not contain the full linewidth.")
+
+    il = belowl[-1]
+    dl = np.interp(half, spectrum[il:il+2], delta[il:il+2])
+
+    ir = i0+belowr[0]
+    dr = np.interp(half, spectrum[ir-1:ir+1][::-1], delta[ir-1:ir+1][::-1])
+
+    return delta[i0], (dr-dl)/2
+
+
+def calculate_cavity_loss(length, rl, rr, lc=0, nc=1, wavelength=None):
+    """
+    精确计算腔的损耗参数，不使用高精细度近似，参数可以是相互广播的数组。往返一次后场的幅度
+    变为g=sqrt(rl*rr)*(1-lc)倍(与Cavity.transmission_f相同)，往返时间为tau_rt=2*nc*length/c，
+    因此场的衰减速率为kappa=-ln(g)/tau_rt，光子寿命为1/(2*kappa)。精细度由Airy透射曲线的
+    半高全宽给出，即pi/(2*arcsin((1-g)/(2*sqrt(g))))，g<3-2*sqrt(2)时透射曲线没有半高点，
+    精细度为nan。高精细度时kappa与finesse都趋于Cavity.kappa与Cavity.finesse。
+    :param length: 腔长
+    :param rl: 左腔镜反射率
+    :param rr: 右腔镜反射率
+    :param lc: 腔有效单程损耗
+    :param nc: 腔介质的折射率
+    :param wavelength: 真空中的波长，给出时计算品质因子
+    :return: {'kappa', 'fsr', 'finesse', 'tau'}，给出wavelength时还包括'q'。
+             kappa与fsr为圆频率，q为omega/(2*kappa)
+    """
+    length, rl, rr, lc, nc = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (length, rl, rr, lc, nc)))
+    g = np.sqrt(rl*rr)*(1-lc)
+    taurt = 2*nc*length/C.c
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kappa = -np.log(g)/taurt
+        finesse = C.pi/(2*np.arcsin((1-g)/(2*np.sqrt(g))))
+
+    result = {'kappa': kappa[()], 'fsr': (2*C.pi/taurt)[()], 'finesse': finesse[()],
+              'tau': (1/(2*kappa))[()]}
+    if wavelength is not None:
+        result['q'] = (C.pi*C.c/wavelength/kappa)[()]
+    return result
+
+
+def calculate_loss_clipping(d, omegam, offset=0):
     """
-    计算腔面单次反射的clipping损耗
+    计算腔面单次反射的clipping损耗，即高斯光斑落在有效直径之外的功率比例。光斑中心相对于腔面
+    中心偏移offset时，损耗为Marcum Q函数Q1(2*offset/omegam, d/omegam)，使用非中心卡方分布的
+    生存函数计算。参数可以是相互广播的数组
     :param d: 腔面有效直径
     :param omegam: 模场半径
+    :param offset: 光斑中心相对于腔面中心的偏移，默认为0
     :return: clipping损耗
     """
-    return np.exp(-2*(d/2)**2/omegam**2)
+    if np.all(np.asarray(offset) == 0):
+        return np.exp(-2*(d/2)**2/omegam**2)
+    return stats.ncx2.sf((d/omegam)**2, 2, (2*np.asarray(offset)/omegam)**2)
 
 
 def calculate_loss_scattering(sigmasc, wavelength):
@@ -512,3 +1220,137 @@ def calculate_loss_scattering(sigmasc, wavelength):
     :return: 腔面的散射损耗
     """
     return (4*C.pi*sigmasc/wavelength)**2
+
+
+def calculate_loss_clipping_hg(d, omegam, n):
+    """
+    计算各个横模(mx, my)在腔面单次反射的clipping损耗，即HG模式光强落在有效直径之外的功率比例。
+    以rho=sqrt(2)*r/omegam、s=rho^2-(d/(sqrt(2)*omegam))^2为变量，圆外的积分为
+    exp(-s)乘以s的多项式，对角度的积分为三角多项式，因此分别使用Gauss-Laguerre求积与均匀角度
+    采样即可得到精确结果，不需要网格积分。所有横模共用同一组求积点，参数可以是相互广播的数组。
+    基模的结果与calculate_loss_clipping相同。
+    :param d: 腔面有效直径
+    :param omegam: 腔面处的等价基模模场半径
+    :param n: 每个方向的最高横模阶数
+    :return: 形状为(n+1, n+1, *shape)的clipping损耗loss[mx, my]
+    """
+    d, omegam = np.broadcast_arrays(np.asarray(d, dtype=float), np.asarray(omegam, dtype=float))
+    # 被积函数对s是2n次多项式，对角度是4n次三角多项式
+    s, ws = special.roots_laguerre(2*n+1)
+    phi = 2*C.pi*np.arange(4*n+2)/(4*n+2)
+    wphi = 2*C.pi/len(phi)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a2 = (d/omegam)**2/2
+    # 没有腔面(d为无穷大)时损耗为0
+    inside = np.isinf(a2)
+    rho = np.sqrt(s.reshape((-1, 1)+(1,)*d.ndim)+np.where(inside, 0, a2))
+    psix = hermite_functions(n, rho*np.cos(phi).reshape((-1,)+(1,)*d.ndim))
+    psiy = hermite_functions(n, rho*np.sin(phi).reshape((-1,)+(1,)*d.ndim))
+    w = (ws*np.exp(s)).reshape((-1, 1)+(1,)*d.ndim)*wphi/2
+
+    loss = np.einsum('xij...,yij...,ij...->xy...', psix**2, psiy**2, np.broadcast_to(w, rho.shape))
+    return np.where(inside, 0, loss)[()]
+
+
+def calculate_mirror_reflectivity(t, l=0, clipping=0, scattering=0):
+    """
+    计算腔面的等效反射率，即1减去透射率、镜面损耗、clipping损耗与散射损耗之和。总损耗超过1时
+    反射率为0，参数可以是相互广播的数组
+    :param t: 透射率
+    :param l: 镜面损耗
+    :param clipping: clipping损耗，如calculate_loss_clipping的结果
+    :param scattering: 散射损耗，如calculate_loss_scattering的结果
+    :return: 等效反射率
+    """
+    return np.clip(1-t-l-clipping-scattering, 0, 1)[()]
+
+
+def calculate_loss_budget(cavity, dl, dr, n, wavelength=None, sigmasc=0):
+    """
+    计算各个横模(mx, my)的损耗预算与精细度。每个腔面的单次损耗为透射率、镜面损耗、
+    calculate_loss_clipping_hg给出的clipping损耗与calculate_loss_scattering给出的散射损耗之和，
+    模式的等效反射率由calculate_mirror_reflectivity给出，精细度与衰减速率由calculate_cavity_loss精确计算。
+    clipping损耗随横模阶数迅速增大，因此可以用于筛选抑制高阶模的腔设计。腔面处的模场半径使用
+    标称光轴上的腔模参数，不考虑腔镜失调。
+    cavity可以是Cavity或CavityMode：CavityMode没有透射率与镜面损耗，此时两者取0，只计算
+    clipping与散射损耗，波长默认为CavityMode.wavelength。腔的参数可以是相互广播的数组。
+    :param cavity: Cavity或CavityMode，使用其length、rocl、rocr，以及存在时的tl、ll、tr、lr、lc、nc
+    :param dl: 左腔面有效直径
+    :param dr: 右腔面有效直径
+    :param n: 每个方向的最高横模阶数
+    :param wavelength: 真空中的波长，cavity为CavityMode时默认为其wavelength
+    :param sigmasc: 腔面的粗糙度
+    :return: {'clippingl', 'clippingr', 'scattering', 'transmission', 'loss', 'finesse', 'kappa'}，
+             除scattering与transmission外形状都为(n+1, n+1, *shape)。transmission为两个腔镜透射率
+             之和，loss为往返一次的总损耗1-rl*rr*(1-lc)^2，kappa为圆频率
+    """
+    if wavelength is None:
+        wavelength = getattr(cavity, 'wavelength', None)
+        if wavelength is None:
+            raise ValueError("wavelength is required when cavity has no wavelength.")
+    tl, ll, tr, lr = (getattr(cavity, k, 0) for k in ('tl', 'll', 'tr', 'lr'))
+    lc, nc = getattr(cavity, 'lc', 0), getattr(cavity, 'nc', 1)
+
+    # 腔介质中的波长
+    geometry = _calculate_mode_geometry(cavity.length, cavity.rocl, cavity.rocr, wavelength/nc)
+    clipl = calculate_loss_clipping_hg(dl, geometry['omegaml'], n)
+    clipr = calculate_loss_clipping_hg(dr, geometry['omegamr'], n)
+    lsc = calculate_loss_scattering(sigmasc, wavelength)
+
+    rl = calculate_mirror_reflectivity(tl, ll, clipl, lsc)
+    rr = calculate_mirror_reflectivity(tr, lr, clipr, lsc)
+    result = calculate_cavity_loss(cavity.length, rl, rr, lc, nc)
+
+    return {'clippingl': clipl, 'clippingr': clipr, 'scattering': lsc,
+            'transmission': tl+tr, 'loss': 1-rl*rr*(1-lc)**2,
+            'finesse': result['finesse'], 'kappa': result['kappa']}
+
+
+def _calculate_mode_geometry(length, rocl, rocr, wavelength):
+    """
+    以数组方式计算两镜腔腔模的几何参数，公式与CavityMode相同，参数可以是相互广播的数组。
+    gl+gr-2*gl*gr为0时(例如共焦腔)取z0=pl=pr=length/2；不满足稳定条件时z0与模场半径为nan
+    :param length: 腔长
+    :param rocl: 左腔镜曲率半径
+    :param rocr: 右腔镜曲率半径
+    :param wavelength: 腔介质中的波长
+    :return: {'pl', 'pr', 'z0', 'omega0', 'omegaml', 'omegamr'}，pl、pr为左右腔镜相对束腰的位置
+    """
+    length = np.asarray(length, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gl, gr = 1-length/rocl, 1-length/rocr
+        glgr = gl*gr
+        gs = gl+gr-2*glgr
+        pl = np.where(gs == 0, length/2, gr*(1-gl)/gs*length)
+        pr = np.where(gs == 0, length/2, gl*(1-gr)/gs*length)
+        z0 = np.where(gs == 0, length/2, np.sqrt(glgr*(1-glgr)/gs**2)*length)
+        omega0 = np.sqrt(wavelength*z0/C.pi)
+        omegaml = omega0*np.sqrt(1+(pl/z0)**2)
+        omegamr = omega0*np.sqrt(1+(pr/z0)**2)
+    return {'pl': pl[()], 'pr': pr[()], 'z0': z0[()],
+            'omega0': omega0[()], 'omegaml': omegaml[()], 'omegamr': omegamr[()]}
+
+
+def _calculate_mode_volume_factor(gl, gr, mx, my):
+    """
+    以数组方式计算无量纲的模式体积V/(wavelength*L^2/pi)，见calculate_mode_volume
+    :param gl: 左腔镜g因子
+    :param gr: 右腔镜g因子
+    :param mx: x方向模式数
+    :param my: y方向模式数
+    :return: 无量纲的模式体积
+    """
+    with np.errstate(divide='ignore'):
+        geometry = _calculate_mode_geometry(1, 1/(1-np.asarray(gl, dtype=float)),
+                                            1/(1-np.asarray(gr, dtype=float)), C.pi)
+    pl, pr, z0 = geometry['pl'], geometry['pr'], geometry['z0']
+
+    # 腔内离束腰最近的位置，束腰在腔外时为某一腔面
+    zs = np.clip(0, -pl, pr)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        omega2 = z0*(1+(zs/z0)**2)
+
+    # hermite_peak按模式数缓存，与几何参数无关
+    peak = np.vectorize(hermite_peak, otypes=[float])
+    return omega2/(4*peak(mx)*peak(my))
@@ -38,6 +38,10 @@
         两轴的束腰相等的归一化的Gaussian光
     EqualGBeam -
         两轴的束腰相等的Gaussian光
+
+    5.
+    HGBeamSuperposition -
+        多个归一化Herimite-Gaussian光的相干叠加
     
     - function
 
@@ -45,11 +49,19 @@
     2. remote2local
     3. convert_through_lens
     4. convert_through_mirror
+    5. decompose_hgbeam
+    6. calculate_second_moments
+    7. calculate_hg_overlaps
+    8. hermite_functions
+    9. hermite_peak
 """
 
+from functools import lru_cache
+
 import numpy as np
 from scipy import constants as C
 from scipy import special
+from scipy import optimize
 from .misc import Wavelength
 
 __all__ = [
@@ -60,7 +72,10 @@ __all__ = [
     'NormalizedEqualHGBeam', 'EqualHGBeam',
     'NormalizedEqualSymmetricHGBeam', 'EqualSymmetricHGBeam',
     'NormalizedEqualGBeam', 'EqualGBeam',
-    'local2remote', 'remote2local', 'convert_through_lens', 'convert_through_mirror'
+    'HGBeamSuperposition',
+    'local2remote', 'remote2local', 'convert_through_lens', 'convert_through_mirror',
+    'decompose_hgbeam', 'calculate_second_moments', 'calculate_hg_overlaps',
+    'hermite_functions', 'hermite_peak'
 ]
 
 
@@ -166,20 +181,46 @@ class NormalizedHGBeam1D(Wavelength):
 
         return hm(xi)*np.exp(-xi**2/2)
 
-    def u_f(self, z, x):
-        """强度函数"""
-        cm = self.cm
-        a = self.a_f(z)
-        psi = self.psim_f(z, x)
+    def ampl_f(self, z, x):
+        """振幅函数，包含归一化因子"""
+        return self.cm*self.a_f(z)*self.psim_f(z, x)
+
+    def phase_f(self, z, x):
+        """相位函数，不计算Hermite函数"""
         phi = self.phi_f(z)
         k = self.k
         r = self.r_f(z)
         m = self.m
+        return -k/(2*r)*x**2+(m+1/2)*phi
 
-        ampl = cm*a*psi
-        phase = -k/(2*r)*x**2+(m+1/2)*phi
-
-        return ampl, phase
+    def u_f(self, z, x):
+        """强度函数"""
+        return self.ampl_f(z, x), self.phase_f(z, x)
+
+    def i_f(self, z, x):
+        """光强函数，不计算相位"""
+        return self.ampl_f(z, x)**2
+
+    def farfield_f(self, theta):
+        """
+        远场(角谱)函数。HG函数的Fourier变换仍是同阶HG函数，因此远场与传播距离无关，
+        振幅按角度归一化，相位为远场Gouy相位(不含二次相位)。
+        :param theta: 远场角度
+        :return: (ampl, phase)
+        """
+        theta0 = self.wavelength/(C.pi*self.omega0)
+        xi = np.sqrt(2)*theta/theta0
+        ampl = self.cm*np.sqrt(self.omega0/theta0)*self.a_f(self.p0)*self.hm(xi)*np.exp(-xi**2/2)
+        return ampl, (self.m+1/2)*C.pi/2
+
+    def focalplane_f(self, f, x):
+        """
+        焦距为f的透镜后焦面上的光场函数，由远场函数按x=f*theta缩放得到(不含二次相位)
+        :param f: 透镜焦距
+        :param x: 焦面上的横向坐标
+        :return: (ampl, phase)
+        """
+        return _hgfocalplane_f(self.farfield_f, f, x)
 
 
 class HGBeam1D(NormalizedHGBeam1D):
@@ -260,7 +301,8 @@ class GBeam1D(HGBeam1D):
 
 class NormalizedHGBeam(Wavelength):
     """
-    此类描述了归一化的Herimite-Gaussian光。
+    此类描述了归一化的Herimite-Gaussian光。光轴可以相对z轴偏移和倾斜，偏移与倾角可以是
+    数组，此时光场函数的结果在前面增加对应的失调维度。
 
     此类可以通过以下属性构建：
         wavelength - 波长
@@ -269,11 +311,18 @@ class NormalizedHGBeam(Wavelength):
         omega0y - y方向等价基模的束腰半径
         mx -  x方向模式数
         my -  y方向模式数
+        dx - 束腰处光轴的x方向偏移，默认为0
+        dy - 束腰处光轴的y方向偏移，默认为0
+        thetax - 光轴在xz平面内的倾角，默认为0
+        thetay - 光轴在yz平面内的倾角，默认为0
+        p0x - x方向束腰的位置，默认为p0(像散光束)
+        p0y - y方向束腰的位置，默认为p0(像散光束)
     """
     name = 'NormalizedHGBeam'
 
     modifiable_properties = (
-        'wavelength', 'p0', 'omega0x', 'omega0y', 'mx', 'my')
+        'wavelength', 'p0', 'omega0x', 'omega0y', 'mx', 'my',
+        'dx', 'dy', 'thetax', 'thetay', 'p0x', 'p0y')
 
     def __init__(self, name='NormalizedHGBeam', **kwargs):
         super().__init__(**kwargs)
@@ -298,7 +347,7 @@ class NormalizedHGBeam(Wavelength):
             beam = self.__beams[d]
         else:
             beam = NormalizedHGBeam1D(
-                wavelength=self.wavelength, p0=self.p0,
+                wavelength=self.wavelength, p0=getattr(self, 'p0'+d),
                 omega0=getattr(self, 'omega0'+d), m=getattr(self, 'm'+d)
             )
             self.__beams[d] = beam
@@ -324,6 +373,19 @@ class NormalizedHGBeam(Wavelength):
         """束腰位置[L]"""
         return self.get_property('p0')
 
+    @property
+    def p0x(self):
+        """x方向束腰位置[L]"""
+        # 默认值不写入property_set，否则change_params(p0=...)后仍为旧的p0
+        p0x = self.property_set.get('p0x')
+        return self.p0 if p0x is None else p0x
+
+    @property
+    def p0y(self):
+        """y方向束腰位置[L]"""
+        p0y = self.property_set.get('p0y')
+        return self.p0 if p0y is None else p0y
+
     @property
     def omega0x(self):
         """x方向等价基模束腰半径[L]"""
@@ -384,6 +446,48 @@ class NormalizedHGBeam(Wavelength):
         """y方向Hermite多项式"""
         return self.get_property('hmy', lambda: self.__get_beam('y').hm)
 
+    @property
+    def dx(self):
+        """束腰处光轴的x方向偏移[L]"""
+        return self.get_property('dx', lambda: 0)
+
+    @property
+    def dy(self):
+        """束腰处光轴的y方向偏移[L]"""
+        return self.get_property('dy', lambda: 0)
+
+    @property
+    def thetax(self):
+        """光轴在xz平面内的倾角[1]"""
+        return self.get_property('thetax', lambda: 0)
+
+    @property
+    def thetay(self):
+        """光轴在yz平面内的倾角[1]"""
+        return self.get_property('thetay', lambda: 0)
+
+    def __misalign(self, z, x, y):
+        """
+        将坐标变换到失调光束的光轴坐标系(小角度近似)。失调参数为数组时，其形状作为结果的前置维度。
+        :return: (x, y, params) 光轴坐标系下的坐标，以及变形后的(dx, dy, thetax, thetay)；
+                 光束未失调时params为None
+        """
+        z, x, y = np.broadcast_arrays(z, x, y)
+        params = self.__misalign_params(z.ndim)
+        if params is None:
+            return x, y, None
+
+        dx, dy, thetax, thetay = params
+        dz = z-self.p0
+        return x-dx-thetax*dz, y-dy-thetay*dz, params
+
+    def __misalign_params(self, nd):
+        """将失调参数变形为可与nd维坐标广播的数组，光束未失调时返回None"""
+        params = tuple(np.asarray(v) for v in (self.dx, self.dy, self.thetax, self.thetay))
+        if all(v.ndim == 0 and v == 0 for v in params):
+            return None
+        return tuple(v.reshape(v.shape+(1,)*nd) for v in params)
+
     def a_f(self, z):
         """振幅函数"""
         return (self.__get_beam('x').a_f(z))*(self.__get_beam('y').a_f(z))
@@ -428,11 +532,59 @@ class NormalizedHGBeam(Wavelength):
         """y方向HG函数"""
         return self.__get_beam('y').psim_f(z, y)
 
+    def __ampl(self, z, x, y):
+        """光轴坐标系下的振幅，包含归一化因子与a_f(HGBeam的a0)"""
+        return self.cm*self.a_f(z)*self.psimx_f(z, x)*self.psimy_f(z, y)
+
     def u_f(self, z, x, y):
         """强度函数"""
-        amplx, phasex = self.__get_beam('x').u_f(z, x)
-        amply, phasey = self.__get_beam('y').u_f(z, y)
-        return amplx*amply, phasex+phasey
+        xs, ys, params = self.__misalign(z, x, y)
+        ampl = self.__ampl(z, xs, ys)
+        phasex = self.__get_beam('x').phase_f(z, xs)
+        phasey = self.__get_beam('y').phase_f(z, ys)
+        if params is None:
+            return ampl, phasex+phasey
+
+        # 倾斜的光轴带来横向的线性相位
+        dx, dy, thetax, thetay = params
+        phaset = -self.k*(thetax*(x-dx)+thetay*(y-dy))
+        return ampl, phasex+phasey+phaset
+
+    def i_f(self, z, x, y):
+        """光强函数，不计算相位"""
+        x, y, _ = self.__misalign(z, x, y)
+        return self.__ampl(z, x, y)**2
+
+    def farfield_f(self, thetax, thetay):
+        """
+        远场(角谱)函数，与传播距离无关。光轴倾斜使远场平移，光轴偏移带来线性相位。
+        :param thetax: xz平面内的远场角度
+        :param thetay: yz平面内的远场角度
+        :return: (ampl, phase)
+        """
+        thetax, thetay = np.broadcast_arrays(thetax, thetay)
+        params = self.__misalign_params(thetax.ndim)
+        if params is None:
+            tx, ty, phaset = thetax, thetay, 0
+        else:
+            dx, dy, thetax0, thetay0 = params
+            tx, ty = thetax-thetax0, thetay-thetay0
+            phaset = self.k*(dx*thetax+dy*thetay)
+
+        # 一维远场已经归一化，这里只需要乘以振幅(像散时两个方向的束腰位置不同，不能使用a_f)
+        amplx, phasex = self.__get_beam('x').farfield_f(tx)
+        amply, phasey = self.__get_beam('y').farfield_f(ty)
+        return getattr(self, 'a0', 1)*amplx*amply, phasex+phasey+phaset
+
+    def focalplane_f(self, f, x, y):
+        """
+        焦距为f的透镜后焦面上的光场函数，由远场函数按(x, y)=f*(thetax, thetay)缩放得到(不含二次相位)
+        :param f: 透镜焦距
+        :param x: 焦面上的x坐标
+        :param y: 焦面上的y坐标
+        :return: (ampl, phase)
+        """
+        return _hgfocalplane_f(self.farfield_f, f, x, y)
 
 
 class HGBeam(NormalizedHGBeam):
@@ -447,11 +599,18 @@ class HGBeam(NormalizedHGBeam):
         omega0y - y方向等价基模的束腰半径
         mx -  x方向模式数
         my -  y方向模式数
+        dx - 束腰处光轴的x方向偏移，默认为0
+        dy - 束腰处光轴的y方向偏移，默认为0
+        thetax - 光轴在xz平面内的倾角，默认为0
+        thetay - 光轴在yz平面内的倾角，默认为0
+        p0x - x方向束腰的位置，默认为p0(像散光束)
+        p0y - y方向束腰的位置，默认为p0(像散光束)
     """
     name = 'HGBeam'
 
     modifiable_properties = ('a0', 'wavelength', 'p0',
-                             'omega0x', 'omega0y', 'mx', 'my')
+                             'omega0x', 'omega0y', 'mx', 'my',
+                             'dx', 'dy', 'thetax', 'thetay', 'p0x', 'p0y')
 
     def __init__(self, name='HGBeam', **kwargs):
         super().__init__(**kwargs)
@@ -481,10 +640,17 @@ class NormalizedGBeam(NormalizedHGBeam):
         p0 - 束腰的位置
         omega0x - x方向的束腰半径
         omega0y - y方向的束腰半径
+        dx - 束腰处光轴的x方向偏移，默认为0
+        dy - 束腰处光轴的y方向偏移，默认为0
+        thetax - 光轴在xz平面内的倾角，默认为0
+        thetay - 光轴在yz平面内的倾角，默认为0
+        p0x - x方向束腰的位置，默认为p0(像散光束)
+        p0y - y方向束腰的位置，默认为p0(像散光束)
     """
     name = 'NormalizedGBeam'
 
-    modifiable_properties = ('wavelength', 'p0', 'omega0x', 'omega0y')
+    modifiable_properties = ('wavelength', 'p0', 'omega0x', 'omega0y',
+                             'dx', 'dy', 'thetax', 'thetay', 'p0x', 'p0y')
 
     def __init__(self, name='NormalizedGBeam', **kwargs):
         kwargs.update(mx=0, my=0)
@@ -503,10 +669,17 @@ class GBeam(HGBeam):
         p0 - 束腰的位置
         omega0x - x方向的束腰半径
         omega0y - y方向的束腰半径
+        dx - 束腰处光轴的x方向偏移，默认为0
+        dy - 束腰处光轴的y方向偏移，默认为0
+        thetax - 光轴在xz平面内的倾角，默认为0
+        thetay - 光轴在yz平面内的倾角，默认为0
+        p0x - x方向束腰的位置，默认为p0(像散光束)
+        p0y - y方向束腰的位置，默认为p0(像散光束)
     """
     name = 'HGBeam'
 
-    modifiable_properties = ('a0', 'wavelength', 'p0', 'omega0x', 'omega0y')
+    modifiable_properties = ('a0', 'wavelength', 'p0', 'omega0x', 'omega0y',
+                             'dx', 'dy', 'thetax', 'thetay', 'p0x', 'p0y')
 
     def __init__(self, name='HGBeam', **kwargs):
         kwargs.update(mx=0, my=0)
@@ -526,10 +699,15 @@ class NormalizedEqualHGBeam(NormalizedHGBeam):
         omega0 - 等价基模的束腰半径
         mx - x方向模式数
         my - y方向模式数
+        dx - 束腰处光轴的x方向偏移，默认为0
+        dy - 束腰处光轴的y方向偏移，默认为0
+        thetax - 光轴在xz平面内的倾角，默认为0
+        thetay - 光轴在yz平面内的倾角，默认为0
     """
     name = 'NormalizedEqualHGBeam'
 
-    modifiable_properties = ('wavelength', 'p0', 'omega0', 'mx', 'my')
+    modifiable_properties = ('wavelength', 'p0', 'omega0', 'mx', 'my',
+                             'dx', 'dy', 'thetax', 'thetay')
 
     def __init__(self, name="NormalizedEqualHGBeam", **kwargs):
         omega0 = kwargs.get('omega0', None)
@@ -583,10 +761,15 @@ class EqualHGBeam(NormalizedEqualHGBeam):
         omega0 - 等价基模的束腰半径
         mx - x方向模式数
         my - y方向模式数
+        dx - 束腰处光轴的x方向偏移，默认为0
+        dy - 束腰处光轴的y方向偏移，默认为0
+        thetax - 光轴在xz平面内的倾角，默认为0
+        thetay - 光轴在yz平面内的倾角，默认为0
     """
     name = 'EqualHGBeam'
 
-    modifiable_properties = ('a0', 'wavelength', 'p0', 'omega0', 'mx', 'my')
+    modifiable_properties = ('a0', 'wavelength', 'p0', 'omega0', 'mx', 'my',
+                             'dx', 'dy', 'thetax', 'thetay')
 
     def __init__(self, name='EqualHGBeam', **kwargs):
         super().__init__(**kwargs)
@@ -656,6 +839,32 @@ class NormalizedEqualSymmetricHGBeam(NormalizedHGBeam1D):
 
         return ampl, phase
 
+    def i_f(self, z, x, y):
+        """光强函数，不计算相位"""
+        return (self.cm*self.a_f(z)*self.psim_f(z, x)*self.psim_f(z, y))**2
+
+    def farfield_f(self, thetax, thetay):
+        """
+        远场(角谱)函数，与传播距离无关
+        :param thetax: xz平面内的远场角度
+        :param thetay: yz平面内的远场角度
+        :return: (ampl, phase)
+        """
+        theta0 = self.wavelength/(C.pi*self.omega0)
+        xix, xiy = np.sqrt(2)*thetax/theta0, np.sqrt(2)*thetay/theta0
+        psi = self.hm(xix)*self.hm(xiy)*np.exp(-(xix**2+xiy**2)/2)
+        return self.cm*self.omega0/theta0*self.a_f(self.p0)*psi, (2*self.m+1)*C.pi/2
+
+    def focalplane_f(self, f, x, y):
+        """
+        焦距为f的透镜后焦面上的光场函数，由远场函数按(x, y)=f*(thetax, thetay)缩放得到(不含二次相位)
+        :param f: 透镜焦距
+        :param x: 焦面上的x坐标
+        :param y: 焦面上的y坐标
+        :return: (ampl, phase)
+        """
+        return _hgfocalplane_f(self.farfield_f, f, x, y)
+
 
 class EqualSymmetricHGBeam(NormalizedEqualSymmetricHGBeam):
     """
@@ -735,6 +944,101 @@ class EqualGBeam(EqualSymmetricHGBeam):
         self.name = name
 
 
+class HGBeamSuperposition(Wavelength):
+    """
+    此类描述了多个归一化Herimite-Gaussian光的相干叠加，所有模式共享同一束腰位置与
+    等价基模束腰半径。叠加系数coeffs[mx, my]对应模式(mx, my)的复振幅，其模平方即该模式
+    所占的功率。
+
+    此类可以通过以下属性构建：
+        wavelength - 波长
+        p0 - 束腰的位置
+        omega0x - x方向等价基模的束腰半径
+        omega0y - y方向等价基模的束腰半径
+        coeffs - 形状为(Nx+1, Ny+1)的复叠加系数
+    """
+    name = 'HGBeamSuperposition'
+
+    modifiable_properties = (
+        'wavelength', 'p0', 'omega0x', 'omega0y', 'coeffs')
+
+    def __init__(self, name='HGBeamSuperposition', **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+
+        self.property_set.add_required(
+            HGBeamSuperposition.modifiable_properties)
+
+        for prop in HGBeamSuperposition.modifiable_properties:
+            self.property_set[prop] = kwargs.get(prop, None)
+
+    @property
+    def p0(self):
+        """束腰位置[L]"""
+        return self.get_property('p0')
+
+    @property
+    def omega0x(self):
+        """x方向等价基模束腰半径[L]"""
+        return self.get_property('omega0x')
+
+    @property
+    def omega0y(self):
+        """y方向等价基模束腰半径[L]"""
+        return self.get_property('omega0y')
+
+    @property
+    def coeffs(self):
+        """叠加系数[1]"""
+        return self.get_property('coeffs')
+
+    @property
+    def power(self):
+        """总功率[1]"""
+        return self.get_property('power', lambda: np.sum(np.abs(self.coeffs)**2))
+
+    def __field(self, z, x, y):
+        coeffs = np.asarray(self.coeffs)
+        z, x, y = np.broadcast_arrays(z, x, y)
+        ux = _hgbasis_f(coeffs.shape[0]-1, z, x, self.wavelength, self.p0, self.omega0x)
+        uy = _hgbasis_f(coeffs.shape[1]-1, z, y, self.wavelength, self.p0, self.omega0y)
+        return np.sum(ux*np.tensordot(coeffs, uy, axes=(1, 0)), axis=0)
+
+    def u_f(self, z, x, y):
+        """强度函数"""
+        u = self.__field(z, x, y)
+        return np.abs(u), np.angle(u)
+
+    def i_f(self, z, x, y):
+        """光强函数，不计算幅角"""
+        u = self.__field(z, x, y)
+        return u.real**2+u.imag**2
+
+    def farfield_f(self, thetax, thetay):
+        """
+        远场(角谱)函数。各模式的远场是同阶HG函数，计算量与传播距离无关。
+        :param thetax: xz平面内的远场角度
+        :param thetay: yz平面内的远场角度
+        :return: (ampl, phase)
+        """
+        coeffs = np.asarray(self.coeffs)
+        thetax, thetay = np.broadcast_arrays(thetax, thetay)
+        ux = _hgfarfield_f(coeffs.shape[0]-1, thetax, self.wavelength, self.omega0x)
+        uy = _hgfarfield_f(coeffs.shape[1]-1, thetay, self.wavelength, self.omega0y)
+        u = np.sum(ux*np.tensordot(coeffs, uy, axes=(1, 0)), axis=0)
+        return np.abs(u), np.angle(u)
+
+    def focalplane_f(self, f, x, y):
+        """
+        焦距为f的透镜后焦面上的光场函数，由远场函数按(x, y)=f*(thetax, thetay)缩放得到(不含二次相位)
+        :param f: 透镜焦距
+        :param x: 焦面上的x坐标
+        :param y: 焦面上的y坐标
+        :return: (ampl, phase)
+        """
+        return _hgfocalplane_f(self.farfield_f, f, x, y)
+
+
 def local2remote(wavelength, omega0, z):
     """
     已知波长和基模束腰半径，计算一定位置处的基模模场半径。
@@ -792,3 +1096,204 @@ def convert_through_mirror(wavelength, omega0, s, roc):
     omega0p, spm = convert_through_lens(wavelength, omega0, s, roc/2)
     sp = -spm
     return omega0p, sp
+
+
+def decompose_hgbeam(field, x, y, z, wavelength, p0, omega0x, omega0y, n):
+    """
+    将网格上采样的复光场分解到归一化Hermite-Gaussian光基底上。分解采用可分离的梯形求积，
+    每个方向只需一次矩阵乘法，而不需要对每个模式做一次全网格积分。
+    :param field: 复光场，形状为(..., len(x), len(y))，前置维度视为批量
+    :param x: x方向的一维采样坐标
+    :param y: y方向的一维采样坐标
+    :param z: 采样平面的位置
+    :param wavelength: 波长
+    :param p0: 基底束腰的位置
+    :param omega0x: 基底x方向等价基模的束腰半径
+    :param omega0y: 基底y方向等价基模的束腰半径
+    :param n: 每个方向的最高模式数
+    :return: 形状为(..., n+1, n+1)的复系数coeffs[mx, my]，可直接用于HGBeamSuperposition
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    ux = np.conj(_hgbasis_f(n, z, x, wavelength, p0, omega0x))*_trapz_weights(x)
+    uy = np.conj(_hgbasis_f(n, z, y, wavelength, p0, omega0y))*_trapz_weights(y)
+    return ux @ np.asarray(field) @ uy.T
+
+
+def calculate_second_moments(weights, wavelength, omega0x, omega0y):
+    """
+    由模式功率权重计算Hermite-Gaussian模式非相干混合光的二阶矩参数。HG_m模式的二阶矩束腰半径
+    与远场发散角都是基模的sqrt(2m+1)倍，因此混合光的M^2为(2m+1)按功率的加权平均，不需要在
+    网格上采样积分。对纯模式，结果与omega0mx、thetamx等属性一致。
+    :param weights: 形状为(..., Nx+1, Ny+1)的功率权重weights[..., mx, my]，前置维度视为多个混合光
+    :param wavelength: 波长
+    :param omega0x: x方向等价基模的束腰半径
+    :param omega0y: y方向等价基模的束腰半径
+    :return: (m2x, m2y, omega0mx, omega0my, thetamx, thetamy)
+             分别为两个方向的M^2因子、二阶矩束腰半径和二阶矩半发散角
+    """
+    weights = np.asarray(weights, dtype=float)
+    total = np.sum(weights, axis=(-2, -1))
+    px, py = np.sum(weights, axis=-1), np.sum(weights, axis=-2)
+    m2x = px @ (2*np.arange(px.shape[-1])+1)/total
+    m2y = py @ (2*np.arange(py.shape[-1])+1)/total
+
+    omega0mx, omega0my = np.sqrt(m2x)*omega0x, np.sqrt(m2y)*omega0y
+    thetamx = np.sqrt(m2x)*np.arctan(wavelength/(C.pi*omega0x))
+    thetamy = np.sqrt(m2y)*np.arctan(wavelength/(C.pi*omega0y))
+    return m2x, m2y, omega0mx, omega0my, thetamx, thetamy
+
+
+def calculate_hg_overlaps(n, m, wavelength, omega0, omega0i, dz, d=0, theta=0):
+    """
+    计算一维入射Hermite-Gaussian光(0至m阶)在目标Hermite-Gaussian基底(0至n阶)上的投影系数。
+    投影在目标光束的束腰平面上进行。入射光束腰与该平面相距dz，光轴在该平面的偏移为d，倾角为theta，
+    失调的约定与NormalizedHGBeam相同，但倾斜带来的线性相位以光轴在该平面上的位置为参考。
+
+    两组模式的生成函数之积是x的Gaussian函数，积分后得到exp(a*s^2+b*t^2+c*s*t+d*s+e*t)的形式，
+    由此得到系数的三项递推
+        sqrt(i+1)*c[i+1, j] = 2a*sqrt(i)*c[i-1, j]+c*sqrt(j)*c[i, j-1]+d*c[i, j]
+        sqrt(j+1)*c[i, j+1] = 2b*sqrt(j)*c[i, j-1]+c*sqrt(i)*c[i-1, j]+e*c[i, j]
+    不需要任何网格积分。所有光束参数可以是相互广播的数组。
+    :param n: 目标基底的最高阶数
+    :param m: 入射光的最高阶数
+    :param wavelength: 波长
+    :param omega0: 目标基底的束腰半径
+    :param omega0i: 入射光的束腰半径
+    :param dz: 目标束腰平面相对于入射光束腰的位置
+    :param d: 入射光光轴在目标束腰平面上的偏移
+    :param theta: 入射光光轴的倾角
+    :return: 形状为(n+1, m+1, *shape)的复系数c[i, j]，|c[i, j]|^2为j阶入射光耦合到i阶模式的功率比例
+    """
+    k = 2*C.pi/wavelength
+    omega0, omega0i, dz, d, theta = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (omega0, omega0i, dz, d, theta)))
+
+    # 入射光在目标束腰平面的复曲率1/q、模场半径与Gouy相位
+    z0i = C.pi*omega0i**2/wavelength
+    qinv = 1/(dz+1j*z0i)
+    omega = omega0i*np.sqrt(1+(dz/z0i)**2)
+    eps = np.exp(1j*np.arctan(dz/z0i))
+
+    alpha = 1/omega0**2+1j*k*qinv/2
+    beta0 = 1j*k*(d*qinv-theta)
+    betas, betat = 2/omega0, 2*eps/omega
+
+    ca = betas**2/(4*alpha)-1/2
+    cb = betat**2/(4*alpha)-eps**2/2
+    cc = betas*betat/(2*alpha)
+    cd = beta0*betas/(2*alpha)
+    ce = beta0*betat/(2*alpha)-2*d*eps/omega
+    # 入射光的(m+1/2)Gouy相位中的1/2包含在c[0, 0]中，与NormalizedHGBeam1D.u_f的约定一致
+    c00 = np.sqrt(2*eps/(omega0*omega*alpha)) * \
+        np.exp(beta0**2/(4*alpha)-1j*k*d**2*qinv/2+1j*k*theta*d)
+
+    c = np.zeros((n+1, m+1)+omega0.shape, dtype=complex)
+    c[0, 0] = c00
+    for i in range(n):
+        c[i+1, 0] = (2*ca*np.sqrt(i)*c[i-1, 0]+cd*c[i, 0])/np.sqrt(i+1)
+
+    sqi = np.sqrt(np.arange(n+1)).reshape((-1,)+(1,)*omega0.ndim)
+    for j in range(m):
+        shifted = np.zeros_like(c[:, j])
+        shifted[1:] = c[:-1, j]
+        c[:, j+1] = (2*cb*np.sqrt(j)*c[:, j-1]+cc*sqi*shifted+ce*c[:, j])/np.sqrt(j+1)
+    return c
+
+
+def hermite_functions(n, xi):
+    """
+    利用三项递推计算0至n阶归一化Hermite函数psi_m(xi)=H_m(xi)exp(-xi^2/2)/sqrt(2^m m! sqrt(pi))，
+    递推在高阶时仍然数值稳定。
+    :param n: 最高阶数
+    :param xi: 归一化坐标
+    :return: 形状为(n+1, *xi.shape)的数组
+    """
+    xi = np.asarray(xi, dtype=float)
+    psi = np.empty((n+1,)+xi.shape)
+    psi[0] = C.pi**(-1/4)*np.exp(-xi**2/2)
+    if n > 0:
+        psi[1] = np.sqrt(2)*xi*psi[0]
+    for m in range(1, n):
+        psi[m+1] = np.sqrt(2/(m+1))*xi*psi[m]-np.sqrt(m/(m+1))*psi[m-1]
+    return psi
+
+
+@lru_cache(maxsize=None)
+def hermite_peak(m):
+    """
+    计算归一化Hermite函数平方的最大值max(psi_m(xi)^2)，结果按阶数缓存。
+    最大值位于最外侧的波瓣，先在网格上定位再用有界优化精确求解。
+    :param m: 阶数
+    :return: 最大值
+    """
+    xi = np.linspace(0, np.sqrt(2*m+1)+1, 64*(m+1)+1)
+    psi2 = hermite_functions(m, xi)[m]**2
+    i = np.argmax(psi2)
+    h = xi[1]-xi[0]
+    res = optimize.minimize_scalar(lambda v: -hermite_functions(m, v)[m]**2,
+                                   bounds=(max(xi[i]-h, 0), xi[i]+h), method='bounded',
+                                   options={'xatol': 1e-12})
+    return max(-res.fun, psi2[i])
+
+
+def _hgbasis_f(n, z, x, wavelength, p0, omega0):
+    """
+    计算0至n阶归一化一维Hermite-Gaussian光的复振幅ampl*exp(1j*phase)，与NormalizedHGBeam1D.u_f
+    的约定一致。其中波前曲率写成(z-p0)/((z-p0)^2+z0^2)的形式，以避免束腰处除零。
+    :param n: 最高模式数
+    :param z: 位置
+    :param x: 横向坐标
+    :param wavelength: 波长
+    :param p0: 束腰的位置
+    :param omega0: 等价基模的束腰半径
+    :return: 形状为(n+1, *broadcast(z, x).shape)的复数组
+    """
+    z0 = C.pi*omega0**2/wavelength
+    dz = np.asarray(z)-p0
+    omega = omega0*np.sqrt(1+(dz/z0)**2)
+    psi = hermite_functions(n, np.sqrt(2)*x/omega)
+    phi = np.arctan(dz/z0)
+    phase = -C.pi/wavelength*dz/(dz**2+z0**2)*x**2+phi/2
+    m = np.arange(n+1).reshape((-1,)+(1,)*(psi.ndim-1))
+    return 2**(1/4)/np.sqrt(omega)*psi*np.exp(1j*(phase+m*phi))
+
+
+def _hgfarfield_f(n, theta, wavelength, omega0):
+    """
+    计算0至n阶归一化一维Hermite-Gaussian光的远场复振幅，与NormalizedHGBeam1D.farfield_f的约定一致
+    :param n: 最高模式数
+    :param theta: 远场角度
+    :param wavelength: 波长
+    :param omega0: 等价基模的束腰半径
+    :return: 形状为(n+1, *theta.shape)的复数组
+    """
+    theta0 = wavelength/(C.pi*omega0)
+    psi = hermite_functions(n, np.sqrt(2)*np.asarray(theta)/theta0)
+    m = np.arange(n+1).reshape((-1,)+(1,)*(psi.ndim-1))
+    return 2**(1/4)/np.sqrt(theta0)*psi*np.exp(1j*(m+1/2)*C.pi/2)
+
+
+def _hgfocalplane_f(farfield_f, f, *xs):
+    """
+    由远场函数按x=f*theta缩放得到焦距为f的透镜后焦面上的光场(不含二次相位)。振幅按焦面坐标
+    归一化，每个横向维度除以sqrt(f)，一维与二维光束以及叠加光束共用
+    :param farfield_f: 远场函数farfield_f(*thetas) -> (ampl, phase)
+    :param f: 透镜焦距
+    :param xs: 焦面上各个横向维度的坐标
+    :return: (ampl, phase)
+    """
+    ampl, phase = farfield_f(*(x/f for x in xs))
+    return ampl/np.sqrt(f)**len(xs), phase
+
+
+def _trapz_weights(x):
+    """
+    计算一维采样坐标的梯形求积权重
+    :param x: 单调的一维采样坐标
+    :return: 与x形状相同的权重
+    """
+    dx = np.diff(x)
+    w = np.zeros_like(x)
+    w[:-1] += dx/2
+    w[1:] += dx/2
+    return w
@@ -12,14 +12,26 @@
 
     3.
     Wavelength - 波长
+
+    4.
+    Diagnostics - 近似公式警告的汇总器
+
+    - object
+
+    1.
+    diagnostics - 全局的Diagnostics实例
 """
 
+import logging
+from contextlib import contextmanager
+
 from scipy import constants as C
 from ._utils import PrintableObject
 
 __all__ = [
     'RTL', 'RTLConverter',
-    'Position', 'Wavelength'
+    'Position', 'Wavelength',
+    'Diagnostics', 'diagnostics'
 ]
 
 
@@ -97,14 +109,16 @@ class RTLConverter:
         :return: 反射率，透射率，损耗
         """
         m = (r, t, l)
-        N_ct = m.count(None)
+        # 使用is比较，r、t、l可以是数组
+        isnone = [v is None for v in m]
+        N_ct = sum(isnone)
         if N_ct >= 2:
             return m
         elif N_ct == 0:
             m_sum = sum(m)
             return r/m_sum, t/m_sum, l/m_sum
         else:
-            i = m.index(None)
+            i = isnone.index(True)
             if i == 0:
                 return 1-t-l, t, l
             elif i == 1:
@@ -238,3 +252,73 @@ class Wavelength(PrintableObject):
     def nu_angular(self):
         """角频率[1/T]"""
         return self.get_property('nu_angular', lambda: 2*C.pi*self.nu)
+
+
+class Diagnostics:
+    """
+    此类汇总计算中使用近似公式时产生的警告。每类警告记录出现次数以及前几次的参数样本。
+
+    在batch()之外，警告与以前一样立即通过logging.warning输出；在batch()之内只记录，
+    batch结束时每类警告只输出一次汇总。immediate为True时即使在batch()之内也立即输出。
+    例如
+
+        with diagnostics.batch():
+            for length in lengths:
+                cavity.change_params(length=length)
+                cavity.kappa
+    """
+
+    def __init__(self, immediate=False, nsamples=3):
+        """
+        :param immediate: 是否在batch()之内也立即输出警告
+        :param nsamples: 每类警告保留的参数样本数
+        """
+        self.immediate = immediate
+        self.nsamples = nsamples
+        self.records = {}
+        self.__depth = 0
+
+    def warn(self, category, message, *args, **params):
+        """
+        记录一次警告。信息与logging一样以message % args的形式延迟格式化，
+        同一类别只在第一次出现时格式化
+        :param category: 警告类别
+        :param message: 警告信息
+        :param args: 格式化参数
+        :param params: 触发警告的参数
+        """
+        if self.immediate or self.__depth == 0:
+            logging.warning(message, *args)
+            return
+        record = self.records.get(category)
+        if record is None:
+            record = {'count': 0, 'message': message % args if args else message, 'samples': []}
+            self.records[category] = record
+        record['count'] += 1
+        if len(record['samples']) < self.nsamples:
+            record['samples'].append(params)
+
+    def report(self):
+        """
+        每类警告输出一次汇总，并清空记录
+        :return: 汇总的记录{category: {'count', 'message', 'samples'}}
+        """
+        records, self.records = self.records, {}
+        for category, record in records.items():
+            logging.warning("[%s] %s (%d times, e.g. %s)", category, record['message'],
+                            record['count'], record['samples'])
+        return records
+
+    @contextmanager
+    def batch(self):
+        """在此上下文中只记录警告，结束时输出汇总。可以嵌套，只在最外层结束时输出"""
+        self.__depth += 1
+        try:
+            yield self
+        finally:
+            self.__depth -= 1
+            if self.__depth == 0:
+                self.report()
+
+
+diagnostics = Diagnostics()
@@ -0,0 +1,307 @@
+"""
+用于描述由多个镜片与透镜组成的谐振腔(折叠腔、环形腔、腔内透镜等)的模块。fpcavity模块只能
+处理两个腔镜的F-P腔，此模块使用ABCD矩阵求出往返矩阵，再求解自洽的q参数。所有矩阵都是形状为
+(..., 2, 2)的数组，元件参数与间距可以是相互广播的数组，一次计算整个参数扫描。此模块描述了
+
+    - class
+
+    1.
+    Resonator - 由镜片、透镜与间距组成的谐振腔
+
+    - function
+
+    1.
+    calculate_abcd_propagation - 自由传播的ABCD矩阵
+
+    2.
+    calculate_abcd_lens - 薄透镜(或等效焦距的反射镜)的ABCD矩阵
+
+    3.
+    calculate_eigen_q - 往返矩阵的自洽q参数
+
+    4.
+    transform_q - q参数经过ABCD矩阵的变换
+"""
+
+import numpy as np
+from scipy import constants as C
+
+from .mirror import Mirror, Lens
+from .misc import Wavelength
+
+__all__ = [
+    'Resonator',
+    'calculate_abcd_propagation', 'calculate_abcd_lens',
+    'calculate_eigen_q', 'transform_q'
+]
+
+
+class Resonator(Wavelength):
+    """
+    此类描述了由元件elements与间距spacings组成的谐振腔。元件为mirror.Mirror或mirror.Lens，
+    spacings[i]为elements[i]与elements[i+1]之间的距离。
+
+    线形腔(ring为False)的第一个与最后一个元件为端镜，中间的元件为折叠镜或透镜，往返时经过两次，
+    spacings的长度为len(elements)-1；环形腔(ring为True)中光依次经过所有元件后回到第一个元件，
+    spacings的长度为len(elements)，最后一项为elements[-1]与elements[0]之间的距离。
+
+    曲率半径为roc的镜片等效为焦距roc/2的透镜，凹面为正，与fpcavity相同。光以入射角angle照射
+    镜片时，x方向(入射面内)的等效焦距为roc*cos(angle)/2，y方向为roc/(2*cos(angle))，因此折叠腔
+    的两个方向分别计算。x、y方向的结果保存在第一个维度中，即结果的形状为(2, ...)。
+
+    元件参数(例如Mirror.roc、Lens.f)与间距可以是相互广播的数组。元件对象的参数改变后，需要调用
+    change_params(elements=...)重新计算。
+
+    此类可以通过以下属性构建：
+        wavelength - 波长
+        elements - 元件列表
+        spacings - 间距列表
+        angles - 各元件的入射角列表，默认为0
+        ring - 是否为环形腔，默认为False
+    """
+    name = 'Resonator'
+
+    modifiable_properties = ('wavelength', 'elements', 'spacings', 'angles', 'ring')
+
+    def __init__(self, name='Resonator', **kwargs):
+        kwargs.update(ring=kwargs.get('ring', False))
+        kwargs.update(angles=kwargs.get('angles', [0]*len(kwargs.get('elements', ()))))
+
+        super().__init__(**kwargs)
+        self.name = name
+
+        self.property_set.add_required(Resonator.modifiable_properties)
+
+        for prop in Resonator.modifiable_properties:
+            self.property_set[prop] = kwargs.get(prop, None)
+
+        nspacings = len(self.elements)-(0 if self.ring else 1)
+        if len(self.spacings) != nspacings:
+            raise ValueError("expected %d spacings, got %d." % (nspacings, len(self.spacings)))
+
+    @property
+    def elements(self):
+        """元件列表"""
+        return self.get_property('elements')
+
+    @property
+    def spacings(self):
+        """间距列表[L]"""
+        return self.get_property('spacings')
+
+    @property
+    def angles(self):
+        """各元件的入射角列表[1]"""
+        return self.get_property('angles')
+
+    @property
+    def ring(self):
+        """是否为环形腔"""
+        return self.get_property('ring')
+
+    @property
+    def steps(self):
+        """
+        往返一次依次经过的步骤[('d', i)或('e', i)]，从elements[0]之后开始，到elements[0]结束。
+        ('d', i)为经过spacings[i]，('e', i)为经过elements[i]
+        """
+        def v_f():
+            n = len(self.elements)
+            if self.ring:
+                return [s for i in range(n) for s in (('d', i), ('e', (i+1) % n))]
+            forward = [s for i in range(n-1) for s in (('d', i), ('e', i+1))]
+            backward = [s for i in range(n-2, -1, -1) for s in (('d', i), ('e', i))]
+            return forward+backward
+        return self.get_property('steps', v_f)
+
+    @property
+    def focals(self):
+        """各元件在x、y方向的等效焦距列表[L]"""
+        def v_f():
+            focals = []
+            for element, angle in zip(self.elements, self.angles):
+                if isinstance(element, Mirror):
+                    cos = np.cos(angle)
+                    focals.append((element.roc*cos/2, element.roc/cos/2))
+                elif isinstance(element, Lens):
+                    focals.append((element.f, element.f))
+                else:
+                    raise TypeError("elements must be Mirror or Lens, got %r." % type(element))
+            return focals
+        return self.get_property('focals', v_f)
+
+    @property
+    def shape(self):
+        """元件参数与间距广播后的形状"""
+        return self.get_property('shape', lambda: np.broadcast_shapes(
+            *(np.shape(f) for fs in self.focals for f in fs),
+            *(np.shape(d) for d in self.spacings)))
+
+    @property
+    def matrices(self):
+        """各元件在x、y方向的ABCD矩阵列表，每项的形状为(2,)+shape+(2, 2)"""
+        def v_f():
+            return [calculate_abcd_lens(np.stack([np.broadcast_to(f, self.shape) for f in fs]))
+                    for fs in self.focals]
+        return self.get_property('matrices', v_f)
+
+    @property
+    def roundtrip(self):
+        """从elements[0]之后开始的往返矩阵，形状为(2,)+shape+(2, 2)"""
+        def v_f():
+            m = np.eye(2)
+            for kind, i in self.steps:
+                if kind == 'd':
+                    m = calculate_abcd_propagation(np.broadcast_to(self.spacings[i], self.shape))@m
+                else:
+                    m = self.matrices[i]@m
+            return m
+        return self.get_property('roundtrip', v_f)
+
+    @property
+    def m(self):
+        """往返矩阵迹的一半(A+D)/2，|m|<1时稳定[1]"""
+        return self.get_property('m', lambda: (self.roundtrip[..., 0, 0]+self.roundtrip[..., 1, 1])/2)
+
+    @property
+    def stable(self):
+        """x、y方向是否都稳定"""
+        return self.get_property('stable', lambda: np.all(np.abs(self.m) < 1, axis=0)[()])
+
+    @property
+    def modes(self):
+        """
+        沿往返方向求出的腔模参数{'q', 'omegam', 'zeta', 'zeta_rt'}：q为第一次经过各元件之后的
+        q参数(elements[0]之后为自洽解)，omegam为各元件处的模场半径，zeta为各段间距的Gouy相位
+        (线形腔取第一次经过时的值)，zeta_rt为往返Gouy相位。不稳定的腔为nan
+        """
+        def v_f():
+            n = len(self.elements)
+            q = calculate_eigen_q(self.roundtrip)
+            qs = [None]*n
+            zetas = [None]*len(self.spacings)
+            qs[0] = q
+            zeta_rt = 0
+            for kind, i in self.steps:
+                if kind == 'd':
+                    d = self.spacings[i]
+                    with np.errstate(invalid='ignore'):
+                        zeta = np.arctan((q.real+d)/q.imag)-np.arctan(q.real/q.imag)
+                    # 经过焦点时arctan跳变pi
+                    zeta = np.mod(zeta, C.pi)
+                    zeta_rt = zeta_rt+zeta
+                    if zetas[i] is None:
+                        zetas[i] = zeta
+                    q = q+d
+                else:
+                    q = transform_q(q, self.matrices[i])
+                    if qs[i] is None:
+                        qs[i] = q
+            qs = np.stack(np.broadcast_arrays(*qs))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                omegam = np.sqrt(-self.wavelength/(C.pi*(1/qs).imag))
+            return {'q': qs, 'omegam': omegam, 'zeta': np.stack(np.broadcast_arrays(*zetas)),
+                    'zeta_rt': zeta_rt}
+        return self.get_property('modes', v_f)
+
+    @property
+    def omegam(self):
+        """各元件处的模场半径，形状为(len(elements), 2, ...)[L]"""
+        return self.get_property('omegam', lambda: self.modes['omegam'])
+
+    @property
+    def omega0(self):
+        """各段间距对应的束腰半径，形状为(len(spacings), 2, ...)[L]"""
+        return self.get_property(
+            'omega0', lambda: np.sqrt(self.wavelength*self.modes['q'][:len(self.spacings)].imag/C.pi))
+
+    @property
+    def p0(self):
+        """
+        各段间距对应的束腰相对于该段起始元件的位置，形状为(len(spacings), 2, ...)，
+        位于0与spacings[i]之间时束腰在该段之内[L]
+        """
+        return self.get_property('p0', lambda: -self.modes['q'][:len(self.spacings)].real)
+
+    @property
+    def zeta(self):
+        """各段间距的单程Gouy相位，形状为(len(spacings), 2, ...)[1]"""
+        return self.get_property('zeta', lambda: self.modes['zeta'])
+
+    @property
+    def zeta_rt(self):
+        """往返Gouy相位，形状为(2, ...)[1]"""
+        return self.get_property('zeta_rt', lambda: self.modes['zeta_rt'])
+
+    @property
+    def fsr(self):
+        """自由光谱范围[1/T]"""
+        def v_f():
+            length = sum(np.asarray(d, dtype=float) for d in self.spacings)
+            return C.c/(length if self.ring else 2*length)
+        return self.get_property('fsr', v_f)
+
+    def nu_f(self, q, mx=0, my=0):
+        """
+        计算(q, mx, my)模式的共振频率fsr*(q+((mx+1/2)*zetax_rt+(my+1/2)*zetay_rt)/(2pi))
+        :param q: 纵模数
+        :param mx: x方向模式数
+        :param my: y方向模式数
+        :return: 共振频率
+        """
+        zetax, zetay = self.zeta_rt
+        return self.fsr*(q+((mx+1/2)*zetax+(my+1/2)*zetay)/(2*C.pi))
+
+
+def calculate_abcd_propagation(d):
+    """
+    计算自由传播的ABCD矩阵
+    :param d: 传播距离，可以是数组
+    :return: 形状为d.shape+(2, 2)的矩阵
+    """
+    d = np.asarray(d, dtype=float)
+    m = np.zeros(d.shape+(2, 2))
+    m[..., 0, 0] = m[..., 1, 1] = 1
+    m[..., 0, 1] = d
+    return m
+
+
+def calculate_abcd_lens(f):
+    """
+    计算薄透镜的ABCD矩阵，曲率半径为roc的反射镜可以使用f=roc/2
+    :param f: 焦距，可以是数组，平面镜为np.inf
+    :return: 形状为f.shape+(2, 2)的矩阵
+    """
+    f = np.asarray(f, dtype=float)
+    m = np.zeros(f.shape+(2, 2))
+    m[..., 0, 0] = m[..., 1, 1] = 1
+    m[..., 1, 0] = -1/f
+    return m
+
+
+def calculate_eigen_q(m):
+    """
+    计算往返矩阵的自洽q参数，即q=(Aq+B)/(Cq+D)中虚部为正的解，1/q=(D-A)/(2B)-i*sqrt(1-m^2)/|B|，
+    其中m=(A+D)/2。不稳定(|m|>=1)时结果为nan
+    :param m: 形状为(..., 2, 2)的往返矩阵，行列式为1
+    :return: q参数
+    """
+    m = np.asarray(m, dtype=float)
+    a, b, c, d = m[..., 0, 0], m[..., 0, 1], m[..., 1, 0], m[..., 1, 1]
+    half = (a+d)/2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        invq = (d-a)/(2*b)-1j*np.sqrt(1-half**2)/np.abs(b)
+        q = 1/invq
+    return np.where(np.abs(half) < 1, q, np.nan*(1+1j))[()]
+
+
+def transform_q(q, m):
+    """
+    计算q参数经过ABCD矩阵后的值q'=(Aq+B)/(Cq+D)
+    :param q: q参数
+    :param m: 形状为(..., 2, 2)的矩阵
+    :return: q'
+    """
+    m = np.asarray(m)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (m[..., 0, 0]*q+m[..., 0, 1])/(m[..., 1, 0]*q+m[..., 1, 1])
@@ -0,0 +1,37 @@
+import unittest
+
+import numpy as np
+from cavag.extension.alignment import *
+from cavag.extension.fcqs import calculate_eta_fccoupling
+from cavag.fpcavity import CavityMode, calculate_loss_clipping
+
+
+class Test_functions(unittest.TestCase):
+
+    def setUp(self):
+        self.params = dict(length=100e-6, rocl=300e-6, rocr=400e-6, wavelength=780e-9,
+                           dl=30e-6, dr=30e-6, omegaf=3e-6)
+
+    def test_aligned(self):
+        result = calculate_alignment_map(**self.params)
+        mode = CavityMode(length=100e-6, wavelength=780e-9, rocl=300e-6, rocr=400e-6)
+        self.assertAlmostEqual(result['clippingl']/calculate_loss_clipping(30e-6, mode.omegaml), 1)
+        self.assertAlmostEqual(result['clippingr']/calculate_loss_clipping(30e-6, mode.omegamr), 1)
+        self.assertAlmostEqual(result['coupling'],
+                               calculate_eta_fccoupling(780e-9, 1.45, 3e-6, 300e-6, mode.omegaml))
+
+    def test_map(self):
+        xl = np.linspace(0, 5e-6, 6)
+        thetal = np.linspace(0, 0.02, 5)
+        result = calculate_alignment_map(xl=xl[:, None], thetal=thetal[None, :], **self.params)
+        for v in result.values():
+            self.assertEqual(v.shape, (6, 5))
+
+        # 没有倾斜时，偏移越大clipping损耗越大、耦合效率越低
+        self.assertTrue(np.all(np.diff(result['clippingl'][:, 0]) > 0))
+        self.assertTrue(np.all(np.diff(result['coupling'][:, 0]) < 0))
+        self.assertTrue(np.all(np.diff(np.abs(result['sl'][:, 0])) > 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,4 +23,40 @@ class Test_functions(unittest.TestCase):
         g = np.sqrt((3*gamma*constants.pi*constants.c**3)/(2*V_mode*(2*np.pi*nu)**2))
         gammat = 3e6
         C1 = g**2/(kappa*gammat)
-        self.assertEqual(calculate_C1(g, kappa, gammat), C1)
\ No newline at end of file
+        self.assertEqual(calculate_C1(g, kappa, gammat), C1)
+
+    def test_calculate_eta_ctrans(self):
+        rl, tl, rr, tr, lc = 0.999, 8e-4, 0.9999, 5e-5, 1e-5
+        pl, pr = calculate_eta_ctrans((rl, tl), (rr, tr), lc)
+        s = 1/(1-rl*rr*(1-lc)**2)/2
+        self.assertAlmostEqual(pl, tl*(1-lc)*(1+rr*(1-lc))*s)
+        self.assertAlmostEqual(pr, tr*(1-lc)*(1+rl*(1-lc))*s)
+        self.assertEqual(calculate_eta_ctrans((rl, tl), (rr, tr), lc, 'right'), pr)
+
+        # 数组参数与边缘情况
+        tls = np.array([0, tl, 2*tl])
+        pls, prs = calculate_eta_ctrans((rl, tls), (rr, tr), lc)
+        self.assertEqual(pls[0], 0)
+        self.assertAlmostEqual(pls[1], pl, places=12)
+        self.assertEqual(calculate_eta_ctrans((1, 0), (1, 0), 0), (0, 0))
+
+    def test_calculate_eta_fccoupling(self):
+        wavelength, nf, omegaf, roc, omegam = 780e-9, 1.45, 3e-6, 200e-6, 5e-6
+        eta0 = calculate_eta_fccoupling(wavelength, nf, omegaf, roc, omegam)
+        self.assertEqual(calculate_eta_fccoupling(wavelength, nf, omegaf, roc, omegam, 0, 0), eta0)
+
+        # 平面波前、模场相同时为exp(-d^2/omega^2)
+        d = np.array([0.5e-6, 1e-6, 2e-6])
+        self.assertTrue(np.allclose(calculate_eta_fccoupling(wavelength, nf, omegaf, np.inf, omegaf, d),
+                                    np.exp(-d**2/omegaf**2)))
+
+        # 与数值积分比较
+        x = np.linspace(-40e-6, 40e-6, 1601)
+        xx, yy = np.meshgrid(x, x, indexing='ij')
+        k = 2*np.pi*nf/wavelength
+        for offset, offsetf in ((1e-6, 0), (2e-6, -1e-6), (0, 1.5e-6)):
+            f = np.exp(-(xx**2+yy**2)/omegaf**2)
+            u = np.exp(-((xx-offset-offsetf)**2+yy**2)/omegam**2-1j*k*((xx-offsetf)**2+yy**2)/(2*roc))
+            eta = np.abs(np.sum(f*u))**2/(np.sum(f**2)*np.sum(np.abs(u)**2))
+            self.assertAlmostEqual(
+                calculate_eta_fccoupling(wavelength, nf, omegaf, roc, omegam, offset, offsetf)/eta, 1, places=6)
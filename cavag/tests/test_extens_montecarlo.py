@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+from cavag.extension.montecarlo import *
+from cavag.fpcavity import Cavity, CavityMode, calculate_cavity_loss
+
+
+class Test_StreamingStatistics(unittest.TestCase):
+
+    def test_update(self):
+        x = np.random.default_rng(0).normal(size=10000)
+        stat = StreamingStatistics(bins=400, range=(-5, 5))
+        for batch in np.array_split(x, 7):
+            stat.update(batch)
+        stat.update([np.nan])
+
+        self.assertEqual(stat.count, 10000)
+        self.assertEqual(stat.nnan, 1)
+        self.assertAlmostEqual(stat.mean, x.mean())
+        self.assertAlmostEqual(stat.var, x.var(ddof=1))
+        self.assertEqual((stat.min, stat.max), (x.min(), x.max()))
+        self.assertEqual(stat.hist.sum()+stat.underflow+stat.overflow, 10000)
+        q = [0.05, 0.5, 0.95]
+        self.assertTrue(np.allclose(stat.quantile(q), np.quantile(x, q), atol=10/400))
+
+        # 没有样本时分位数为nan
+        empty = StreamingStatistics()
+        empty.update([np.nan])
+        self.assertTrue(np.all(np.isnan(empty.quantile(q))))
+        self.assertTrue(np.isnan(empty.quantile(0.5)))
+
+
+class Test_functions(unittest.TestCase):
+
+    def setUp(self):
+        self.nominal = dict(length=100e-6, rocl=300e-6, rocr=300e-6, rl=0.9999, rr=0.9998,
+                            wavelength=780e-9, gammat=2*np.pi*6e6, omegaf=3e-6)
+
+    def test_calculate_cavity_quantities(self):
+        p = self.nominal
+        q = calculate_cavity_quantities(**p)
+        cavity = Cavity(length=p['length'], rocl=p['rocl'], rocr=p['rocr'],
+                        rl=p['rl'], tl=1-p['rl'], ll=0, rr=p['rr'], tr=1-p['rr'], lr=0)
+        mode = CavityMode(length=p['length'], wavelength=p['wavelength'], rocl=p['rocl'], rocr=p['rocr'])
+        self.assertAlmostEqual(q['finesse']/calculate_cavity_loss(p['length'], p['rl'], p['rr'])['finesse'], 1)
+        self.assertAlmostEqual(q['finesse']/cavity.finesse, 1, places=3)
+        self.assertAlmostEqual(q['omega0']/mode.omega0, 1)
+        self.assertAlmostEqual(q['v_mode']/mode.v_mode, 1)
+
+        q = calculate_cavity_quantities(**dict(p, length=np.array([100e-6, 700e-6])))
+        self.assertTrue(np.isnan(q['omega0'][1]) and np.isnan(q['c1'][1]))
+        self.assertTrue(np.isnan(q['finesse'][1]) and np.isfinite(q['finesse'][0]))
+
+    def test_run_montecarlo(self):
+        sigma = dict(length=1e-6, rocl=5e-6, rocr=5e-6, rl=1e-5, omegaf=0.1e-6)
+        stats = run_montecarlo(self.nominal, sigma, 3000, batchsize=1000, seed=1)
+        stats2 = run_montecarlo(self.nominal, sigma, 3000, batchsize=1000, seed=1)
+
+        self.assertEqual(set(stats), {'finesse', 'omega0', 'v_mode', 'coupling', 'c1'})
+        for k in stats:
+            self.assertEqual(stats[k].count, 3000)
+            self.assertEqual(stats[k].mean, stats2[k].mean)
+            self.assertTrue(np.all(stats[k].hist == stats2[k].hist))
+
+        nominal = calculate_cavity_quantities(**self.nominal)
+        self.assertAlmostEqual(stats['omega0'].mean/nominal['omega0'], 1, places=2)
+        self.assertTrue(stats['omega0'].quantile(0.01) < nominal['omega0'] < stats['omega0'].quantile(0.99))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+from cavag.extension.optimize import *
+from cavag.extension.fcqs import *
+from cavag.fpcavity import Cavity, CavityMode, calculate_loss_clipping, calculate_cavity_loss
+
+
+class Test_functions(unittest.TestCase):
+
+    def setUp(self):
+        self.kwargs = dict(wavelength=780e-9, gammat=2*np.pi*6e6, dl=40e-6, dr=40e-6,
+                           ll=10e-6, lr=10e-6)
+        self.bounds = ((20e-6, 300e-6), (50e-6, 500e-6), (50e-6, 500e-6),
+                       (1e-6, 1e-3), (1e-6, 1e-3))
+
+    def test_calculate_eta_extraction(self):
+        length, rocl, rocr, tl, tr = 100e-6, 300e-6, 200e-6, 1e-4, 2e-6
+        wavelength, gammat = self.kwargs['wavelength'], self.kwargs['gammat']
+
+        mode = CavityMode(length=length, wavelength=wavelength, rocl=rocl, rocr=rocr)
+        ll = self.kwargs['ll']+calculate_loss_clipping(self.kwargs['dl'], mode.omegaml)
+        lr = self.kwargs['lr']+calculate_loss_clipping(self.kwargs['dr'], mode.omegamr)
+        cavity = Cavity(length=length, rocl=rocl, rocr=rocr,
+                        rl=1-tl-ll, tl=tl, ll=ll, rr=1-tr-lr, tr=tr, lr=lr)
+
+        kappa = calculate_cavity_loss(length, cavity.rl, cavity.rr)['kappa']
+        g = calculate_g(calculate_mu(mode.nu, gammat), calculate_emax(mode.v_mode, mode.nu))
+        c1 = calculate_c1(g, kappa, gammat)
+        eta0 = calculate_eta_cpemit(c1)*calculate_eta_cpext(kappa, gammat)
+        pl, pr = calculate_eta_ctrans((cavity.rl, cavity.tl), (cavity.rr, cavity.tr), 0)
+        eta = eta0*pl
+
+        self.assertAlmostEqual(calculate_eta_extraction(length, rocl, rocr, tl, tr, **self.kwargs), eta)
+        self.assertAlmostEqual(calculate_eta_extraction(length, rocl, rocr, tl, tr, direction='right',
+                                                        **self.kwargs), eta0*pr)
+        self.assertAlmostEqual(calculate_eta_extraction(length, rocl, rocr, tl, tr, direction='both',
+                                                        **self.kwargs), eta0*(pl+pr))
+
+        # 数组计算，不稳定的腔效率为0
+        lengths = np.array([100e-6, 400e-6, 600e-6])
+        etas = calculate_eta_extraction(lengths[:, None], rocl, rocr, tl, np.array([tr, 2*tr]), **self.kwargs)
+        self.assertEqual(etas.shape, (3, 2))
+        self.assertAlmostEqual(etas[0, 0], eta)
+        self.assertTrue(np.all(etas[2] == 0))
+
+        # clipping损耗上限
+        self.assertEqual(calculate_eta_extraction(length, rocl, rocr, tl, tr, clipmax=0, **self.kwargs), 0)
+
+    def test_optimize_cavity(self):
+        report = optimize_cavity(self.bounds, nstarts=4, nsamples=256, seed=0, workers=1, **self.kwargs)
+        best = report.designs[0]
+
+        for (lower, upper), v in zip(self.bounds, best[:-1]):
+            self.assertTrue(lower <= v <= upper)
+        self.assertAlmostEqual(calculate_eta_extraction(*best[:-1], **self.kwargs), best.eta)
+
+        rng = np.random.default_rng(0)
+        b = np.asarray(self.bounds)
+        samples = b[:, 0]+rng.random((256, 5))*(b[:, 1]-b[:, 0])
+        self.assertGreaterEqual(best.eta, calculate_eta_extraction(*samples.T, **self.kwargs).max())
+        self.assertGreater(report.nevals, 256)
+        self.assertGreater(report.throughput, 0)
+
+        report2 = optimize_cavity(self.bounds, nstarts=4, nsamples=256, seed=0, workers=2, **self.kwargs)
+        self.assertAlmostEqual(report2.designs[0].eta, best.eta)
+
+
+if __name__ == '__main__':
+    unittest.main()
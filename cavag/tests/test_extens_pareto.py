@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+from cavag.extension.pareto import *
+from cavag.fpcavity import (Cavity, CavityMode, calculate_loss_clipping, calculate_loss_scattering,
+                            calculate_cavity_loss)
+
+
+class Test_functions(unittest.TestCase):
+
+    def setUp(self):
+        self.fixed = dict(wavelength=780e-9, omegaf=3e-6, dl=40e-6, dr=40e-6,
+                          tl=20e-6, tr=20e-6, ll=10e-6, lr=10e-6, sigmasc=0.2e-9)
+
+    def test_calculate_design_objectives(self):
+        length, rocl, rocr = np.array([50e-6, 100e-6, 500e-6]), 200e-6, 300e-6
+        result = calculate_design_objectives(length, rocl, rocr, **self.fixed)
+        self.assertEqual(set(result), set(OBJECTIVES))
+        self.assertTrue(np.all(np.isnan([result[k][2] for k in result])))
+
+        mode = CavityMode(length=100e-6, wavelength=780e-9, rocl=rocl, rocr=rocr)
+        clip = calculate_loss_clipping(40e-6, mode.omegaml)+calculate_loss_clipping(40e-6, mode.omegamr)
+        self.assertAlmostEqual(result['v_mode'][1]/mode.v_mode, 1)
+        self.assertAlmostEqual(result['clipping'][1]/clip, 1)
+        lsc = calculate_loss_scattering(0.2e-9, 780e-9)
+        rl = 1-20e-6-10e-6-calculate_loss_clipping(40e-6, mode.omegaml)-lsc
+        rr = 1-20e-6-10e-6-calculate_loss_clipping(40e-6, mode.omegamr)-lsc
+        cavity = Cavity(length=100e-6, rocl=rocl, rocr=rocr, rl=rl, tl=1-rl, ll=0, rr=rr, tr=1-rr, lr=0)
+        self.assertAlmostEqual(result['finesse'][1]/cavity.finesse, 1, places=4)
+        self.assertAlmostEqual(result['finesse'][1]/calculate_cavity_loss(100e-6, rl, rr)['finesse'], 1)
+
+    def test_find_pareto_front(self):
+        rng = np.random.default_rng(1)
+        for k in (2, 3):
+            points = rng.random((500, k))
+            points[10] = points[20]
+            points[30, 0] = np.nan
+            index = find_pareto_front(points)
+
+            # 与逐点比较的结果一致
+            expected = []
+            for i, p in enumerate(points):
+                if np.any(np.isnan(p)):
+                    continue
+                dominated = np.all(points <= p, axis=1) & np.any(points < p, axis=1)
+                if not np.any(dominated) and not any(np.all(points[j] == p) for j in expected):
+                    expected.append(i)
+            self.assertEqual(set(index), set(expected))
+            self.assertTrue(np.all(np.diff(points[index, 0]) >= 0))
+
+    def test_explore_designs(self):
+        bounds = {'length': (20e-6, 200e-6), 'rocl': (100e-6, 500e-6), 'rocr': (100e-6, 500e-6)}
+        front = explore_designs(bounds, 5000, batchsize=1000, seed=0, **self.fixed)
+        self.assertEqual(front.nevals, 5000)
+        self.assertEqual(set(front.params), set(bounds))
+        n = len(front.objectives['finesse'])
+        self.assertGreater(n, 0)
+        for v in list(front.params.values())+list(front.objectives.values()):
+            self.assertEqual(v.shape, (n,))
+
+        # 分批与一次性计算的前沿相同
+        whole = explore_designs(bounds, 5000, batchsize=5000, seed=0, **self.fixed)
+        self.assertEqual(len(whole.objectives['finesse']), n)
+
+        # 只比较两个目标
+        front = explore_designs(bounds, 2000, objectives={'finesse': True, 'v_mode': False}, seed=0,
+                                **self.fixed)
+        self.assertTrue(np.all(np.diff(front.objectives['finesse']) <= 0))
+        self.assertTrue(np.all(np.diff(front.objectives['v_mode']) <= 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+from cavag.extension.scan import *
+from cavag.fpcavity import Cavity, get_resonant_length
+
+
+class Test_functions(unittest.TestCase):
+
+    def setUp(self):
+        self.wavelength = 780e-9
+        self.cavity = Cavity(length=100e-6, rocl=300e-6, rocr=300e-6,
+                             rl=0.999, tl=0.001, ll=0, rr=0.999, tr=0.001, lr=0)
+        self.weights = np.zeros((3, 3))
+        self.weights[0, 0], self.weights[1, 0], self.weights[0, 2] = 0.8, 0.15, 0.05
+
+    def test_triangle_scan(self):
+        t = np.array([0, 0.25, 0.5, 0.75, 1])
+        self.assertTrue(np.allclose(triangle_scan(t, 10, 2, 1), [9, 10, 11, 10, 9]))
+
+    def test_simulate_length_scan(self):
+        _, lengths = get_resonant_length(100e-6, self.wavelength, 300e-6, 300e-6,
+                                         np.array([0, 1, 2]), 0)
+        power = simulate_length_scan(self.cavity, self.weights, self.wavelength,
+                                     lambda t: lengths[np.asarray(t, dtype=int)], 3)
+        # 共振处的透射率为t/(1-g)^2乘以对应阶数的权重
+        self.assertTrue(np.allclose(power, [0.8, 0.15, 0.05], rtol=1e-3))
+
+        f = lambda t: triangle_scan(t, 100e-6, 2*self.wavelength, 1e-3)
+        full = simulate_length_scan(self.cavity, self.weights, self.wavelength, f, 10000, dt=1e-7)
+        chunks = []
+        out = np.zeros(10000)
+        simulate_length_scan(self.cavity, self.weights, self.wavelength, f, 10000, dt=1e-7,
+                             chunksize=999, out=out, callback=lambda start, p: chunks.append((start, p)))
+        self.assertTrue(np.allclose(out, full))
+        self.assertTrue(np.allclose(np.concatenate([p for _, p in chunks]), full))
+        self.assertEqual(chunks[1][0], 999)
+
+        lorentz = simulate_length_scan(self.cavity, self.weights, self.wavelength, f, 10000, dt=1e-7,
+                                       lineshape='lorentz')
+        self.assertTrue(np.allclose(lorentz, full, atol=1e-3))
+
+        # 含参数维度的权重需要先选取其中一组
+        with self.assertRaises(ValueError):
+            simulate_length_scan(self.cavity, np.stack([self.weights]*2, axis=-1), self.wavelength, f, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import io
+import unittest
+
+import numpy as np
+from cavag.extension.surrogate import *
+from cavag.fpcavity import CavityMode, calculate_mode_quantities
+
+
+class Test_CavitySurrogate(unittest.TestCase):
+
+    def setUp(self):
+        self.fixed = dict(rocr=300e-6, wavelength=780e-9, omegaf=3e-6)
+        self.surrogate = CavitySurrogate.build(
+            {'length': np.linspace(50e-6, 150e-6, 41), 'rocl': np.linspace(200e-6, 400e-6, 41)},
+            **self.fixed)
+
+    def test_query(self):
+        length, rocl = np.array([63.3e-6, 101.7e-6, 140e-6]), np.array([211e-6, 333e-6, 399e-6])
+        approx = self.surrogate(length=length, rocl=rocl)
+        exact = calculate_mode_quantities(length, rocl, **self.fixed)
+        for k in self.surrogate.names:
+            self.assertEqual(approx[k].shape, (3,))
+            self.assertTrue(np.all(np.abs(approx[k]-exact[k]) <= 1.01*self.surrogate.error_estimate[k][0]))
+            self.assertLess(self.surrogate.error_estimate[k][1], 1e-3)
+
+        # 网格范围外使用精确公式
+        approx = self.surrogate(length=[100e-6, 200e-6], rocl=250e-6)
+        exact = calculate_mode_quantities(200e-6, 250e-6, **self.fixed)
+        for k in self.surrogate.names:
+            self.assertEqual(approx[k][1], exact[k])
+
+    def test_save_load(self):
+        f = io.BytesIO()
+        self.surrogate.save(f)
+        f.seek(0)
+        loaded = CavitySurrogate.load(f)
+
+        self.assertEqual(loaded.names, self.surrogate.names)
+        self.assertEqual(loaded.fixed, self.fixed)
+        self.assertEqual(loaded.error_estimate, self.surrogate.error_estimate)
+        a = self.surrogate(length=88e-6, rocl=277e-6)
+        b = loaded(length=88e-6, rocl=277e-6)
+        for k in a:
+            self.assertEqual(a[k], b[k])
+
+        # 非浮点数的固定参数保持原来的类型
+        surrogate = CavitySurrogate(self.surrogate.axes, self.surrogate.values, self.surrogate.names,
+                                    dict(self.fixed, nf=2, tag='fiber'), self.surrogate.error_estimate)
+        f = io.BytesIO()
+        surrogate.save(f)
+        f.seek(0)
+        fixed = CavitySurrogate.load(f).fixed
+        self.assertEqual(fixed, surrogate.fixed)
+        self.assertIsInstance(fixed['nf'], int)
+        self.assertIsInstance(fixed['tag'], str)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+from scipy import constants
+from cavag.extension.thermal import *
+from cavag.fpcavity import get_available_wavelengthf, get_available_wavelength
+
+
+class Test_ThermalCavityModel(unittest.TestCase):
+
+    def setUp(self):
+        self.length, self.rocl, self.rocr = 100e-6, 300e-6, 500e-6
+        self.model = ThermalCavityModel(self.length, self.rocl, self.rocr, modes=((0, 0), (1, 0), (1, 1)),
+                                        nc=1.45, alpha=5.5e-7, dndt=1e-5)
+
+    def test_frequency(self):
+        model = self.model
+        p = model.get_longitudinal(780e-9)
+        self.assertEqual(p[0], get_available_wavelength(780e-9, self.length, self.rocl, self.rocr, 0, 0, nc=1.45)[0])
+
+        temperature = np.linspace(20, 30, 11)
+        nu = model.frequency_f(temperature, p)
+        self.assertEqual(nu.shape, (11, 3))
+
+        # 与get_available_wavelengthf比较
+        for i, t in enumerate(temperature):
+            dt = t-20
+            scale = 1+5.5e-7*dt
+            for j, (mx, my) in enumerate(model.modes):
+                f = get_available_wavelengthf(self.length*scale, self.rocl*scale, self.rocr*scale, mx, my,
+                                              nc=1.45+1e-5*dt)
+                wavelength = f(p[j])
+                self.assertAlmostEqual(nu[i, j]/(constants.c/wavelength), 1, places=12)
+
+        self.assertTrue(np.allclose(model.shift_f(20, p), 0))
+        # 均匀膨胀时模式间隔不变，相对漂移相同
+        shift = model.shift_f(temperature, p)
+        self.assertTrue(np.allclose(shift/model.frequency_f(20, p), shift[:, :1]/nu[0, 0], rtol=1e-6))
+
+    def test_strain(self):
+        model = self.model
+        p = model.get_longitudinal(780e-9)
+        strain = np.array([0, 1e-6, -1e-6])
+        nu = model.frequency_f(20, p, strain=strain)
+        self.assertEqual(nu.shape, (3, 3))
+
+        # 应变不改变曲率半径，Gouy相位改变
+        for i, s in enumerate(strain):
+            for j, (mx, my) in enumerate(model.modes):
+                f = get_available_wavelengthf(self.length*(1+s), self.rocl, self.rocr, mx, my, nc=1.45)
+                self.assertAlmostEqual(nu[i, j]/(constants.c/f(p[j])), 1, places=12)
+
+
+if __name__ == '__main__':
+    unittest.main()
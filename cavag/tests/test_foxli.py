@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+from cavag.foxli import *
+from cavag.fpcavity import CavityMode, calculate_gouy_phase
+
+
+class Test_FoxLiCavity(unittest.TestCase):
+
+    def setUp(self):
+        self.wavelength, self.length = 780e-9, 100e-6
+        self.rocl, self.rocr = 300e-6, 500e-6
+        self.cavity = FoxLiCavity(wavelength=self.wavelength, length=self.length,
+                                  size=80e-6, n=128, dl=30e-6, dr=30e-6,
+                                  hl=lambda x, y: calculate_spherical_height(x, y, self.rocl),
+                                  hr=lambda x, y: calculate_spherical_height(x, y, self.rocr))
+
+    def test_constructor(self):
+        self.assertEqual(self.cavity.nc, 1)
+        self.assertEqual(self.cavity.kernel.shape, (128, 128))
+        self.assertIs(self.cavity.kernel, self.cavity.kernel)
+        self.assertAlmostEqual(self.cavity.x[64], 0)
+
+    def test_spherical_cavity(self):
+        gamma, loss, nu, modes = self.cavity.solve_modes(nmodes=6)
+
+        self.assertTrue(np.all(np.diff(loss) >= 0))
+        self.assertLess(loss[0], 1e-4)
+
+        # 频率偏移与Gouy相位的比较
+        fsr = self.cavity.fsr
+        zeta = calculate_gouy_phase(self.length, self.rocl, self.rocr)
+        for order, i in ((0, 0), (1, 1), (1, 2), (2, 3), (2, 4), (2, 5)):
+            expected = (order+1)*zeta/np.pi % 1
+            expected = fsr*(expected-(expected >= 0.5))
+            self.assertAlmostEqual(nu[i]/fsr, expected/fsr, places=3)
+
+        # 基模的模场半径与解析解比较
+        mode = CavityMode(wavelength=self.wavelength, length=self.length,
+                          rocl=self.rocl, rocr=self.rocr)
+        x, y = np.meshgrid(self.cavity.x, self.cavity.x, indexing='ij')
+        i = np.abs(modes[0])**2
+        omega = np.sqrt(4*np.sum(x**2*i)/np.sum(i))
+        self.assertAlmostEqual(omega/mode.omegaml, 1, places=2)
+
+    def test_aperture_loss(self):
+        self.cavity.change_params(dl=14e-6, dr=14e-6)
+        _, loss_small, _, _ = self.cavity.solve_modes(nmodes=1)
+        self.cavity.change_params(dl=30e-6, dr=30e-6)
+        _, loss_large, _, _ = self.cavity.solve_modes(nmodes=1)
+        self.assertGreater(loss_small[0], loss_large[0])
+
+
+class Test_functions(unittest.TestCase):
+
+    def test_height(self):
+        x = np.linspace(-1e-6, 1e-6, 11)
+        roc = 300e-6
+        self.assertTrue(np.allclose(calculate_spherical_height(x, 0, roc),
+                                    roc-np.sqrt(roc**2-x**2), rtol=1e-9, atol=0))
+        depth, omega = 0.5e-6, np.sqrt(2*roc*0.5e-6)
+        self.assertTrue(np.allclose(calculate_gaussian_dimple_height(x, 0, depth, omega),
+                                    calculate_spherical_height(x, 0, roc), rtol=1e-4))
+
+
+if __name__ == '__main__':
+    unittest.main()
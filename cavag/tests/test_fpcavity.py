@@ -3,6 +3,7 @@ import unittest
 import numpy as np
 from scipy import constants
 from cavag.fpcavity import *
+from cavag.hgbeam import HGBeam, hermite_peak
 
 class Test_CavityStructure(unittest.TestCase):
 
@@ -142,6 +143,58 @@ class Test_Cavity(unittest.TestCase):
         self.assertAlmostEqual(asc.fsr, fsr)
         self.assertAlmostEqual(asc.finesse, finesse)
 
+    def test_airy_spectra(self):
+        length = 100e-6
+        asc = Cavity(length=length, rocl=200e-6, rocr=200e-6,
+                rl=0.5, tl=0.5, rr=0.5, tr=0.5)
+
+        # 无损耗时透射与反射之和为1
+        delta = np.linspace(-0.5, 0.5, 200001)*asc.fsr
+        t = asc.transmission_f(delta, chunksize=1 << 14)
+        r = asc.reflection_f(delta, chunksize=1 << 14)
+        self.assertTrue(np.allclose(t+r, 1))
+        self.assertAlmostEqual(np.max(t), 1)
+        self.assertTrue(np.allclose(asc.intracavity_f(delta), t/asc.tr))
+
+        # 低精细度时与精确的Airy线宽一致，而不是近似公式
+        g = 0.5
+        kappa = 2*np.arcsin((1-g)/(2*np.sqrt(g)))*constants.c/(2*length)
+        _, kappa_e = extract_linewidth(delta, t)
+        self.assertAlmostEqual(kappa_e/kappa, 1, places=6)
+
+        # 高精细度时与Cavity.kappa一致
+        asc.change_params(rl=0.999, tl=0.001, rr=0.999, tr=0.001)
+        delta = np.linspace(-5, 5, 100001)*asc.kappa
+        _, kappa_e = extract_linewidth(delta, asc.transmission_f(delta))
+        self.assertAlmostEqual(kappa_e/asc.kappa, 1, places=2)
+
+        # 扫描范围不包含完整的线宽
+        delta = np.linspace(-0.5, 3, 1001)*asc.kappa
+        with self.assertRaises(ValueError):
+            extract_linewidth(delta, asc.transmission_f(delta))
+        with self.assertRaises(ValueError):
+            extract_linewidth(-delta[::-1], asc.transmission_f(-delta[::-1]))
+
+    def test_kappa_diagnostics(self):
+        from cavag.misc import diagnostics
+        cavity = Cavity(length=100, rocl=300, rocr=300, rl=0.5, tl=0.5, ll=0, rr=0.5, tr=0.5, lr=0)
+        with self.assertLogs(level='WARNING') as cm:
+            with diagnostics.batch():
+                for length in range(100, 110):
+                    cavity.change_params(length=length)
+                    cavity.kappa
+        self.assertEqual(len(cm.output), 1)
+        self.assertIn('10 times', cm.output[0])
+
+    def test_array_properties(self):
+        length, nc = 100e-6, 1.5
+        rl = np.array([0.99, 0.999, 0.9999])
+        cavity = Cavity(length=length, nc=nc, rocl=300e-6, rocr=300e-6, rl=rl, tl=1-rl, ll=0,
+                rr=0.999, tr=0.001, lr=0)
+        self.assertAlmostEqual(cavity.fsr, 2*np.pi*constants.c/(2*nc*length))
+        self.assertTrue(np.allclose(cavity.kappa, constants.c*(2-rl-0.999)/(4*nc*length)))
+        self.assertEqual(cavity.finesse.shape, (3,))
+
 class Test_EqualCavity(unittest.TestCase):
 
     def test_constructor(self):
@@ -236,8 +289,8 @@ class Test_CavityMode(unittest.TestCase):
         self.assertEqual(acm.omega0, omega0)
         self.assertEqual(acm.omegaml, omegaml)
         self.assertEqual(acm.omegamr, omegamr)
-        self.assertEqual(acm.v_mode, v_mode)
-        self.assertEqual(acm.e, e)
+        self.assertAlmostEqual(acm.v_mode/v_mode, 1)
+        self.assertAlmostEqual(acm.e/e, 1)
     
     def test_change_properties(self):
         length, wavelength, rocl, rocr, a0 = 300, 9.8, 600, 400, 1
@@ -276,8 +329,86 @@ class Test_CavityMode(unittest.TestCase):
         self.assertEqual(acm.omega0, omega0)
         self.assertEqual(acm.omegaml, omegaml)
         self.assertEqual(acm.omegamr, omegamr)
-        self.assertEqual(acm.v_mode, v_mode)
-        self.assertEqual(acm.e, e)
+        self.assertAlmostEqual(acm.v_mode/v_mode, 1)
+        self.assertAlmostEqual(acm.e/e, 1)
+
+    def test_i_f(self):
+        length, wavelength, rocl, rocr, a0 = 300, 9.8, 600, 400, 2
+
+        acm = CavityMode(length=length, wavelength=wavelength,
+                rocl=rocl, rocr=rocr, a0=a0, mx=1, my=2)
+        hgb = HGBeam(a0=a0, wavelength=wavelength, p0=acm.p0,
+                omega0x=acm.omega0, omega0y=acm.omega0, mx=1, my=2)
+
+        z, x, y = 50, np.linspace(-20, 20, 9), 5
+        self.assertTrue(np.allclose(acm.i_f(z, x, y), hgb.i_f(z, x, y)))
+        self.assertTrue(np.allclose(hgb.i_f(z, x, y), hgb.u_f(z, x, y)[0]**2))
+        self.assertTrue(np.allclose(acm.i_f(z, x, y), acm.u_f(z, x, y)[0]**2))
+
+    def test_v_mode_higher_order(self):
+        length, wavelength = 300, 9.8
+        for rocl, rocr, mx, my in ((600, 400, 1, 2), (-2000, 400, 0, 1)):
+            acm = CavityMode(length=length, wavelength=wavelength,
+                    rocl=rocl, rocr=rocr, mx=mx, my=my, position=0)
+
+            # 数值积分(驻波cos^2因子平均为1/2)
+            z = np.linspace(-length/2, length/2, 61)
+            x = np.linspace(-100, 100, 401)
+            zz, xx, yy = np.meshgrid(z, x, x, indexing='ij')
+            i = acm.i_f(zz, xx, yy)
+            dv = (z[1]-z[0])*(x[1]-x[0])**2
+            v = np.sum(i.sum(axis=(1, 2))*np.where((z == z[0]) | (z == z[-1]), 0.5, 1))*dv/2/i.max()
+            self.assertAlmostEqual(acm.v_mode/v, 1, places=3)
+
+class Test_AstigmaticCavityMode(unittest.TestCase):
+
+    def test_constructor(self):
+        length, wavelength, rocl, rocr = 300, 9.8, 600, 400
+
+        acm = AstigmaticCavityMode(length=length, wavelength=wavelength, roclx=rocl, rocly=rocl,
+                rocrx=rocr, rocry=rocr, position=10)
+        cm = CavityMode(length=length, wavelength=wavelength, rocl=rocl, rocr=rocr, position=10)
+        for d in ('x', 'y'):
+            self.assertAlmostEqual(getattr(acm, 'omega0'+d), cm.omega0)
+            self.assertAlmostEqual(getattr(acm, 'p0'+d), cm.p0)
+            self.assertAlmostEqual(getattr(acm, 'omegaml'+d), cm.omegaml)
+            self.assertAlmostEqual(getattr(acm, 'omegamr'+d), cm.omegamr)
+            self.assertAlmostEqual(getattr(acm, 'zeta'+d), calculate_gouy_phase(length, rocl, rocr))
+        self.assertEqual(acm.splitting, 0)
+
+        z, x, y = 50, np.linspace(-20, 20, 9), 5
+        self.assertTrue(np.allclose(acm.i_f(z, x, y), cm.i_f(z, x, y)))
+
+    def test_change_properties(self):
+        length, wavelength, rocl, rocr = 300, 9.8, 600, 400
+
+        acm = AstigmaticCavityMode(length=length, wavelength=wavelength, roclx=rocl, rocly=rocl,
+                rocrx=rocr, rocry=rocr)
+        omega0y, p0y = acm.omega0y, acm.p0y
+        acm.change_params(roclx=800)
+
+        cm = CavityMode(length=length, wavelength=wavelength, rocl=800, rocr=rocr)
+        self.assertAlmostEqual(acm.omega0x, cm.omega0)
+        self.assertAlmostEqual(acm.p0x, cm.p0)
+        self.assertAlmostEqual(acm.omega0y, omega0y)
+        self.assertAlmostEqual(acm.p0y, p0y)
+        self.assertAlmostEqual(acm.splitting, calculate_astigmatic_splitting(length, 800, rocl, rocr, rocr))
+
+        # 两个方向束腰位置不同
+        hgb = HGBeam(a0=1, wavelength=wavelength, p0=acm.p0, p0x=acm.p0x, p0y=acm.p0y,
+                omega0x=acm.omega0x, omega0y=acm.omega0y, mx=0, my=0)
+        z, x, y = 50, np.linspace(-20, 20, 9), np.linspace(-10, 10, 9)
+        self.assertTrue(np.allclose(acm.i_f(z, x, y), hgb.i_f(z, x, y)))
+
+    def test_calculate_astigmatic_splitting(self):
+        length, roclx, rocr = 300, 600, 400
+        rocly = np.linspace(500, 700, 5)
+        splitting = calculate_astigmatic_splitting(length, roclx, rocly, rocr, rocr)
+        self.assertEqual(splitting.shape, (5,))
+        self.assertAlmostEqual(splitting[2], 0)
+        zeta = calculate_gouy_phase(length, np.array([roclx]*5), rocr)-calculate_gouy_phase(length, rocly, rocr)
+        self.assertTrue(np.allclose(splitting, constants.c/(2*length)*zeta/constants.pi))
+
 
 class Test_EqualCavityMode(unittest.TestCase):
    
@@ -370,6 +501,63 @@ class Test_EqualCavityMode(unittest.TestCase):
 
 class Test_functions(unittest.TestCase):
 
+    def test_calculate_coupling_spectrum(self):
+        length, wavelength, rocl, rocr = 300, 9.8, 600, 400
+        acm = CavityMode(length=length, wavelength=wavelength, rocl=rocl, rocr=rocr)
+
+        beam = HGBeam(wavelength=wavelength, p0=acm.p0, omega0x=acm.omega0, omega0y=acm.omega0,
+                      mx=1, my=0)
+        p = calculate_coupling_spectrum(beam, acm, 3)
+        self.assertEqual(p.shape, (4, 4))
+        self.assertAlmostEqual(p[1, 0], 1)
+
+        # 束腰失配与偏移
+        beam.change_params(p0=acm.p0+50, omega0x=1.2*acm.omega0, omega0y=acm.omega0,
+                           mx=0, my=0, dx=np.array([0, 5]))
+        p = calculate_coupling_spectrum(beam, acm, 20)
+        self.assertEqual(p.shape, (21, 21, 2))
+        self.assertTrue(np.allclose(p.sum(axis=(0, 1)), 1))
+        self.assertGreater(p[0, 0, 0], p[0, 0, 1])
+        self.assertTrue(np.allclose(p[:, 1::2, 0], 0))
+
+    def test_calculate_mode_volume(self):
+        length, wavelength, roc = 300, 9.8, 400
+        acm = SymmetricCavityMode(length=length, wavelength=wavelength, roc=roc)
+        self.assertAlmostEqual(calculate_mode_volume(length, roc, roc, wavelength)/acm.v_mode, 1)
+
+        mx, my = np.arange(4)[:, None], np.arange(3)
+        v = calculate_mode_volume(length, roc, roc, wavelength, mx, my)
+        self.assertEqual(v.shape, (4, 3))
+        self.assertTrue(np.allclose(v[:3], v[:3].T))
+        self.assertTrue(np.all(np.diff(v, axis=0) > 0))
+        # psi_1^2的最大值为2/(e*sqrt(pi))
+        self.assertAlmostEqual(v[1, 0]/v[0, 0], np.exp(1)/2)
+
+        # 标量与数组几何参数的结果相同
+        va = calculate_mode_volume(np.full(2, length), roc, roc, wavelength, mx[..., None], my[:, None])
+        self.assertEqual(va.shape, (4, 3, 2))
+        self.assertTrue(np.allclose(va[..., 1], v))
+        self.assertAlmostEqual(calculate_mode_volume(2*length, 2*roc, 2*roc, wavelength, 2, 1)/v[2, 1], 4)
+
+        # 缓存只按模式数，标量扫描腔长不会使缓存增长
+        currsize = hermite_peak.cache_info().currsize
+        for l in np.linspace(100, 700, 50):
+            calculate_mode_volume(l, roc, roc, wavelength, 2, 1)
+        self.assertEqual(hermite_peak.cache_info().currsize, currsize)
+
+    def test_calculate_mode_quantities(self):
+        q = calculate_mode_quantities(100e-6, 250e-6, 300e-6, 780e-9, omegaf=3e-6)
+        mode = CavityMode(length=100e-6, wavelength=780e-9, rocl=250e-6, rocr=300e-6)
+        for k in ('omega0', 'omegaml', 'omegamr', 'v_mode'):
+            self.assertAlmostEqual(q[k]/getattr(mode, k), 1)
+        self.assertTrue(0 < q['coupling'] < 1)
+
+        # 不给出光纤参数时不计算耦合效率，不稳定的腔为nan
+        q = calculate_mode_quantities(np.array([100e-6, 900e-6]), 250e-6, 300e-6, 780e-9)
+        self.assertNotIn('coupling', q)
+        self.assertTrue(np.all(np.isnan([q[k][1] for k in q])))
+        self.assertAlmostEqual(q['omega0'][0]/mode.omega0, 1)
+
     def test_judge_cavity_type(self):
         r1, r2 = judge_cavity_type(300, 200, 300)
         self.assertEqual(r1, True)
@@ -383,13 +571,284 @@ class Test_functions(unittest.TestCase):
         self.assertEqual(r1, False)
         self.assertEqual(r2, False)
     
+    def test_calculate_stability_map(self):
+        length = np.array([300, 300, 900, 400])
+        rocl = np.array([200, 200, 400, 600])
+        rocr = np.array([300, 200, 400, 400])
+
+        s, c, gl, gr, z0 = calculate_stability_map(length, rocl, rocr)
+        for i in range(len(length)):
+            r1, r2 = judge_cavity_type(length[i], rocl[i], rocr[i])
+            self.assertEqual(s[i], r1)
+            self.assertEqual(c[i], r2)
+        self.assertTrue(np.isnan(z0[2]))
+
+        acm = CavityMode(length=400, wavelength=1, rocl=600, rocr=400)
+        self.assertAlmostEqual(z0[3], acm.z0)
+        self.assertEqual(gl[3], acm.gl)
+        self.assertEqual(gr[3], acm.gr)
+
+        # 临界判断有容差
+        s, c, _, _, _ = calculate_stability_map(0.3, 0.1*3, 1e300)
+        self.assertTrue(s)
+        self.assertTrue(c)
+
+        # 网格广播
+        lengths = np.linspace(1, 1000, 100)[:, None]
+        rocs = np.linspace(1, 1000, 50)[None, :]
+        s, c, gl, gr, z0 = calculate_stability_map(lengths, rocs, rocs)
+        self.assertEqual(s.shape, (100, 50))
+        self.assertTrue(np.all(np.isnan(z0) == ~s))
+
+    def test_get_mode_spectrum(self):
+        length, rocl, rocr = 100e-6, 200e-6, 300e-6
+        nu_min, nu_max = 380e12, 390e12
+
+        nu, p, mx, my, degenerate = get_mode_spectrum(
+            length, rocl, rocr, 4, nu_min, nu_max)
+
+        self.assertTrue(np.all(np.diff(nu) >= 0))
+        self.assertTrue(np.all((nu >= nu_min) & (nu <= nu_max)))
+        self.assertTrue(np.all(mx+my <= 4))
+        for i in range(0, len(nu), 7):
+            f = get_available_wavelengthf(length, rocl, rocr, mx[i], my[i])
+            self.assertAlmostEqual(constants.c/f(p[i])/nu[i], 1)
+        # 每个纵模包含全部15个横模
+        self.assertEqual(np.sum(p == p[len(p)//2]), 15)
+        self.assertFalse(np.any(degenerate))
+
+        # g=0.5的对称腔中，横模阶数3与下一个纵模的基模简并
+        nu, p, mx, my, degenerate = get_mode_spectrum(
+            100e-6, 200e-6, 200e-6, 3, nu_min, nu_max, kappa=2*constants.pi*1e6)
+        self.assertTrue(np.all(degenerate[mx+my == 3]))
+        self.assertTrue(np.all(~degenerate[mx+my == 1]))
+
+        # 腔长扫描时结果在前面增加扫描维度，模式数较少的扫描点在末尾补齐
+        lengths = np.linspace(100e-6, 101e-6, 5)
+        kappa = 2*constants.pi*1e9*lengths/100e-6
+        scan = get_mode_spectrum(lengths, rocl, rocr, 3, nu_min, nu_max, kappa=kappa)
+        self.assertEqual(len({v.shape for v in scan}), 1)
+        self.assertEqual(scan[0].shape[0], 5)
+        for i in range(5):
+            single = get_mode_spectrum(lengths[i], rocl, rocr, 3, nu_min, nu_max, kappa=kappa[i])
+            n = len(single[0])
+            for v, w in zip(scan, single):
+                self.assertTrue(np.array_equal(v[i, :n], w))
+            self.assertTrue(np.all(np.isnan(scan[0][i, n:])))
+            self.assertTrue(np.all(scan[1][i, n:] == -1))
+
+    def test_get_resonant_length(self):
+        wavelength = np.array([780e-9, 852e-9, 866e-9])
+        rocl, rocr = 200e-6, np.array([[200e-6], [300e-6]])
+        length0 = 100e-6
+
+        p, length = get_resonant_length(length0, wavelength, rocl, rocr, 1, 2)
+        self.assertEqual(length.shape, (2, 3))
+        self.assertTrue(np.all(np.abs(length-length0) <= wavelength/2))
+        for i in range(2):
+            for j in range(3):
+                f = get_available_wavelengthf(length[i, j], rocl, rocr[i, 0], 1, 2)
+                self.assertAlmostEqual(f(p[i, j])/wavelength[j], 1, places=12)
+
+        p, length = get_resonant_length(length0, 780e-9, rocl, rocl, 0, 0, dp=np.arange(-1, 2))
+        self.assertTrue(np.all(np.diff(p) == 1))
+        self.assertTrue(np.allclose(np.diff(length), 780e-9/2))
+
+    def test_mirror_phase(self):
+        length, rocl, rocr = 100e-6, 200e-6, 300e-6
+        nu0 = constants.c/780e-9
+
+        # 介质膜的穿透深度
+        nu = nu0*np.linspace(0.95, 1.05, 1001)
+        phase = calculate_coating_phase(nu, nu0, 2.1, 1.45, 15)
+        self.assertAlmostEqual(phase[500], 0)
+        lpen = constants.c/(4*np.pi)*np.gradient(phase, nu)[500]
+        self.assertAlmostEqual(lpen/(780e-9/(4*(2.1-1.45))), 1, places=3)
+
+        # 线性相位等价于腔长增加lpen(两个腔镜)
+        phasef = get_mirror_phasef(nu, 2*4*np.pi*lpen*(nu-nu0)/constants.c)
+        p = np.arange(250, 260)
+        f = get_available_wavelengthf(length, rocl, rocr, 1, 0, phase=phasef)
+        zeta = calculate_gouy_phase(length, rocl, rocr)
+        expected = 2*(length+2*lpen)/(p+2*zeta/np.pi+4*lpen*nu0/constants.c)
+        self.assertTrue(np.allclose(f(p), expected, rtol=1e-13, atol=0))
+
+        # 插值表格与膜系模型
+        phasef = get_mirror_phasef(nu, 2*phase)
+        p0, wavelength = get_available_wavelength(780e-9, length, rocl, rocr, 0, 0, phase=phasef)
+        self.assertLess(abs(wavelength-780e-9), 780e-9**2/(2*(length+2*lpen))/2)
+        residual = 2*length/wavelength-p0-zeta/np.pi+phasef(constants.c/wavelength)/(2*np.pi)
+        self.assertAlmostEqual(residual, 0)
+
+        nu_min, nu_max = 380e12, 390e12
+        levels, ps, mx, my, _ = get_mode_spectrum(length, rocl, rocr, 2, nu_min, nu_max, phase=phasef)
+        self.assertTrue(np.all((levels >= nu_min) & (levels <= nu_max)))
+        residual = 2*length*levels/constants.c-ps-(mx+my+1)*zeta/np.pi+phasef(levels)/(2*np.pi)
+        self.assertTrue(np.allclose(residual, 0, atol=1e-9))
+        self.assertEqual(np.sum(ps == ps[len(ps)//2]), 6)
+
+        p1, length1 = get_resonant_length(length, 780e-9, rocl, rocr, 0, 0, phase=phasef)
+        f = get_available_wavelengthf(length1, rocl, rocr, 0, 0, phase=phasef)
+        self.assertAlmostEqual(f(p1)/780e-9, 1, places=12)
+
+        # 腔介质的折射率在各函数中的处理相同
+        for phase_ in (None, phasef):
+            levels, ps, mx, my, _ = get_mode_spectrum(length, rocl, rocr, 1, nu_min, nu_max, nc=1.45, phase=phase_)
+            for i in (0, len(levels)//2, -1):
+                f = get_available_wavelengthf(length, rocl, rocr, mx[i], my[i], phase=phase_, nc=1.45)
+                self.assertAlmostEqual(f(ps[i])*levels[i]/constants.c, 1, places=12)
+            p1, length1 = get_resonant_length(length, 780e-9, rocl, rocr, 0, 0, phase=phase_, nc=1.45)
+            f = get_available_wavelengthf(length1, rocl, rocr, 0, 0, phase=phase_, nc=1.45)
+            self.assertAlmostEqual(f(p1)/780e-9, 1, places=12)
+            self.assertEqual(get_available_wavelength(780e-9, length1, rocl, rocr, 0, 0, phase=phase_, nc=1.45)[0], p1)
+
+    def test_calculate_cavity_loss(self):
+        length, wavelength = 100e-6, 780e-9
+        rl = np.array([0.5, 0.9, 0.999])
+        result = calculate_cavity_loss(length, rl[:, None], 0.999, lc=np.array([0, 1e-4]), nc=1.5,
+                                       wavelength=wavelength)
+        self.assertEqual(set(result), {'kappa', 'fsr', 'finesse', 'tau', 'q'})
+        self.assertEqual(result['kappa'].shape, (3, 2))
+        self.assertTrue(np.allclose(result['fsr'], 2*np.pi*constants.c/(2*1.5*length)))
+        self.assertTrue(np.allclose(result['tau'], 1/(2*result['kappa'])))
+        self.assertTrue(np.allclose(result['q'], 2*np.pi*constants.c/wavelength*result['tau']))
+
+        # 与Airy透射曲线的线宽比较
+        cavity = Cavity(length=length, nc=1.5, rocl=200e-6, rocr=200e-6,
+                rl=0.5, tl=0.5, ll=0, rr=0.999, tr=0.001, lr=0)
+        delta = np.linspace(-0.5, 0.5, 200001)*cavity.fsr
+        _, kappa_e = extract_linewidth(delta, cavity.transmission_f(delta))
+        self.assertAlmostEqual(cavity.fsr/(2*kappa_e)/result['finesse'][0, 0], 1, places=6)
+
+        # 场的幅度衰减：往返一次衰减为g倍
+        g = np.sqrt(rl*0.999)
+        self.assertTrue(np.allclose(np.exp(-result['kappa'][:, 0]*2*1.5*length/constants.c), g))
+
+        # 高精细度时与近似公式一致
+        cavity.change_params(rl=0.9999, tl=0.0001)
+        exact = calculate_cavity_loss(length, 0.9999, 0.999, nc=1.5)
+        self.assertAlmostEqual(exact['kappa']/cavity.kappa, 1, places=3)
+        self.assertAlmostEqual(exact['finesse']/cavity.finesse, 1, places=3)
+
+        # 透射曲线没有半高点
+        self.assertTrue(np.isnan(calculate_cavity_loss(length, 0.01, 0.5)['finesse']))
+
     def test_calculate_loss_clipping(self):
         d, omegam = 200, 2
         cl = np.exp(-2*(d/2)**2/omegam**2)
         self.assertEqual(calculate_loss_clipping(d, omegam), cl)
+
+        # 光斑偏移时与数值积分比较
+        d, omegam = 6, 2
+        offset = np.array([0, 0.5, 1.5])
+        x = np.linspace(-12, 12, 2401)
+        xx, yy = np.meshgrid(x, x, indexing='ij')
+        for i, s in enumerate(offset):
+            i_f = np.exp(-2*((xx-s)**2+yy**2)/omegam**2)
+            loss = np.sum(i_f*(xx**2+yy**2 > (d/2)**2))/np.sum(i_f)
+            self.assertAlmostEqual(calculate_loss_clipping(d, omegam, offset)[i], loss, places=3)
+        self.assertAlmostEqual(calculate_loss_clipping(d, omegam, offset)[0], calculate_loss_clipping(d, omegam))
+
+    def test_calculate_misaligned_axis(self):
+        length, roc = 100, 300
+        # 两个腔镜同时偏移，光轴平移
+        axis = calculate_misaligned_axis(length, roc, roc, 5, 5)
+        self.assertAlmostEqual(axis['theta'], 0)
+        self.assertAlmostEqual(axis['x0'], 5)
+        self.assertAlmostEqual(axis['sl'], 0)
+        self.assertAlmostEqual(axis['length'], length)
+
+        # 右腔镜偏移，光轴经过两个曲率中心
+        xr = np.array([0.5, 1, 2])
+        axis = calculate_misaligned_axis(length, roc, roc, 0, xr)
+        self.assertTrue(np.allclose(np.tan(axis['theta']), -xr/(2*roc-length)))
+        self.assertTrue(np.allclose(axis['x0'], xr/2))
+        self.assertTrue(np.allclose(axis['sl'], -axis['sr'], rtol=1e-6))
+
+        # 平凹腔的平面镜倾斜，光轴垂直于平面镜并经过凹面镜的曲率中心
+        theta = 0.01
+        axis = calculate_misaligned_axis(length, np.inf, roc, 0, 0, theta, 0)
+        self.assertAlmostEqual(axis['theta'], theta)
+        self.assertAlmostEqual(axis['sr'], roc*np.sin(theta))
+        self.assertAlmostEqual(axis['sl'], (roc-length)*np.sin(theta))
+
+        self.assertTrue(np.isnan(calculate_misaligned_axis(length, np.inf, np.inf, 0, 1)['theta']))
+
+    def test_misaligned_cavity_mode(self):
+        length, wavelength, rocl, rocr = 300, 9.8, 600, 400
+        acm = CavityMode(length=length, wavelength=wavelength, rocl=rocl, rocr=rocr, xr=2.)
+        axis = calculate_misaligned_axis(length, rocl, rocr, 0, 2.)
+        self.assertAlmostEqual(acm.thetax, axis['theta'])
+        self.assertAlmostEqual(acm.sl, axis['sl'])
+
+        # 腔模光强的峰值沿光轴移动
+        x = np.linspace(-10, 10, 20001)
+        for z in (-length/2, 0, length/2):
+            i = acm.i_f(z, x, 0)
+            self.assertAlmostEqual(x[np.argmax(i)], axis['x0']+np.tan(axis['theta'])*z, places=3)
+
+        # 失调参数在change_params后保留
+        acm.change_params(rocl=800)
+        self.assertEqual(acm.xr, 2)
+        self.assertAlmostEqual(acm.thetax, calculate_misaligned_axis(length, 800, rocr, 0, 2.)['theta'])
     
     def test_calculate_loss_scattering(self):
         sigmasc, wavelength = 0.2, 980
         sl = (4*constants.pi*sigmasc/wavelength)**2
         self.assertEqual(calculate_loss_scattering(sigmasc, wavelength), sl)
 
+    def test_calculate_loss_clipping_hg(self):
+        d, omegam = np.array([3., 5., np.inf]), 2
+        loss = calculate_loss_clipping_hg(d, omegam, 3)
+        self.assertEqual(loss.shape, (4, 4, 3))
+        self.assertTrue(np.allclose(loss[0, 0], calculate_loss_clipping(d, omegam)))
+        self.assertTrue(np.all(loss[..., 2] == 0))
+        self.assertTrue(np.allclose(loss, np.swapaxes(loss, 0, 1)))
+
+        # 与数值积分比较
+        x = np.linspace(-12, 12, 4001)
+        xx, yy = np.meshgrid(x, x, indexing='ij')
+        outside = xx**2+yy**2 > (d[1]/2)**2
+        for mx, my in ((1, 0), (2, 1), (3, 3)):
+            beam = HGBeam(wavelength=1, omega0x=omegam, omega0y=omegam, mx=mx, my=my, a0=1, p0=0)
+            i = beam.i_f(0, xx, yy)
+            self.assertAlmostEqual(loss[mx, my, 1], np.sum(i*outside)/np.sum(i), places=3)
+
+    def test_calculate_mirror_reflectivity(self):
+        self.assertAlmostEqual(calculate_mirror_reflectivity(1e-3, 2e-4, 3e-5, 4e-6), 1-1e-3-2e-4-3e-5-4e-6)
+        self.assertEqual(calculate_mirror_reflectivity(0.1), 0.9)
+
+        # 总损耗超过1时反射率为0
+        r = calculate_mirror_reflectivity(0.5, 0, np.array([0.1, 0.6, 2]))
+        self.assertTrue(np.allclose(r, [0.4, 0, 0]))
+
+    def test_calculate_loss_budget(self):
+        wavelength, d, sigmasc = 780e-9, 40e-6, 0.2e-9
+        cavity = Cavity(length=np.array([100e-6, 200e-6]), rocl=300e-6, rocr=300e-6,
+                        rl=0.9999, tl=50e-6, rr=0.9999, tr=60e-6)
+        budget = calculate_loss_budget(cavity, d, d, 4, wavelength, sigmasc)
+        self.assertEqual(budget['finesse'].shape, (5, 5, 2))
+        self.assertAlmostEqual(budget['transmission'], 110e-6)
+
+        # 基模的clipping损耗与calculate_loss_clipping相同
+        mode = CavityMode(length=200e-6, wavelength=wavelength, rocl=300e-6, rocr=300e-6)
+        self.assertAlmostEqual(budget['clippingl'][0, 0, 1]/calculate_loss_clipping(d, mode.omegaml), 1)
+
+        lsc = calculate_loss_scattering(sigmasc, wavelength)
+        rl = cavity.rl-budget['clippingl'][0, 0]-lsc
+        rr = cavity.rr-budget['clippingr'][0, 0]-lsc
+        self.assertTrue(np.allclose(budget['loss'][0, 0], 1-rl*rr))
+        self.assertTrue(np.allclose(budget['finesse'][0, 0],
+                                    calculate_cavity_loss(cavity.length, rl, rr)['finesse']))
+
+        # 高阶模的精细度因clipping损耗而降低
+        self.assertTrue(np.all(np.diff(budget['finesse'][np.arange(5), np.arange(5)], axis=0) < 0))
+
+        # CavityMode没有透射率与镜面损耗，只计算clipping与散射损耗
+        budget = calculate_loss_budget(mode, d, d, 4, sigmasc=sigmasc)
+        self.assertEqual(budget['transmission'], 0)
+        self.assertAlmostEqual(budget['clippingr'][0, 0]/calculate_loss_clipping(d, mode.omegamr), 1)
+        rl, rr = 1-budget['clippingl']-lsc, 1-budget['clippingr']-lsc
+        self.assertTrue(np.allclose(budget['loss'], 1-rl*rr))
+        self.assertRaises(ValueError, calculate_loss_budget, cavity, d, d, 4)
+
@@ -57,6 +57,40 @@ class Test_NormalizedHGBeam1D(unittest.TestCase):
         self.assertEqual(nhgb1d.z0, z0)
 
 
+    def test_i_f(self):
+        wavelength, p0, omega0, m = 1550e-9, 0, 4e-6, 3
+        nhgb1d = NormalizedHGBeam1D(
+            wavelength=wavelength, p0=p0, omega0=omega0, m=m)
+
+        z, x = 1e-4, np.linspace(-20e-6, 20e-6, 11)
+        ampl, phase = nhgb1d.u_f(z, x)
+        self.assertTrue(np.allclose(nhgb1d.i_f(z, x), ampl**2))
+        self.assertTrue(np.allclose(nhgb1d.ampl_f(z, x), ampl))
+        self.assertTrue(np.allclose(nhgb1d.phase_f(z, x), phase))
+
+        k = 2*constants.pi/wavelength
+        r, phi = nhgb1d.r_f(z), nhgb1d.phi_f(z)
+        self.assertTrue(np.allclose(phase, -k/(2*r)*x**2+(m+1/2)*phi))
+
+
+    def test_farfield_f(self):
+        wavelength, p0, omega0, m = 1550e-9, 0, 4e-6, 3
+        nhgb1d = NormalizedHGBeam1D(
+            wavelength=wavelength, p0=p0, omega0=omega0, m=m)
+
+        # 远处的光场趋于远场分布
+        z = 1e4*nhgb1d.z0
+        theta = np.linspace(-0.5, 0.5, 11)
+        ampl, _ = nhgb1d.u_f(z, theta*z)
+        amplf, phasef = nhgb1d.farfield_f(theta)
+        self.assertTrue(np.allclose(ampl*np.sqrt(z), amplf, atol=1e-4*np.max(amplf)))
+        self.assertAlmostEqual(phasef, (m+1/2)*constants.pi/2)
+
+        f = 1e-2
+        amplp, _ = nhgb1d.focalplane_f(f, theta*f)
+        self.assertTrue(np.allclose(amplp*np.sqrt(f), amplf))
+
+
 class Test_HGBeam1D(unittest.TestCase):
 
     def test_constructor(self):
@@ -197,6 +231,70 @@ class Test_NormalizedHGBeam(unittest.TestCase):
         self.assertEqual(nhgb.z0y, z0y)
 
 
+    def test_i_f(self):
+        wavelength, p0, omega0x, omega0y, mx, my = 980e-9, 0, 1e-6, 1.2e-6, 1, 2
+        nhgb = NormalizedHGBeam(wavelength=wavelength,
+                                p0=p0, omega0x=omega0x, omega0y=omega0y, mx=mx, my=my)
+
+        z, x, y = 1e-5, np.linspace(-3e-6, 3e-6, 7), 1e-6
+        ampl, _ = nhgb.u_f(z, x, y)
+        self.assertTrue(np.allclose(nhgb.i_f(z, x, y), ampl**2))
+
+        nesb = NormalizedEqualSymmetricHGBeam(
+            wavelength=wavelength, p0=p0, omega0=omega0x, m=mx)
+        ampl, _ = nesb.u_f(z, x, y)
+        self.assertTrue(np.allclose(nesb.i_f(z, x, y), ampl**2))
+
+        # 振幅a0同时作用于u_f与i_f
+        hgb = HGBeam(a0=3, wavelength=wavelength,
+                     p0=p0, omega0x=omega0x, omega0y=omega0y, mx=mx, my=my)
+        ampl, _ = hgb.u_f(z, x, y)
+        self.assertTrue(np.allclose(hgb.i_f(z, x, y), ampl**2))
+        self.assertTrue(np.allclose(ampl, 3*nhgb.u_f(z, x, y)[0]))
+
+
+    def test_focalplane_f(self):
+        wavelength, p0, omega0, mx, my = 980e-9, 0, 10e-6, 2, 1
+        nhgb = NormalizedHGBeam(wavelength=wavelength, p0=p0, omega0x=omega0, omega0y=omega0, mx=mx, my=my)
+        f, x, y = 1e-2, np.linspace(-300e-6, 300e-6, 7), 50e-6
+
+        # 二维焦面光场为两个一维焦面光场之积
+        amplx, phasex = NormalizedHGBeam1D(wavelength=wavelength, p0=p0, omega0=omega0, m=mx).focalplane_f(f, x)
+        amply, phasey = NormalizedHGBeam1D(wavelength=wavelength, p0=p0, omega0=omega0, m=my).focalplane_f(f, y)
+        ampl, phase = nhgb.focalplane_f(f, x, y)
+        self.assertTrue(np.allclose(ampl, amplx*amply))
+        self.assertTrue(np.allclose(phase, phasex+phasey))
+
+        nesb = NormalizedEqualSymmetricHGBeam(wavelength=wavelength, p0=p0, omega0=omega0, m=mx)
+        nhgb.change_params(my=mx)
+        self.assertTrue(np.allclose(nesb.focalplane_f(f, x, y)[0], nhgb.focalplane_f(f, x, y)[0]))
+
+    def test_misalignment(self):
+        kw = dict(wavelength=980e-9, p0=0, omega0x=10e-6, omega0y=12e-6, mx=1, my=2)
+        nhgb = NormalizedHGBeam(**kw)
+        k = 2*constants.pi/kw['wavelength']
+
+        z = 1e-4
+        x = np.linspace(-30e-6, 30e-6, 5)[:, None]
+        y = np.linspace(-30e-6, 30e-6, 4)[None, :]
+
+        dx, thetay = 3e-6, 1e-3
+        mnhgb = NormalizedHGBeam(dx=dx, thetay=thetay, **kw)
+        ampl, phase = mnhgb.u_f(z, x, y)
+        ampl0, phase0 = nhgb.u_f(z, x-dx, y-thetay*z)
+        self.assertTrue(np.allclose(ampl, ampl0))
+        self.assertTrue(np.allclose(phase, phase0-k*thetay*y))
+
+        # 失调维度在前
+        dxs = np.linspace(0, 5e-6, 7)
+        dys = np.linspace(0, 2e-6, 3)[:, None]
+        mnhgb.change_params(dx=dxs, dy=dys, thetay=0)
+        i = mnhgb.i_f(z, x, y)
+        self.assertEqual(i.shape, (3, 7, 5, 4))
+        self.assertEqual(mnhgb.u_f(z, x, y)[0].shape, (3, 7, 5, 4))
+        self.assertTrue(np.allclose(i[2, 4], nhgb.i_f(z, x-dxs[4], y-dys[2, 0])))
+
+
 class Test_HGBeam(unittest.TestCase):
 
     def test_constructor(self):
@@ -478,6 +576,117 @@ class Test_EqualGBeam(unittest.TestCase):
             egb.a_f(10), a0/(1+(10-p0)**2/z0**2)**(1/2))  # 振幅
 
 
+class Test_HGBeamSuperposition(unittest.TestCase):
+
+    def test_constructor(self):
+        wavelength, p0, omega0x, omega0y = 980e-9, 0, 10e-6, 12e-6
+        coeffs = np.zeros((3, 2), dtype=complex)
+        coeffs[2, 1] = 1j
+
+        hgbs = HGBeamSuperposition(wavelength=wavelength, p0=p0,
+                                   omega0x=omega0x, omega0y=omega0y, coeffs=coeffs)
+        nhgb = NormalizedHGBeam(wavelength=wavelength, p0=p0,
+                                omega0x=omega0x, omega0y=omega0y, mx=2, my=1)
+
+        self.assertAlmostEqual(hgbs.power, 1)
+
+        z, x, y = 1e-3, 5e-6, -8e-6
+        ampl, phase = hgbs.u_f(z, x, y)
+        ampl0, phase0 = nhgb.u_f(z, x, y)
+        u, u0 = ampl*np.exp(1j*phase), 1j*ampl0*np.exp(1j*phase0)
+        self.assertAlmostEqual(u.real/abs(u0), u0.real/abs(u0))
+        self.assertAlmostEqual(u.imag/abs(u0), u0.imag/abs(u0))
+
+    def test_i_f(self):
+        rng = np.random.default_rng(1)
+        coeffs = rng.normal(size=(3, 3))+1j*rng.normal(size=(3, 3))
+        hgbs = HGBeamSuperposition(wavelength=980e-9, p0=0, omega0x=10e-6,
+                                   omega0y=10e-6, coeffs=coeffs)
+
+        z, x, y = 1e-4, np.linspace(-20e-6, 20e-6, 9), 3e-6
+        ampl, _ = hgbs.u_f(z, x, y)
+        self.assertTrue(np.allclose(hgbs.i_f(z, x, y), ampl**2))
+
+    def test_farfield_f(self):
+        rng = np.random.default_rng(2)
+        coeffs = rng.normal(size=(3, 4))+1j*rng.normal(size=(3, 4))
+        hgbs = HGBeamSuperposition(wavelength=980e-9, p0=0, omega0x=10e-6,
+                                   omega0y=8e-6, coeffs=coeffs)
+
+        z = 1e4*constants.pi*(10e-6)**2/980e-9
+        thetax, thetay = np.linspace(-0.1, 0.1, 9), 0.02
+        ampl, _ = hgbs.u_f(z, thetax*z, thetay*z)
+        amplf, _ = hgbs.farfield_f(thetax, thetay)
+        self.assertTrue(np.allclose(ampl*z, amplf, atol=1e-4*np.max(amplf)))
+
+        f = 1e-2
+        amplp, _ = hgbs.focalplane_f(f, thetax*f, thetay*f)
+        self.assertTrue(np.allclose(amplp*f, amplf))
+
+    def test_decompose_hgbeam(self):
+        wavelength, p0, omega0x, omega0y = 980e-9, 0, 10e-6, 12e-6
+        rng = np.random.default_rng(0)
+        coeffs = rng.normal(size=(4, 5))+1j*rng.normal(size=(4, 5))
+
+        hgbs = HGBeamSuperposition(wavelength=wavelength, p0=p0,
+                                   omega0x=omega0x, omega0y=omega0y, coeffs=coeffs)
+
+        z = 2e-4
+        x = np.linspace(-80e-6, 80e-6, 256)
+        y = np.linspace(-90e-6, 90e-6, 200)
+        ampl, phase = hgbs.u_f(z, x[:, None], y[None, :])
+        field = ampl*np.exp(1j*phase)
+
+        c = decompose_hgbeam(field, x, y, z, wavelength,
+                             p0, omega0x, omega0y, 6)
+
+        self.assertEqual(c.shape, (7, 7))
+        self.assertTrue(np.allclose(c[:4, :5], coeffs))
+        self.assertTrue(np.allclose(c[4:], 0))
+        self.assertTrue(np.allclose(c[:, 5:], 0))
+
+
+class Test_second_moments(unittest.TestCase):
+
+    def test_pure_mode(self):
+        wavelength, p0, omega0x, omega0y, mx, my = 980e-9, 0, 10e-6, 12e-6, 3, 1
+        nhgb = NormalizedHGBeam(wavelength=wavelength, p0=p0,
+                                omega0x=omega0x, omega0y=omega0y, mx=mx, my=my)
+
+        weights = np.zeros((5, 5))
+        weights[mx, my] = 2
+        m2x, m2y, omega0mx, omega0my, thetamx, thetamy = calculate_second_moments(
+            weights, wavelength, omega0x, omega0y)
+
+        self.assertAlmostEqual(m2x, 2*mx+1)
+        self.assertAlmostEqual(m2y, 2*my+1)
+        self.assertAlmostEqual(omega0mx, nhgb.omega0mx)
+        self.assertAlmostEqual(omega0my, nhgb.omega0my)
+        self.assertAlmostEqual(thetamx, nhgb.thetamx)
+        self.assertAlmostEqual(thetamy, nhgb.thetamy)
+
+    def test_mixtures(self):
+        wavelength, omega0 = 980e-9, 10e-6
+        rng = np.random.default_rng(3)
+        weights = rng.random((10, 4, 3))
+
+        m2x, m2y, omega0mx, _, _, _ = calculate_second_moments(
+            weights, wavelength, omega0, omega0)
+
+        self.assertEqual(m2x.shape, (10,))
+        mx = np.arange(4)[:, None]
+        w = weights[4]
+        self.assertAlmostEqual(m2x[4], np.sum(w*(2*mx+1))/np.sum(w))
+        self.assertAlmostEqual(omega0mx[4], np.sqrt(m2x[4])*omega0)
+
+        # 与网格上数值积分得到的二阶矩一致
+        x = np.linspace(-100e-6, 100e-6, 2001)
+        ix = sum(w[m].sum()*NormalizedHGBeam1D(wavelength=wavelength, p0=0,
+                 omega0=omega0, m=m).i_f(0, x) for m in range(4))
+        sigma2 = np.sum(x**2*ix)/np.sum(ix)
+        self.assertAlmostEqual(2*np.sqrt(sigma2)/omega0mx[4], 1, places=6)
+
+
 class Test_transformation(unittest.TestCase):
 
     def test_local2remote(self):
@@ -537,5 +746,58 @@ class Test_transformation(unittest.TestCase):
         self.assertAlmostEqual(omega0p, omega0)
 
 
+class Test_AstigmaticHGBeam(unittest.TestCase):
+
+    def test_p0xy(self):
+        wavelength, omega0x, omega0y = 1., 2., 3.
+        beam = NormalizedHGBeam(wavelength=wavelength, p0=0., p0x=-5., p0y=5.,
+                                omega0x=omega0x, omega0y=omega0y, mx=1, my=2)
+        bx = NormalizedHGBeam1D(wavelength=wavelength, p0=-5., omega0=omega0x, m=1)
+        by = NormalizedHGBeam1D(wavelength=wavelength, p0=5., omega0=omega0y, m=2)
+
+        z, x, y = 2., np.linspace(-6, 6, 7), np.linspace(-4, 4, 7)
+        ampl, phase = beam.u_f(z, x, y)
+        amplx, phasex = bx.u_f(z, x)
+        amply, phasey = by.u_f(z, y)
+        self.assertTrue(np.allclose(ampl, amplx*amply))
+        self.assertTrue(np.allclose(phase, phasex+phasey))
+
+        # 默认与p0相同
+        beam.change_params(p0x=None, p0y=None)
+        self.assertEqual(beam.p0x, 0)
+        beam.change_params(p0=3.)
+        self.assertEqual(beam.p0x, 3)
+        self.assertEqual(beam.p0y, 3)
+
+
+class Test_hg_overlaps(unittest.TestCase):
+
+    def test_decompose(self):
+        beam = NormalizedHGBeam(wavelength=1., p0=-5., omega0x=2.3, omega0y=2.0, mx=1, my=2,
+                                dx=0.5, thetax=0.02, dy=-0.3)
+        x = np.linspace(-25, 25, 1001)
+        xx, yy = np.meshgrid(x, x, indexing='ij')
+        ampl, phase = beam.u_f(0, xx, yy)
+        coeffs = decompose_hgbeam(ampl*np.exp(1j*phase), x, x, 0, 1., 0, 3., 3., 8)
+
+        cx = calculate_hg_overlaps(8, 1, 1., 3., 2.3, 5., 0.5+0.02*5, 0.02)
+        cy = calculate_hg_overlaps(8, 2, 1., 3., 2.0, 5., -0.3)
+        self.assertEqual(cx.shape, (9, 2))
+        # NormalizedHGBeam的倾斜相位以束腰处的光轴为参考，相差常数相位k*thetax^2*dz
+        phase0 = np.exp(-1j*2*np.pi*0.02**2*5.)
+        self.assertTrue(np.allclose(coeffs, np.outer(cx[:, 1], cy[:, 2])*phase0, atol=1e-9))
+
+    def test_matched(self):
+        c = calculate_hg_overlaps(4, 3, 1., 2., 2., 0.)
+        self.assertTrue(np.allclose(c, np.eye(5, 4)))
+
+        # 只有偏移时基模耦合效率为exp(-d^2/omega0^2)
+        d = np.array([0, 0.5, 1.])
+        c = calculate_hg_overlaps(20, 0, 1., 2., 2., 0., d)
+        self.assertEqual(c.shape, (21, 1, 3))
+        self.assertTrue(np.allclose(np.abs(c[0, 0])**2, np.exp(-d**2/4)))
+        self.assertTrue(np.allclose(np.sum(np.abs(c)**2, axis=0), 1))
+
+
 if __name__ == '__main__':
     unittest.main()
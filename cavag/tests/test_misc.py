@@ -161,5 +161,35 @@ class Test_Wavelength(unittest.TestCase):
         self.assertEqual(a.property_set, {'a':1, 'wavelength':10})
 
 
+class Test_Diagnostics(unittest.TestCase):
+
+    def test_batch(self):
+        diag = Diagnostics(nsamples=2)
+
+        with self.assertLogs(level='WARNING') as cm:
+            diag.warn('a', 'message %d', 1, x=1)
+        self.assertEqual(cm.output, ['WARNING:root:message 1'])
+
+        with self.assertLogs(level='WARNING') as cm:
+            with diag.batch():
+                for i in range(100):
+                    diag.warn('a', 'message %d', i, x=i)
+                with diag.batch():
+                    diag.warn('b', 'other')
+                self.assertEqual(diag.records['a']['count'], 100)
+        self.assertEqual(len(cm.output), 2)
+        self.assertIn('100 times', cm.output[0])
+        self.assertIn("{'x': 1}", cm.output[0])
+        self.assertEqual(diag.records, {})
+
+    def test_immediate(self):
+        diag = Diagnostics(immediate=True)
+        with self.assertLogs(level='WARNING') as cm:
+            with diag.batch():
+                diag.warn('a', 'message')
+                diag.warn('a', 'message')
+        self.assertEqual(cm.output, ['WARNING:root:message']*2)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+import numpy as np
+from scipy import constants
+from cavag.resonator import *
+from cavag.mirror import Mirror, Lens
+from cavag.fpcavity import CavityMode, calculate_gouy_phase
+
+
+class Test_Resonator(unittest.TestCase):
+
+    def test_constructor(self):
+        r = Resonator(wavelength=9.8, elements=[Mirror(roc=600), Mirror(roc=400)], spacings=[300])
+        self.assertEqual(r.angles, [0, 0])
+        self.assertFalse(r.ring)
+        self.assertAlmostEqual(r.fsr, constants.c/600)
+        self.assertEqual(r.roundtrip.shape, (2, 2, 2))
+        self.assertAlmostEqual(np.linalg.det(r.roundtrip[0]), 1)
+
+        with self.assertRaises(ValueError):
+            Resonator(wavelength=9.8, elements=[Mirror(roc=600), Mirror(roc=400)], spacings=[300, 100])
+
+    def test_two_mirror(self):
+        length, wavelength, rocr = 300, 9.8, 400
+        rocl = np.array([600, 400, -2000, 100])
+        r = Resonator(wavelength=wavelength, elements=[Mirror(roc=rocl), Mirror(roc=rocr)],
+                      spacings=[length])
+        self.assertTrue(np.array_equal(r.stable, [True, True, True, False]))
+        self.assertTrue(np.all(np.isnan(r.omega0[..., 3])))
+
+        for i in range(3):
+            cm = CavityMode(length=length, wavelength=wavelength, rocl=rocl[i], rocr=rocr)
+            for d in range(2):
+                self.assertAlmostEqual(r.omega0[0, d, i], cm.omega0)
+                self.assertAlmostEqual(r.p0[0, d, i], cm.pl)
+                self.assertAlmostEqual(r.omegam[0, d, i], cm.omegaml)
+                self.assertAlmostEqual(r.omegam[1, d, i], cm.omegamr)
+                self.assertAlmostEqual(r.zeta[0, d, i], calculate_gouy_phase(length, rocl[i], rocr))
+                self.assertAlmostEqual(r.zeta_rt[d, i], 2*calculate_gouy_phase(length, rocl[i], rocr))
+
+    def test_folded(self):
+        wavelength = 9.8
+        # 正入射的平面折叠镜不改变腔模
+        r = Resonator(wavelength=wavelength, elements=[Mirror(roc=600), Mirror(roc=np.inf), Mirror(roc=400)],
+                      spacings=[100, 200])
+        cm = CavityMode(length=300, wavelength=wavelength, rocl=600, rocr=400)
+        self.assertTrue(np.allclose(r.omegam[:, 0], [cm.omegaml, cm.omega_f(cm.p0-cm.pl+100), cm.omegamr]))
+        self.assertTrue(np.allclose(r.p0[:, 0], [cm.pl, cm.pl-100]))
+        self.assertTrue(np.allclose(r.zeta_rt, 2*calculate_gouy_phase(300, 600, 400)))
+
+        # 斜入射的凹面折叠镜引入像散，扫描折叠镜的曲率半径
+        rocs = np.linspace(1000, 3000, 5)
+        r = Resonator(wavelength=wavelength, elements=[Mirror(roc=600), Mirror(roc=rocs), Mirror(roc=400)],
+                      spacings=[100, 200], angles=[0, 0.3, 0])
+        self.assertEqual(r.omega0.shape, (2, 2, 5))
+        self.assertTrue(np.all(r.stable))
+        self.assertFalse(np.allclose(r.zeta_rt[0], r.zeta_rt[1]))
+        for i, roc in enumerate(rocs):
+            for d, f in enumerate((roc*np.cos(0.3)/2, roc/np.cos(0.3)/2)):
+                single = Resonator(wavelength=wavelength, spacings=[100, 200],
+                                   elements=[Mirror(roc=600), Lens(f=f), Mirror(roc=400)])
+                self.assertAlmostEqual(r.omega0[1, d, i], single.omega0[1, 0])
+                self.assertAlmostEqual(r.nu_f(0, 1, 0)[i]-r.nu_f(0)[i], r.fsr*r.zeta_rt[0, i]/(2*np.pi))
+
+    def test_ring(self):
+        wavelength = 9.8
+        r = Resonator(wavelength=wavelength, elements=[Mirror(roc=np.inf), Mirror(roc=np.inf), Mirror(roc=500)],
+                      spacings=[100, 100, 100], ring=True)
+        self.assertAlmostEqual(r.fsr, constants.c/300)
+        # 束腰位于曲面镜对面的间距中点
+        self.assertTrue(np.allclose(r.p0[:, 0], [50, -50, 150]))
+        # 等价于长度为150、曲率半径为500的平凹腔的展开
+        cm = CavityMode(length=150, wavelength=wavelength, rocl=np.inf, rocr=500)
+        self.assertAlmostEqual(r.omega0[0, 0], cm.omega0)
+        self.assertAlmostEqual(r.zeta_rt[0], 2*calculate_gouy_phase(150, np.inf, 500))
+
+
+class Test_functions(unittest.TestCase):
+
+    def test_eigen_q(self):
+        m = calculate_abcd_lens(np.array([200, 300]))@calculate_abcd_propagation(100)
+        q = calculate_eigen_q(m)
+        self.assertTrue(np.all(q.imag > 0))
+        self.assertTrue(np.allclose(transform_q(q, m), q))
+        self.assertTrue(np.isnan(calculate_eigen_q(calculate_abcd_lens(10)@calculate_abcd_propagation(100))))
+
+
+if __name__ == '__main__':
+    unittest.main()